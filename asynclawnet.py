@@ -0,0 +1,408 @@
+import asyncio
+import contextvars
+import functools
+import time
+import aiohttp
+from http.cookies import SimpleCookie
+from yarl import URL
+
+from lawnetsearch import LawnetBrowser
+from concurrencylimit import AsyncAdaptiveLimiter
+from retry import SearchRejected
+
+
+class AsyncLawnetBrowser(LawnetBrowser):
+    """
+    Runs login, search, case page and PDF fetches as coroutines over a
+    single aiohttp client instead of a pool of blocking threads.
+    The synchronous login_lawnet/download_cases interface is kept so
+    the GUI can drive either browser the same way.
+    """
+
+    TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+    TIMEOUT_ERRORS = (asyncio.TimeoutError,)
+
+    def __init__(self, max_in_flight=50, **kwargs):
+        super().__init__(workers=max_in_flight, **kwargs)
+        self.max_in_flight = max_in_flight
+        self.loop = None
+        self.client = None
+        self.async_form_date_lock = None
+        self.resumed = None
+
+    def create_limiter(self, **kwargs):
+        return AsyncAdaptiveLimiter(enabled=self.adaptive_limits, **kwargs)
+
+    def get_loop(self):
+        # the aiohttp client is bound to the loop it was created on,
+        # so login and downloads must share one loop
+        if self.loop is None or self.loop.is_closed():
+            self.loop = asyncio.new_event_loop()
+        return self.loop
+
+    def run(self, coroutine):
+        return self.get_loop().run_until_complete(coroutine)
+
+    def create_client(self, cookie_jar=None):
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        connect_timeout, read_timeout = self.REQUEST_TIMEOUT
+        # no overall limit, as a long PDF keeps streaming as long as it reads
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout,
+                                        sock_read=read_timeout)
+        return aiohttp.ClientSession(
+            connector=connector, timeout=timeout,
+            cookie_jar=cookie_jar or aiohttp.CookieJar(unsafe=True))
+
+    async def use_client(self, client):
+        old_client = self.client
+        self.client = client
+        self.cookies = client.cookie_jar
+        self.form_date = None
+        if old_client is not None and old_client is not client:
+            await old_client.close()
+
+    async def get_client(self):
+        if self.client is None:
+            await self.use_client(self.create_client(self.cookies))
+        return self.client
+
+    def close(self):
+        # the client is closed on the loop it was created on, then the loop
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.run(self.async_close())
+        self.loop.close()
+        self.loop = None
+        self.async_form_date_lock = None
+        self.resumed = None
+
+    async def async_close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    def login_lawnet(self):
+        with self.metrics.span('login'):
+            return self.run(self.async_login_lawnet())
+
+    def run_in_executor(self, function, *args):
+        # blocking calls keep the current case for their metrics
+        return asyncio.get_event_loop().run_in_executor(None, functools.partial(
+            contextvars.copy_context().run, function, *args))
+
+    def download_cases(self, citation_list):
+        self.breaker.reset()
+        results = self.async_download_cases(citation_list)
+        try:
+            while True:
+                try:
+                    yield self.run(results.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            self.run(results.aclose())
+
+    def form_fields(self, payload):
+        # aiohttp does not expand list values like requests does
+        fields = []
+        for name, value in payload.items():
+            values = value if isinstance(value, list) else [value]
+            fields.extend((name, item) for item in values)
+        return fields
+
+    async def fetch_text(self, client, method, url, data=None, policy=None,
+                         limiter=None, validate=None, stage='page'):
+        # without a policy the request is sent once, as during login
+        if policy is None:
+            return await self.send(client, method, url, data)
+        with self.metrics.span(stage):
+            return await self.send_with_retries(
+                client, method, url, data, policy, limiter, validate, stage)
+
+    async def send_with_retries(self, client, method, url, data, policy,
+                                limiter, validate, stage):
+        retry_policy = self.retry_policies[policy]
+        for attempt in range(retry_policy.attempts):
+            last_attempt = attempt + 1 == retry_policy.attempts
+            await self.async_wait_for_breaker()
+            try:
+                if limiter is None:
+                    result = await self.send(client, method, url, data)
+                else:
+                    async with limiter.slot() as slot:
+                        self.metrics.record(stage + '_wait', slot.waited)
+                        result = await self.send(client, method, url, data)
+                        slot.record(result[1])
+            except Exception as error:
+                if not self.retry_error(error, retry_policy, last_attempt):
+                    raise
+            else:
+                response_url, status, text = result
+                valid = validate is None or validate(text)
+                if self.accept_response(retry_policy, url, response_url, status,
+                                        valid, last_attempt):
+                    return result
+            self.count_retry(policy)
+            await asyncio.sleep(retry_policy.backoff(attempt))
+
+    async def send(self, client, method, url, data=None):
+        if data is not None:
+            data = self.form_fields(data)
+        async with client.request(method, url, data=data) as response:
+            text = await response.text()
+            return str(response.url), response.status, text
+
+    async def async_wait_for_breaker(self):
+        pause = self.breaker.pause()
+        while pause:
+            await asyncio.sleep(pause)
+            pause = self.breaker.pause()
+
+    async def async_download_pdf(self, client, pdf_url, filename):
+        # returns None if the response is not a PDF
+        with self.metrics.span('pdf'):
+            return await self.async_fetch_pdf(client, pdf_url, filename)
+
+    async def async_fetch_pdf(self, client, pdf_url, filename):
+        case_path = self.get_case_path(filename, '.pdf')
+        for attempt in range(self.PDF_FETCH_ATTEMPTS):
+            await self.async_wait_for_breaker()
+            try:
+                async with self.limiters['pdf'].slot() as slot:
+                    self.metrics.record('pdf_wait', slot.waited)
+                    status = await self.async_stream_pdf(
+                        client, pdf_url, case_path, slot)
+            except Exception as error:
+                delay = self.pdf_retry_delay(error, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record(True)
+            return status
+        return 'PDF download interrupted.'
+
+    async def async_stream_pdf(self, client, pdf_url, case_path, slot):
+        resume_from, headers = self.pdf_request(case_path)
+        async with client.get(pdf_url, headers=headers) as response:
+            slot.record(response.status)
+            if self.discard_partial(case_path, response.status, resume_from):
+                return await self.async_stream_pdf(client, pdf_url, case_path, slot)
+            writer = self.open_pdf_writer(pdf_url, case_path, str(response.url),
+                                          response.status)
+            if writer is None:
+                return None
+            try:
+                async for chunk in response.content.iter_chunked(self.PDF_CHUNK_SIZE):
+                    if not writer.write(chunk):
+                        writer.abort()
+                        return None
+            except Exception:
+                writer.abort(discard=False)
+                raise
+        with self.metrics.span('write'):
+            if not await asyncio.get_event_loop().run_in_executor(None, writer.commit):
+                return None
+        return 'PDF downloaded.'
+
+    async def async_login_lawnet(self):
+        # the client only replaces the shared one if login succeeds
+        client = self.create_client(self.cookies)
+        try:
+            restored = self.restore_cookies(client.cookie_jar)
+            status = await self.async_authenticate(client)
+            if status != 'SUCCESS' and restored:
+                # the saved cookies were rejected, log in from a clean client
+                await client.close()
+                self.cookie_store.clear()
+                client = self.create_client()
+                status = await self.async_authenticate(client)
+        except Exception:
+            await client.close()
+            raise
+        if status == 'SUCCESS':
+            await self.use_client(client)
+            self.persist_cookies(client.cookie_jar)
+        else:
+            await client.close()
+        return status
+
+    def restore_cookie(self, cookie_jar, cookie):
+        morsel = SimpleCookie()
+        morsel[cookie['name']] = cookie['value']
+        morsel[cookie['name']]['path'] = cookie['path']
+        scheme = 'https' if cookie['secure'] else 'http'
+        domain = cookie['domain'].lstrip('.')
+        cookie_jar.update_cookies(morsel, URL(f'{scheme}://{domain}/'))
+
+    def saved_cookie(self, morsel):
+        # aiohttp does not expose cookie expiry, the store's max age applies
+        return {
+            'name': morsel.key,
+            'value': morsel.value,
+            'domain': morsel['domain'],
+            'path': morsel['path'] or '/',
+            'secure': bool(morsel['secure']),
+            'expires': None,
+        }
+
+    async def async_authenticate(self, client):
+        steps = self.login_steps()
+        try:
+            method, url, data = next(steps)
+            while True:
+                url, _, text = await self.fetch_text(client, method, url, data)
+                method, url, data = steps.send((url, text))
+        except StopIteration as finished:
+            return finished.value
+
+    async def async_get_form_date(self, client, stale_form_date=None):
+        if self.async_form_date_lock is None:
+            self.async_form_date_lock = asyncio.Lock()
+        wait_start = time.perf_counter()
+        async with self.async_form_date_lock:
+            self.metrics.record('form_date_wait', time.perf_counter() - wait_start)
+            if self.needs_form_date(stale_form_date):
+                _, _, text = await self.fetch_text(
+                    client, 'GET', self.LAWNET_SEARCH_URL, policy='GET',
+                    validate=self.has_form_date, stage='form_date')
+                self.form_date = self.parse_form_date(text)
+            return self.form_date
+
+    async def async_search(self, client, case_citation):
+        form_date = await self.async_get_form_date(client)
+        for attempt in range(2):
+            url, status, text = await self.fetch_text(
+                client, 'POST', self.SEARCH_FORM_ACTION,
+                data=self.get_search_payload(form_date, case_citation),
+                policy='search', limiter=self.limiters['search'], stage='search')
+            if not self.search_rejected(url, status):
+                break
+            form_date = await self.async_get_form_date(client, form_date)
+        else:
+            raise SearchRejected(status)
+        return text
+
+    async def async_download_cases(self, citation_list):
+        # citation_list may be a generator still reading the reading list,
+        # in which case downloads start as the citations come in
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        finished = asyncio.Queue()
+        tasks = []
+
+        async def run_download(case):
+            async with semaphore:
+                return case, await self.async_download_case_or_fail(case)
+
+        def start(case):
+            task = asyncio.ensure_future(run_download(case))
+            task.add_done_callback(finished.put_nowait)
+            tasks.append(task)
+
+        async def feed():
+            try:
+                if isinstance(citation_list, (list, tuple)):
+                    for case in citation_list:
+                        start(case)
+                else:
+                    async for case in self.iter_in_executor(citation_list):
+                        start(case)
+            finally:
+                finished.put_nowait(None)
+
+        feeder = asyncio.ensure_future(feed())
+        try:
+            fed = False
+            reported = 0
+            while not fed or reported < len(tasks):
+                task = await finished.get()
+                if task is None:
+                    fed = True
+                    continue
+                reported += 1
+                yield task.result()
+            # errors reading the citations are raised once the cases
+            # found before them have been reported
+            await feeder
+        finally:
+            feeder.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def iter_in_executor(self, iterable):
+        # advances a blocking iterator without holding up the event loop
+        iterator = iter(iterable)
+        done = object()
+        while True:
+            item = await self.run_in_executor(next, iterator, done)
+            if item is done:
+                return
+            yield item
+
+    async def async_download_case_or_fail(self, case_citation):
+        if not await self.async_wait_for_journal():
+            return self.CANCELLED
+        with self.journal.case(case_citation) as entry:
+            return entry.finish(await self.async_try_download_case(case_citation))
+
+    async def async_wait_for_journal(self):
+        # every paused task awaits the one executor thread blocked on the
+        # journal, which is shielded so a cancelled task does not end it
+        if not self.journal.running.is_set():
+            if self.resumed is None or self.resumed.done():
+                self.resumed = self.run_in_executor(self.journal.wait)
+            await asyncio.shield(self.resumed)
+        return not self.journal.cancelled
+
+    async def async_try_download_case(self, case_citation):
+        try:
+            return await self.async_download_case(case_citation)
+        except Exception as error:
+            return self.failure_status(error)
+
+    async def async_download_case(self, case_citation):
+        with self.metrics.case(case_citation):
+            return await self.async_fetch_case(case_citation)
+
+    async def async_fetch_case(self, case_citation):
+        case_citation, lookup_citation, case_status = await self.run_in_executor(
+            self.start_case, case_citation)
+        if case_status:
+            return case_status
+
+        client = await self.get_client()
+        case_text = None
+        resolution = self.get_cached_resolution(lookup_citation)
+        if resolution is None:
+            resolution, case_text = await self.async_resolve_case(
+                client, lookup_citation)
+        case_status = self.check_resolution(lookup_citation, resolution)
+        if case_status:
+            return case_status
+
+        status = None
+        if resolution.pdf_url:
+            status = await self.async_download_pdf(
+                client, resolution.pdf_url, resolution.case_name)
+        if self.needs_case_page(lookup_citation, resolution, status):
+            if case_text is None:
+                _, _, case_text = await self.fetch_text(
+                    client, 'GET', self.LAWNET_CASE_URL + resolution.doc_id,
+                    policy='GET', stage='case_page')
+            status = await self.run_in_executor(
+                self.save_case_page, case_text, resolution.case_name,
+                case_citation)
+        return await self.run_in_executor(
+            self.store_case, case_citation, resolution.case_name,
+            status or 'PDF not available.')
+
+    async def async_resolve_case(self, client, case_citation):
+        # returns the resolution and, for neutral citations, the case page
+        search_html = await self.async_search(client, case_citation)
+        resolution, first_result = self.read_search_page(case_citation, search_html)
+        if first_result is None:
+            return resolution, None
+        _, status, case_text = await self.fetch_text(
+            client, 'GET', self.LAWNET_CASE_URL + self.get_doc_id(first_result),
+            policy='GET', stage='case_page')
+        return self.read_case_page(case_citation, first_result, status, case_text)
@@ -0,0 +1,133 @@
+import argparse
+import collections
+import functools
+import glob
+import json
+import multiprocessing
+import os
+import sys
+
+import parsedocs
+from extractcache import ExtractionCache
+
+# Extracts the citations of many reading lists at once, e.g. every list
+# of a cohort at the start of term:
+#   python -m batchextract lists/ 'archive/**/*.pdf' --plain > cohort.txt
+# The lists are read in a process pool and their citations merged, with
+# the lists each citation came from, so that the union can be downloaded
+# once with lrldcli cohort.txt.
+
+BatchResult = collections.namedtuple('BatchResult', ['citations', 'errors'])
+
+# the cache each pool process reads and fills
+worker_cache = None
+
+
+def find_reading_lists(patterns):
+    # directories are searched recursively; anything else is a glob
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for directory, _, names in os.walk(pattern):
+                paths.extend(os.path.join(directory, name) for name in names)
+        else:
+            paths.extend(glob.glob(pattern, recursive=True))
+    return sorted({os.path.normpath(path) for path in paths
+                   if path.lower().endswith(parsedocs.READING_LIST_TYPES)
+                   and not os.path.basename(path).startswith('~$')})
+
+
+def open_cache(cache_path):
+    global worker_cache
+    worker_cache = ExtractionCache(cache_path) if cache_path else None
+
+
+def count_citations(path, stared=False):
+    # returns (path, {citation: times cited}, error)
+    try:
+        counts = collections.Counter(
+            match.citation for match in parsedocs.iter_file_matches(path, cache=worker_cache)
+            if match.stared or not stared)
+    except Exception as exc:
+        return path, {}, repr(exc)
+    return path, dict(counts), None
+
+
+def extract_batch(patterns, stared=False, processes=None, cache_path=None):
+    """
+    Extracts every reading list matched by patterns, each a directory or
+    a glob, in a pool of processes. Returns a BatchResult whose citations
+    map each citation to the lists it was found in and the number of
+    times each cites it, in the order first seen, and whose errors map
+    the lists that could not be read to the error.
+    """
+    paths = find_reading_lists(patterns)
+    processes = min(processes or os.cpu_count() or 1, len(paths) or 1)
+    citations = {}
+    errors = {}
+
+    def merge(results):
+        for path, counts, error in results:
+            if error is not None:
+                errors[path] = error
+            for citation, count in counts.items():
+                citations.setdefault(citation, {})[path] = count
+
+    if processes == 1:
+        open_cache(cache_path)
+        try:
+            merge(count_citations(path, stared) for path in paths)
+        finally:
+            if worker_cache is not None:
+                worker_cache.close()
+            open_cache(None)
+    else:
+        # spawned like the other pools, as forking from threads is unsafe
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(processes, initializer=open_cache, initargs=(cache_path,)) as pool:
+            merge(pool.imap(functools.partial(count_citations, stared=stared), paths))
+    return BatchResult(citations, errors)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='batchextract',
+        description='Extract the citations of many reading lists at once.')
+    parser.add_argument('patterns', nargs='+', metavar='DIR_OR_GLOB',
+                        help='directories to search for .docx and .pdf files, or globs')
+    parser.add_argument('--stared-only', action='store_true',
+                        help='only extract citations marked with an asterisk')
+    parser.add_argument('-p', '--processes', type=int,
+                        help='defaults to the number of CPUs')
+    parser.add_argument('--extraction-cache', metavar='PATH',
+                        help='keep the citations found in each reading list in '
+                        'this SQLite file')
+    parser.add_argument('--plain', action='store_true',
+                        help='write one citation per line, for lrldcli')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write to, defaults to stdout')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = extract_batch(args.patterns, args.stared_only, args.processes,
+                           args.extraction_cache)
+    for path, error in result.errors.items():
+        print(f'batchextract: could not read {path}: {error}', file=sys.stderr)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        for citation, lists in result.citations.items():
+            if args.plain:
+                output.write(citation + '\n')
+            else:
+                output.write(json.dumps({'citation': citation, 'count': sum(lists.values()),
+                                         'lists': lists}) + '\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if result.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import argparse
+import itertools
+import os
+import sys
+import timeit
+import tracemalloc
+from bs4 import BeautifulSoup
+
+# run from the project root: python benchmarks/bench_extractors.py
+sys.path.insert(0, os.getcwd())
+import extractors  # noqa: E402
+
+PAGES_DIR = 'tests/pages'
+
+
+def load_page(name):
+    with open(os.path.join(PAGES_DIR, name), encoding='utf-8') as page:
+        return page.read()
+
+
+def inflate_case_page(page, factor):
+    # repeat the judgment body to get the size of a long reported judgment
+    head, body = page.split('<div class="Judg-Heading-1">', 1)
+    body, tail = body.rsplit('</div>\n</div>\n</body>', 1)
+    return head + ('<div class="Judg-Heading-1">' + body) * factor + '</div>\n</div>\n</body>' + tail
+
+
+# the BeautifulSoup code paths LawnetBrowser used before extractors
+def bs4_case_page(page):
+    case_soup = BeautifulSoup(page, 'lxml')
+    citations_found = []
+    for citation in case_soup.find_all('span', {'class': 'Citation offhyperlink'}):
+        try:
+            citations_found.append(citation.find('a').contents)
+        except Exception:
+            citations_found.append(citation.contents)
+    citations_found = [str(citation) for citation in
+                       itertools.chain.from_iterable(citations_found)]
+
+    case_soup = BeautifulSoup(page, 'lxml')
+    pdf_link = None
+    for link in case_soup.find_all('a'):
+        if 'PDF' in link.text and link['href'] != '#':
+            pdf_link = link['href']
+            break
+    return extractors.CasePage(citations_found, pdf_link)
+
+
+def bs4_search_results(page):
+    search_soup = BeautifulSoup(page, 'lxml')
+    return [(case['onclick'], case.text.strip())
+            for case in search_soup.select('.document-title')]
+
+
+def bs4_inputs(page, names):
+    soup = BeautifulSoup(page, 'lxml')
+    return {name: soup.find('input', {'name': name}).get('value') for name in names}
+
+
+def measure(function, page, *args, repeat):
+    # the peak is of the Python heap, libxml2's own allocations are not traced
+    seconds = min(timeit.repeat(lambda: function(page, *args), number=1, repeat=repeat))
+    tracemalloc.start()
+    function(page, *args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare page extractors')
+    parser.add_argument('--inflate', type=int, default=10,
+                        help='times to repeat the judgment body of the case page')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    case_page = inflate_case_page(load_page('case-page.html'), args.inflate)
+    saml_names = ['SAMLRequest', 'RelayState']
+    cases = [
+        ('case page', case_page, bs4_case_page, extractors.extract_case_page, ()),
+        ('search results', load_page('search-results.html'), bs4_search_results,
+         extractors.extract_search_results, ()),
+        ('saml form', load_page('saml-request.html'), bs4_inputs,
+         extractors.extract_inputs, (saml_names,)),
+    ]
+
+    print(f'{"page":<16}{"size":>10}{"bs4 ms":>10}{"lxml ms":>10}{"speedup":>9}'
+          f'{"bs4 heap":>11}{"lxml heap":>11}')
+    for name, page, legacy, extractor, extra in cases:
+        assert legacy(page, *extra) == extractor(page, *extra), name
+        legacy_time, legacy_peak = measure(legacy, page, *extra, repeat=args.repeat)
+        time, peak = measure(extractor, page, *extra, repeat=args.repeat)
+        print(f'{name:<16}{len(page) // 1024:>8}KB{legacy_time * 1000:>10.1f}'
+              f'{time * 1000:>10.1f}{legacy_time / time:>8.1f}x'
+              f'{legacy_peak // 1024:>9}KB{peak // 1024:>9}KB')
+
+
+if __name__ == '__main__':
+    main()
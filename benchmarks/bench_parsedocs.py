@@ -0,0 +1,85 @@
+import argparse
+import os
+import re
+import sys
+import timeit
+
+# run from the project root: python benchmarks/bench_parsedocs.py
+sys.path.insert(0, os.getcwd())
+import citations  # noqa: E402
+import parsedocs  # noqa: E402
+
+TEST_DIR = 'tests/test-cases'
+
+# the stared pattern start_extract matched with before the scanner
+LEGACY_STARED_PATTERN = re.compile(r'\*[^\[\]]*([\[(][1-2]\d{3}(?:-[1-2]\d{3})?[\])]\s[\d\s]*[LR]+\s\d+\s[EqCP]+\s+\d+)|\*[^\[\]]*([\[(][1-2]\d{3}(?:-[1-2]\d{3})?[\])]\s[\d\s]*[SLR()WMJChAFQBtra\.]+\s\d+)|\*[^\[\]]*(\[[1-2]\d{3}(?:-[1-2]\d{3})?\]\s[A-Za-z()\.]+\s\d+)')
+
+
+def load_blocks(repeat):
+    # the test-case reading lists, repeated to the size of a long course pack
+    blocks = []
+    for name in sorted(os.listdir(TEST_DIR)):
+        if name.endswith('.docx'):
+            blocks.extend(parsedocs.docx_blocks(os.path.join(TEST_DIR, name)))
+    return blocks * repeat
+
+
+# the matching start_extract did before the scanner: a findall per
+# paragraph for each mode, keeping the second group of stared matches
+def findall_both_modes(blocks):
+    texts = [text for _, text in blocks]
+    found = set()
+    for text in texts:
+        found.update(re.findall(citations.SCAN_PATTERN, text))
+    stared = set()
+    for text in texts:
+        stared.update(item[1] for item in re.findall(LEGACY_STARED_PATTERN, text))
+    return ({citations.normalise(citation) for citation in found},
+            {citations.normalise(citation) for citation in stared} - {''})
+
+
+def scan_both_modes(blocks):
+    found = set()
+    stared = set()
+    for match in parsedocs.scan_blocks(blocks):
+        found.add(match.citation)
+        if match.stared:
+            stared.add(match.citation)
+    return found, stared
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare citation scanners')
+    parser.add_argument('--repeat', type=int, default=200,
+                        help='times to repeat the test-case reading lists')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    blocks = load_blocks(args.repeat)
+    size = sum(len(text) for _, text in blocks) / 1024 / 1024
+    legacy = findall_both_modes(blocks)
+    scanned = scan_both_modes(blocks)
+    assert scanned[0] == legacy[0]
+    # the old stared pattern only kept one of its three alternatives
+    assert scanned[1] >= legacy[1]
+
+    print(f'{len(blocks)} blocks, {size:.1f}MB, {len(scanned[0])} citations, '
+          f'{len(scanned[1])} stared')
+    print(f'{"scanner":<10}{"seconds":>10}{"MB/s":>8}')
+    for name, function in (('findall', findall_both_modes), ('single', scan_both_modes)):
+        seconds = min(timeit.repeat(lambda: function(blocks), number=1, repeat=args.runs))
+        print(f'{name:<10}{seconds:>10.3f}{size / seconds:>8.1f}')
+
+    print(f'{"reader":<10}{"document":>20}{"ms":>8}')
+    for name in sorted(os.listdir(TEST_DIR)):
+        if name.endswith('.docx'):
+            docx_path = os.path.join(TEST_DIR, name)
+            for reader, function in (('python-docx', parsedocs.python_docx_blocks),
+                                     ('streamed', parsedocs.docx_blocks)):
+                seconds = min(timeit.repeat(lambda: function(docx_path), number=1,
+                                            repeat=args.runs))
+                print(f'{reader:<12}{name:>18}{seconds * 1000:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# run from the project root: python benchmarks/bench_parsepdf.py
+sys.path.insert(0, os.getcwd())
+import parsedocs  # noqa: E402
+import parsepdf  # noqa: E402
+from reportlab.lib.styles import getSampleStyleSheet  # noqa: E402
+from reportlab.platypus import Paragraph, SimpleDocTemplate  # noqa: E402
+from xml.sax.saxutils import escape  # noqa: E402
+
+TEST_DIR = 'tests/test-cases'
+
+
+def build_reading_list(pdf_path, repeat):
+    # the test-case reading lists typeset as a PDF, so that citations wrap
+    # across lines and pages as they do in real course packs
+    style = getSampleStyleSheet()['Normal']
+    paragraphs = []
+    for name in sorted(os.listdir(TEST_DIR)):
+        if name.endswith('.docx'):
+            paragraphs.extend(parsedocs.extract_docx(os.path.join(TEST_DIR, name)))
+    story = [Paragraph(escape(text), style) for text in paragraphs * repeat if text.strip()]
+    SimpleDocTemplate(pdf_path).build(story)
+
+
+def citations(pdf_path, fast, processes, stared):
+    text = parsepdf.pdf_to_text(pdf_path, fast, processes).replace('\n', ' ')
+    return {match.citation for match in parsedocs.scan_blocks([('text', text)])
+            if match.stared or not stared}
+
+
+def peak_memory(function, *args):
+    # the peak of the Python heap while function runs
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare PDF extraction modes')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='times to repeat the test-case reading lists')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pdf_dir:
+        pdf_path = os.path.join(pdf_dir, 'reading-list.pdf')
+        build_reading_list(pdf_path, args.repeat)
+        pages = parsepdf.count_pages(pdf_path)
+        modes = [('layout', False, 1), ('fast', True, 1),
+                 (f'fast x{args.processes}', True, args.processes)]
+
+        print(f'{pages} pages')
+        print(f'{"mode":<12}{"seconds":>10}{"speedup":>9}{"citations":>11}')
+        expected = None
+        for name, fast, processes in modes:
+            start = time.perf_counter()
+            found = citations(pdf_path, fast, processes, stared=False)
+            seconds = time.perf_counter() - start
+            stared = citations(pdf_path, fast, processes, stared=True)
+            if expected is None:
+                expected, expected_stared, baseline = found, stared, seconds
+            assert found == expected, name
+            assert stared == expected_stared, name
+            print(f'{name:<12}{seconds:>10.2f}{baseline / seconds:>8.1f}x{len(found):>11}')
+
+        # reading the whole PDF before matching, against matching page by page
+        joined = peak_memory(citations, pdf_path, True, 1, False)
+        streamed = peak_memory(parsedocs.start_extract, pdf_path)
+        assert set(parsedocs.start_extract(pdf_path)) == expected
+        print(f'peak heap: joined {joined // 1024}KB, streamed {streamed // 1024}KB')
+
+
+if __name__ == '__main__':
+    main()
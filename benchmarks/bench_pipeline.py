@@ -0,0 +1,147 @@
+import argparse
+import contextlib
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import tempfile
+import time
+
+# run from the project root: python benchmarks/bench_pipeline.py
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.join(os.getcwd(), 'tests'))
+from fake_lawnet import FakeLawnet, configure, generate_cases  # noqa: E402
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def create_browser(engine, workers, adaptive_limits):
+    # imported here so that only the benchmark processes load the engines
+    if engine == 'async':
+        from asynclawnet import AsyncLawnetBrowser
+        return AsyncLawnetBrowser(max_in_flight=workers, adaptive_limits=adaptive_limits)
+    from lawnetsearch import LawnetBrowser
+    return LawnetBrowser(workers=workers, adaptive_limits=adaptive_limits)
+
+
+def time_cases(browser, latencies):
+    # records how long each case takes from the moment a worker starts on it
+    if hasattr(browser, 'async_download_case_or_fail'):
+        download = browser.async_download_case_or_fail
+
+        async def timed_download(case_citation):
+            start = time.perf_counter()
+            try:
+                return await download(case_citation)
+            finally:
+                latencies.append(time.perf_counter() - start)
+        browser.async_download_case_or_fail = timed_download
+    else:
+        download = browser.download_case_or_fail
+
+        def timed_download(case_citation):
+            start = time.perf_counter()
+            try:
+                return download(case_citation)
+            finally:
+                latencies.append(time.perf_counter() - start)
+        browser.download_case_or_fail = timed_download
+
+
+def run_batch(endpoints, citation_list, engine, workers, adaptive_limits, results):
+    # runs in its own process so that the peak RSS is the engine's alone
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results.put(download_batch(endpoints, citation_list, engine, workers,
+                                   adaptive_limits))
+
+
+def download_batch(endpoints, citation_list, engine, workers, adaptive_limits):
+    browser = configure(create_browser(engine, workers, adaptive_limits), endpoints)
+    latencies = []
+    time_cases(browser, latencies)
+    with tempfile.TemporaryDirectory() as download_dir:
+        browser.update_download_info('student', 'password', 'smustu',
+                                     citation_list, download_dir)
+        assert browser.login_lawnet() == 'SUCCESS'
+        start = time.perf_counter()
+        statuses = [status for _, status in browser.download_cases(citation_list)]
+        statuses += [status for _, status in browser.pending_conversions()]
+        elapsed = time.perf_counter() - start
+    if engine == 'async':
+        browser.close()
+    if browser.renderer is not None:
+        browser.renderer.shutdown()
+    return {
+        'elapsed': elapsed,
+        'latencies': latencies,
+        'downloaded': sum('downloaded' in status for status in statuses),
+        'retries': sum(browser.run_stats()['retries'].values()),
+        # kilobytes on Linux
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Download batches from a local LawNet stand-in')
+    parser.add_argument('--sizes', default='10,100,1000',
+                        help='comma separated batch sizes')
+    parser.add_argument('--configs', default='threads:4,threads:10,threads:32,async:50',
+                        help='comma separated engine:workers pairs')
+    parser.add_argument('--fixed-limits', action='store_true',
+                        help='turn off the adaptive concurrency limits')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--pdf-size', type=int, default=256 * 1024)
+    parser.add_argument('--case-page-size', type=int, default=64 * 1024)
+    parser.add_argument('--html-ratio', type=float, default=0.0,
+                        help='share of neutral citations without a PDF')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    configs = [(engine, int(workers)) for engine, workers
+               in (config.split(':') for config in args.configs.split(','))]
+    cases = generate_cases(max(sizes), args.html_ratio)
+    lawnet = FakeLawnet(cases=cases, pdf_size=args.pdf_size,
+                        case_page_size=args.case_page_size, latency=args.latency,
+                        jitter=args.jitter, error_rate=args.error_rate).start()
+    context = multiprocessing.get_context('spawn')
+
+    print(f'{"engine":<8}{"workers":>8}{"cases":>7}{"ok":>7}{"cases/s":>9}'
+          f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"retries":>9}{"peak RSS":>11}')
+    try:
+        for size in sizes:
+            citation_list = [case.citations[0] for case in cases[:size]]
+            for engine, workers in configs:
+                results = context.Queue()
+                process = context.Process(target=run_batch, args=(
+                    lawnet.endpoints(), citation_list, engine, workers,
+                    not args.fixed_limits, results))
+                process.start()
+                result = None
+                while result is None:
+                    try:
+                        result = results.get(timeout=1)
+                    except queue.Empty:
+                        if not process.is_alive():
+                            raise RuntimeError(f'{engine}:{workers} batch failed')
+                process.join()
+                latencies = result['latencies']
+                print(f'{engine:<8}{workers:>8}{size:>7}{result["downloaded"]:>7}'
+                      f'{size / result["elapsed"]:>9.1f}'
+                      f'{percentile(latencies, 0.5) * 1000:>9.0f}'
+                      f'{percentile(latencies, 0.95) * 1000:>9.0f}'
+                      f'{percentile(latencies, 0.99) * 1000:>9.0f}'
+                      f'{result["retries"]:>9}{result["peak_rss"] // 1024:>9}MB')
+    finally:
+        lawnet.stop()
+
+
+if __name__ == '__main__':
+    main()
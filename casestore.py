@@ -0,0 +1,141 @@
+import hashlib
+import mmap
+import os
+import shutil
+import time
+
+from sqlitestore import SqliteStore
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser('~'), '.lrld', 'store')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Linux ioctl that clones a file's extents (reflink) on btrfs/xfs
+FICLONE = 0x40049409
+
+
+def file_sha256(file_path):
+    # mmap lets hashlib read the file without copying it into memory
+    sha_hasher = hashlib.sha256()
+    with open(file_path, 'rb') as case_file:
+        if os.fstat(case_file.fileno()).st_size > 0:
+            with mmap.mmap(case_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                sha_hasher.update(data)
+    return sha_hasher.hexdigest()
+
+
+def link_file(source, destination):
+    # hardlink, then reflink, then fall back to a plain copy
+    try:
+        os.link(source, destination)
+        return
+    except OSError:
+        pass
+    try:
+        import fcntl
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return
+    except (ImportError, OSError):
+        if os.path.exists(destination):
+            os.remove(destination)
+    shutil.copyfile(source, destination)
+
+
+class CaseStore(SqliteStore):
+    """
+    Content-addressed store of downloaded cases shared by every download
+    directory. Files are keyed by their SHA-256 and an index maps each
+    citation to the file it resolved to, so a repeat citation is linked
+    into the new directory without touching LawNet. Copies already
+    linked into download directories are unaffected by eviction.
+    """
+
+    TABLES = ('CREATE TABLE IF NOT EXISTS objects ('
+              'sha TEXT PRIMARY KEY, extension TEXT, size INTEGER, last_used REAL)',
+              'CREATE TABLE IF NOT EXISTS citations ('
+              'citation TEXT PRIMARY KEY, sha TEXT, filename TEXT)')
+    SIZED_TABLE = 'objects'
+    SIZED_KEY = 'sha'
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.store_dir = store_dir
+        os.makedirs(os.path.join(store_dir, 'objects'), exist_ok=True)
+        super().__init__(os.path.join(store_dir, 'index.sqlite3'), max_bytes)
+
+    def object_path(self, sha, extension):
+        return os.path.join(self.store_dir, 'objects', sha[:2], sha + extension)
+
+    def lookup(self, citation, verify=True):
+        # returns (object_path, filename + extension) or None
+        with self.lock:
+            row = self.db.execute(
+                'SELECT citations.sha, filename, extension FROM citations '
+                'JOIN objects ON objects.sha = citations.sha '
+                'WHERE citation = ?', (citation,)).fetchone()
+        if row is None:
+            return None
+        sha, filename, extension = row
+        object_path = self.object_path(sha, extension)
+        if not os.path.exists(object_path) or (
+                verify and file_sha256(object_path) != sha):
+            # the object was deleted or modified through a hardlink
+            self.remove(sha)
+            return None
+        with self.lock, self.db:
+            self.db.execute('UPDATE objects SET last_used = ? WHERE sha = ?',
+                            (time.time(), sha))
+        return object_path, filename + extension
+
+    def link_into(self, citation, download_dir):
+        entry = self.lookup(citation)
+        if entry is None:
+            return None
+        object_path, filename = entry
+        case_path = os.path.join(download_dir, filename)
+        if os.path.exists(case_path):
+            if os.path.samefile(object_path, case_path):
+                return case_path
+            os.remove(case_path)
+        link_file(object_path, case_path)
+        return case_path
+
+    def add(self, citation, case_path):
+        filename, extension = os.path.splitext(os.path.basename(case_path))
+        sha = file_sha256(case_path)
+        object_path = self.object_path(sha, extension)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            partial_path = object_path + '.part'
+            link_file(case_path, partial_path)
+            os.replace(partial_path, object_path)
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)',
+                            (sha, extension, os.path.getsize(object_path),
+                             time.time()))
+            self.db.execute('INSERT OR REPLACE INTO citations VALUES (?, ?, ?)',
+                            (citation, sha, filename))
+        self.evict()
+        return sha
+
+    def remove(self, sha):
+        with self.lock, self.db:
+            row = self.db.execute('SELECT extension FROM objects WHERE sha = ?',
+                                  (sha,)).fetchone()
+            self.db.execute('DELETE FROM objects WHERE sha = ?', (sha,))
+            self.db.execute('DELETE FROM citations WHERE sha = ?', (sha,))
+        if row is not None:
+            object_path = self.object_path(sha, row[0])
+            if os.path.exists(object_path):
+                os.remove(object_path)
+
+    def verify(self):
+        # returns the hashes of objects that were missing or corrupt
+        with self.lock:
+            rows = self.db.execute('SELECT sha, extension FROM objects').fetchall()
+        bad = []
+        for sha, extension in rows:
+            object_path = self.object_path(sha, extension)
+            if not os.path.exists(object_path) or file_sha256(object_path) != sha:
+                self.remove(sha)
+                bad.append(sha)
+        return bad
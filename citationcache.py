@@ -0,0 +1,73 @@
+import os
+import time
+from collections import namedtuple
+
+import citations
+from sqlitestore import SqliteStore
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.lrld', 'citations.sqlite3')
+DEFAULT_TTL = 30 * 24 * 60 * 60
+DEFAULT_NEGATIVE_TTL = 24 * 60 * 60
+
+# reporter is the citation LawNet files the case under (citations_found[0]
+# on its case page), which is what duplicates are detected against
+Resolution = namedtuple('Resolution', ['doc_id', 'case_name', 'reporter', 'pdf_url', 'found'])
+
+NOT_FOUND = Resolution(None, None, None, None, False)
+
+
+def normalise_key(citation):
+    return citations.normalise(citation)
+
+
+class CitationCache(SqliteStore):
+    """
+    Persistent map of citation to the LawNet document it resolved to, so
+    that recurring citations skip the search POST and case page fetch.
+    Citations LawNet could not find are cached for a shorter time.
+    """
+
+    TABLES = ('CREATE TABLE IF NOT EXISTS resolutions ('
+              'citation TEXT PRIMARY KEY, doc_id TEXT, case_name TEXT, '
+              'reporter TEXT, pdf_url TEXT, found INTEGER, resolved_at REAL)',)
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        super().__init__(cache_path)
+
+    def get(self, citation):
+        with self.lock:
+            row = self.db.execute(
+                'SELECT doc_id, case_name, reporter, pdf_url, found, resolved_at '
+                'FROM resolutions WHERE citation = ?',
+                (normalise_key(citation),)).fetchone()
+        if row is None:
+            return None
+        resolution = Resolution(*row[:4], bool(row[4]))
+        ttl = self.ttl if resolution.found else self.negative_ttl
+        if time.time() - row[5] > ttl:
+            return None
+        return resolution
+
+    def put(self, citation, resolution):
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO resolutions VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (normalise_key(citation), resolution.doc_id, resolution.case_name,
+                 resolution.reporter, resolution.pdf_url, int(resolution.found),
+                 time.time()))
+
+    def invalidate(self, citation):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM resolutions WHERE citation = ?',
+                            (normalise_key(citation),))
+
+    def purge_expired(self):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute(
+                'DELETE FROM resolutions WHERE '
+                '(found = 1 AND resolved_at < ?) OR (found = 0 AND resolved_at < ?)',
+                (now - self.ttl, now - self.negative_ttl))
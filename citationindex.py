@@ -0,0 +1,74 @@
+import os
+
+from citationcache import normalise_key
+from sqlitestore import SqliteStore
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.lrld', 'parallels.sqlite3')
+
+
+class CitationIndex(SqliteStore):
+    """
+    Persistent index of parallel citations, built from the citations
+    listed on every case page parsed so far. Citations that appear on the
+    same case page name the same case, and are kept together in a
+    union-find forest so that groups which share a citation merge. Each
+    group keeps its citations in the order they were first seen, which
+    for a single case page puts LawNet's filing citation first.
+    """
+
+    TABLES = ('CREATE TABLE IF NOT EXISTS parallels ('
+              'citation TEXT, parallel TEXT, PRIMARY KEY (citation, parallel))',)
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        super().__init__(index_path)
+        self.parents = {}
+        # the members of each root, in the order they were first seen
+        self.groups = {}
+        for citation, parallel in self.db.execute(
+                'SELECT citation, parallel FROM parallels ORDER BY rowid'):
+            self.union(parallel, citation)
+
+    def find(self, citation):
+        root = citation
+        while self.parents[root] != root:
+            root = self.parents[root]
+        # path compression
+        while self.parents[citation] != root:
+            self.parents[citation], citation = root, self.parents[citation]
+        return root
+
+    def union(self, first, second):
+        for citation in (first, second):
+            if citation not in self.parents:
+                self.parents[citation] = citation
+                self.groups[citation] = [citation]
+        first_root, second_root = self.find(first), self.find(second)
+        if first_root == second_root:
+            return
+        # the larger group absorbs the smaller one, and keeps its order
+        if len(self.groups[first_root]) < len(self.groups[second_root]):
+            first_root, second_root = second_root, first_root
+        self.parents[second_root] = first_root
+        self.groups[first_root].extend(self.groups.pop(second_root))
+
+    def add(self, citations):
+        # records citations found on one case page as parallels of the first
+        citations = [normalise_key(citation) for citation in citations]
+        if not citations:
+            return
+        with self.lock, self.db:
+            for citation in citations:
+                if (citation in self.parents and citations[0] in self.parents
+                        and self.find(citation) == self.find(citations[0])):
+                    continue
+                self.union(citations[0], citation)
+                self.db.execute('INSERT OR IGNORE INTO parallels VALUES (?, ?)',
+                                (citation, citations[0]))
+
+    def parallels(self, citation):
+        # every citation of the case, itself included, or [] if unknown
+        citation = normalise_key(citation)
+        with self.lock:
+            if citation not in self.parents:
+                return []
+            return list(self.groups[self.find(citation)])
@@ -0,0 +1,124 @@
+import functools
+import re
+from collections import namedtuple
+
+# [year] volume reporter page, e.g. [2016] 3 SLR 621 or [2015] SGCA 12;
+# the volume is optional and the reporter may run to several words
+CITATION_PATTERN = re.compile(
+    r'[\[(]?(\d{4})(?:-\d{4})?[\])]?\s+(?:(\d+)\s+)?(\S.*?)\s+(\d+)')
+
+# citations as they are written in running text, which reading lists
+# are scanned for; CITATION_PATTERN then parses them
+SCAN_PATTERN = re.compile(r'[\[\(][1-2]\d{3}(?:\-[1-2]\d{3})?[\]\)]\s[\d\s]*[LR]+\s\d+\s[EqCP]+\s+\d+|[\[\(][1-2]\d{3}(?:\-[1-2]\d{3})?[\]\)]\s[\d\s]*[SLR()WLRMLJChACFQBStra\.]+\s\d+|\[[1-2]\d{3}(?:\-[1-2]\d{3})?\]\s[A-Za-z()\.]+\s\d+')
+
+
+class Citation():
+    __slots__ = ('text', 'year', 'volume', 'reporter', 'page')
+
+    def __init__(self, text, year, volume, reporter, page):
+        self.text = text
+        self.year = year
+        self.volume = volume
+        self.reporter = reporter
+        self.page = page
+
+    def __repr__(self):
+        return f'Citation({self.text!r})'
+
+    def hyphenated(self):
+        return self.text.replace(' ', '-')
+
+    def padded(self):
+        # LawNet stores some reports under a four digit page number
+        head, _, page = self.text.rpartition(' ')
+        return f'{head} {page.zfill(4)}'
+
+
+def normalise(text):
+    # citations are written, found and looked up with single spaces
+    return ' '.join(text.split())
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_citation(text):
+    # returns None for text that does not look like a citation
+    match = CITATION_PATTERN.fullmatch(normalise(text))
+    if match is None:
+        return None
+    year, volume, reporter, page = match.groups()
+    return Citation(match.group(), int(year), volume and int(volume), reporter, int(page))
+
+
+def as_written(citation):
+    return citation.text
+
+
+def padded_page(citation):
+    return citation.padded()
+
+
+def ssar_resource(citation):
+    # reports from 1985 to 2010 are filed under one combined volume
+    if 1985 <= citation.year <= 2010:
+        return '(1985-2010) ' + citation.padded().split(' ', 1)[1]
+    return citation.padded()
+
+
+def wlr_resource(citation):
+    if 2008 <= citation.year <= 2020:
+        return citation.hyphenated().replace('[', '').replace(']', '')
+    return citation.text
+
+
+def ac_name(citation):
+    if citation.year < 2008:
+        return citation.hyphenated()
+    return citation.text
+
+
+def without_dots(citation):
+    return citation.text.replace('A.C.', 'AC').replace('Ch.', 'Ch')
+
+
+# reported: LawNet holds the report as a PDF whose URL can be worked out
+# from the citation; file_name and resource give the pdfFileName and the
+# resource path of that URL. Reporters that are not listed, such as the
+# neutral SGCA and SGHC citations, are found through their case page.
+Reporter = namedtuple('Reporter', ['reported', 'file_name', 'resource'])
+
+REPORTERS = {
+    'SLR': Reporter(True, as_written, padded_page),
+    'SLR(R)': Reporter(True, as_written, padded_page),
+    'SSLR': Reporter(True, as_written, padded_page),
+    'FMSLR': Reporter(True, as_written, padded_page),
+    'SSAR': Reporter(True, as_written, ssar_resource),
+    'WLR': Reporter(True, as_written, wlr_resource),
+    'AC': Reporter(True, ac_name, ac_name),
+    'A.C.': Reporter(True, without_dots, without_dots),
+    'Ch': Reporter(True, as_written, as_written),
+    'Ch.': Reporter(True, without_dots, without_dots),
+}
+
+UNLISTED = Reporter(False, as_written, as_written)
+
+
+def get_reporter(citation):
+    # SLR(R) and WLR (D) style series fall back to their main series
+    reporter = REPORTERS.get(citation.reporter)
+    if reporter is None:
+        reporter = REPORTERS.get(citation.reporter.split('(')[0].strip(), UNLISTED)
+    return reporter
+
+
+def is_reported(text):
+    citation = parse_citation(text)
+    return citation is not None and get_reporter(citation).reported
+
+
+def pdf_names(text):
+    # returns the pdfFileName and resource name of a report's PDF
+    citation = parse_citation(text)
+    if citation is None:
+        return text, text
+    reporter = get_reporter(citation)
+    return reporter.file_name(citation), reporter.resource(citation)
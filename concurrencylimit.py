@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+
+# status codes that mean LawNet or the proxy is struggling
+OVERLOAD_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AIMDLimit():
+    """
+    Additive increase / multiplicative decrease of a concurrency limit.
+    The limit grows by one after a full window of successful requests
+    whose latency stays close to the best latency seen, and is cut on
+    errors, overload statuses or responses that are much slower.
+    """
+
+    def __init__(self, initial=1, min_limit=1, max_limit=10, backoff=0.5,
+                 latency_tolerance=2.0, enabled=True):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.enabled = enabled
+        self.in_flight = 0
+        self.latency = None
+        self.baseline = None
+        self.window = 0
+        self.successes = 0
+        self.failures = 0
+
+    def update(self, latency, ok):
+        if ok:
+            self.successes += 1
+            self.latency = latency if self.latency is None else (
+                0.8 * self.latency + 0.2 * latency)
+            if self.baseline is None or self.latency < self.baseline:
+                self.baseline = self.latency
+            else:
+                # let the baseline drift so a permanently slower LawNet
+                # does not keep the limit pinned down
+                self.baseline += (self.latency - self.baseline) * 0.01
+        else:
+            self.failures += 1
+
+        if not self.enabled:
+            return
+        slow = ok and self.latency > self.baseline * self.latency_tolerance
+        if not ok or slow:
+            # only back off once per window of in-flight requests
+            if self.window >= 0:
+                self.limit = max(self.min_limit, int(self.limit * self.backoff))
+                self.window = -self.limit
+            else:
+                self.window += 1
+        else:
+            self.window += 1
+            if self.window >= self.limit:
+                self.limit = min(self.max_limit, self.limit + 1)
+                self.window = 0
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'latency': self.latency,
+            'baseline': self.baseline,
+            'successes': self.successes,
+            'failures': self.failures,
+        }
+
+
+class Slot():
+    def __init__(self):
+        self.ok = True
+        # seconds spent waiting for the slot to free up
+        self.waited = 0
+
+    def record(self, status):
+        if status in OVERLOAD_STATUSES:
+            self.ok = False
+
+
+class AdaptiveLimiter(AIMDLimit):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        slot = Slot()
+        wait_start = time.monotonic()
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+        start = time.monotonic()
+        slot.waited = start - wait_start
+        try:
+            yield slot
+        except Exception:
+            slot.ok = False
+            raise
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.update(time.monotonic() - start, slot.ok)
+                self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            return super().stats()
+
+
+class AsyncSlot(Slot):
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+        self.start = None
+
+    async def __aenter__(self):
+        limiter = self.limiter
+        if limiter.condition is None:
+            limiter.condition = asyncio.Condition()
+        wait_start = time.monotonic()
+        async with limiter.condition:
+            await limiter.condition.wait_for(
+                lambda: limiter.in_flight < limiter.limit)
+            limiter.in_flight += 1
+        self.start = time.monotonic()
+        self.waited = self.start - wait_start
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        limiter = self.limiter
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.ok = False
+        async with limiter.condition:
+            limiter.in_flight -= 1
+            limiter.update(time.monotonic() - self.start, self.ok)
+            limiter.condition.notify_all()
+
+
+class AsyncAdaptiveLimiter(AIMDLimit):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # created lazily so that it binds to the running event loop
+        self.condition = None
+
+    def slot(self):
+        return AsyncSlot(self)
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+
+from Cryptodome.Cipher import AES
+from Cryptodome.Hash import SHA256
+from Cryptodome.Protocol.KDF import PBKDF2
+from Cryptodome.Random import get_random_bytes
+
+DEFAULT_COOKIE_PATH = os.path.join(os.path.expanduser('~'), '.lrld', 'cookies.bin')
+# libproxy session cookies carry no expiry, so assume they last a working day
+DEFAULT_MAX_AGE = 8 * 60 * 60
+
+FILE_MAGIC = b'LRLDC1'
+SALT_SIZE = 16
+NONCE_SIZE = 16
+TAG_SIZE = 16
+KDF_ITERATIONS = 100000
+
+
+class CookieStore():
+    """
+    Keeps the authenticated LawNet cookies between runs, encrypted with
+    AES-GCM under a key derived from the user's password. Only the same
+    username and password can read them back, and they are discarded
+    once the earliest cookie expiry has passed.
+    """
+
+    def __init__(self, cookie_path=DEFAULT_COOKIE_PATH, max_age=DEFAULT_MAX_AGE):
+        self.cookie_path = cookie_path
+        self.max_age = max_age
+
+    def derive_key(self, username, password, salt):
+        return PBKDF2(password, salt + username.encode('utf-8'), 32,
+                      count=KDF_ITERATIONS, hmac_hash_module=SHA256)
+
+    def save(self, cookies, username, password):
+        # cookies is a list of dicts with name, value, domain, path,
+        # secure and expires keys
+        expiries = [cookie['expires'] for cookie in cookies if cookie.get('expires')]
+        expires_at = min(expiries + [time.time() + self.max_age])
+        payload = json.dumps({'username': username, 'expires_at': expires_at,
+                              'cookies': cookies}).encode('utf-8')
+
+        salt = get_random_bytes(SALT_SIZE)
+        nonce = get_random_bytes(NONCE_SIZE)
+        cipher = AES.new(self.derive_key(username, password, salt),
+                         AES.MODE_GCM, nonce=nonce)
+        ciphertext, tag = cipher.encrypt_and_digest(payload)
+
+        cookie_dir = os.path.dirname(self.cookie_path)
+        if cookie_dir:
+            os.makedirs(cookie_dir, exist_ok=True)
+        partial_path = self.cookie_path + '.part'
+        fd = os.open(partial_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as cookie_file:
+            cookie_file.write(FILE_MAGIC + salt + nonce + tag + ciphertext)
+        os.replace(partial_path, self.cookie_path)
+
+    def load(self, username, password):
+        # returns the saved cookies, or None if they are missing, expired,
+        # belong to another user or cannot be decrypted
+        try:
+            with open(self.cookie_path, 'rb') as cookie_file:
+                data = cookie_file.read()
+        except OSError:
+            return None
+        if not data.startswith(FILE_MAGIC):
+            return None
+        data = data[len(FILE_MAGIC):]
+        salt = data[:SALT_SIZE]
+        nonce = data[SALT_SIZE:SALT_SIZE + NONCE_SIZE]
+        tag = data[SALT_SIZE + NONCE_SIZE:SALT_SIZE + NONCE_SIZE + TAG_SIZE]
+        ciphertext = data[SALT_SIZE + NONCE_SIZE + TAG_SIZE:]
+        cipher = AES.new(self.derive_key(username, password, salt),
+                         AES.MODE_GCM, nonce=nonce)
+        try:
+            payload = json.loads(cipher.decrypt_and_verify(ciphertext, tag))
+        except ValueError:
+            return None
+        if payload['username'] != username or payload['expires_at'] < time.time():
+            return None
+        return payload['cookies']
+
+    def clear(self):
+        if os.path.exists(self.cookie_path):
+            os.remove(self.cookie_path)
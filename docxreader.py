@@ -0,0 +1,107 @@
+import zipfile
+from lxml import etree
+
+from extractors import clear_element
+
+# Streaming reader for docx reading lists. The document, footnotes and
+# endnotes parts are read straight out of the zip with lxml's iterparse,
+# and each paragraph and table row is discarded once its text is taken,
+# so a long reading list is never held as a tree. Text boxes are read
+# too, which python-docx leaves out.
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+PARTS = [('word/document.xml', None), ('word/footnotes.xml', 'footnote'),
+         ('word/endnotes.xml', 'endnote')]
+
+# run content as python-docx turns it into text
+RUN_TEXT = {W + 'tab': '\t', W + 'ptab': '\t', W + 'br': '\n', W + 'cr': '\n',
+            W + 'noBreakHyphen': '-'}
+
+# elements whose subtrees can be dropped once they close
+DISCARDED_TAGS = {W + 'p', W + 'tr', W + 'tbl', W + 'footnote', W + 'endnote'}
+
+# errors that mean a document cannot be streamed
+READ_ERRORS = (zipfile.BadZipFile, KeyError, etree.XMLSyntaxError)
+
+
+def iter_blocks(filepath):
+    """
+    Yields (location, text) for each paragraph, table cell, text box
+    paragraph, footnote paragraph and endnote paragraph, in document
+    order. A table cell gives one block, its paragraphs joined by
+    newlines as in python-docx, and a merged cell is read once.
+    """
+    with zipfile.ZipFile(filepath) as docx:
+        names = set(docx.namelist())
+        for part, note in PARTS:
+            if part in names or note is None:
+                with docx.open(part) as xml:
+                    yield from iter_part_blocks(xml, note)
+
+
+def iter_part_blocks(xml, note=None):
+    # the text of each open paragraph, innermost last
+    paragraphs = []
+    # the open body, note, table, cell and text box, innermost last
+    frames = [{'location': '', 'tables': 0}]
+    body_paragraphs = 0
+    text_boxes = 0
+    fallback = 0
+
+    for event, element in etree.iterparse(xml, events=('start', 'end')):
+        tag = element.tag
+        if tag == MC_FALLBACK:
+            # the same content as the choice before it, for older readers
+            fallback += 1 if event == 'start' else -1
+            continue
+        if fallback:
+            continue
+        frame = frames[-1]
+
+        if event == 'start':
+            if tag == W + 'p':
+                paragraphs.append([])
+            elif tag == W + 'tbl':
+                frame['tables'] += 1
+                location = f"{frame['location']} table {frame['tables']}".strip()
+                frames.append({'location': location, 'rows': 0, 'cells': 0})
+            elif tag == W + 'tr':
+                frame['rows'] += 1
+                frame['cells'] = 0
+            elif tag == W + 'tc':
+                frame['cells'] += 1
+                location = f"{frame['location']} row {frame['rows']} cell {frame['cells']}"
+                frames.append({'location': location, 'tables': 0, 'texts': []})
+            elif tag == W + 'txbxContent':
+                text_boxes += 1
+                frames.append({'location': f'text box {text_boxes}', 'tables': 0})
+            elif note is not None and tag == W + note:
+                frames.append({'location': f"{note} {element.get(W + 'id')}", 'tables': 0})
+            continue
+
+        if tag == W + 't':
+            if paragraphs:
+                paragraphs[-1].append(element.text or '')
+        elif tag in RUN_TEXT:
+            # w:tab also sets tab stops in paragraph properties
+            if paragraphs and element.getparent().tag == W + 'r':
+                paragraphs[-1].append(RUN_TEXT[tag])
+        elif tag == W + 'p':
+            text = ''.join(paragraphs.pop())
+            if 'texts' in frame:
+                frame['texts'].append(text)
+            elif len(frames) > 1:
+                yield frame['location'], text
+            elif note is None:
+                body_paragraphs += 1
+                yield f'paragraph {body_paragraphs}', text
+        elif tag == W + 'tc':
+            frames.pop()
+            yield frame['location'], '\n'.join(frame['texts'])
+        elif tag == W + 'tbl' or tag == W + 'txbxContent' or (
+                note is not None and tag == W + note):
+            frames.pop()
+        if tag in DISCARDED_TAGS:
+            clear_element(element)
@@ -0,0 +1,65 @@
+import json
+import os
+import time
+
+from casestore import file_sha256
+from sqlitestore import SqliteStore
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.lrld', 'extractions.sqlite3')
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2
+
+
+class ExtractionCache(SqliteStore):
+    """
+    Persistent cache of the citations found in each reading list, keyed
+    by the SHA-256 of the file and the version of the extractor that
+    read it. A file whose size and mtime have not changed since it was
+    last hashed is not hashed again. The least recently used entries are
+    dropped once the cache grows past max_bytes.
+    """
+
+    TABLES = ('CREATE TABLE IF NOT EXISTS files ('
+              'path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, sha TEXT)',
+              'CREATE TABLE IF NOT EXISTS extractions ('
+              'sha TEXT, version TEXT, matches TEXT, size INTEGER, '
+              'last_used REAL, PRIMARY KEY (sha, version))')
+    SIZED_TABLE = 'extractions'
+    SIZED_KEY = 'sha, version'
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(cache_path, max_bytes)
+
+    def key(self, filepath):
+        # the file's SHA-256, hashed again only if its size or mtime changed
+        path = os.path.abspath(filepath)
+        stat = os.stat(path)
+        with self.lock:
+            row = self.db.execute('SELECT size, mtime, sha FROM files WHERE path = ?',
+                                  (path,)).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return row[2]
+        sha = file_sha256(path)
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                            (path, stat.st_size, stat.st_mtime_ns, sha))
+        return sha
+
+    def get(self, key, version):
+        # returns the matches stored for the file, or None
+        with self.lock, self.db:
+            row = self.db.execute(
+                'SELECT matches FROM extractions WHERE sha = ? AND version = ?',
+                (key, version)).fetchone()
+            if row is None:
+                return None
+            self.db.execute('UPDATE extractions SET last_used = ? '
+                            'WHERE sha = ? AND version = ?', (time.time(), key, version))
+        return json.loads(row[0])
+
+    def put(self, key, version, matches):
+        data = json.dumps(matches)
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?)',
+                            (key, version, data, len(data), time.time()))
+        self.evict()
+
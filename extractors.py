@@ -0,0 +1,86 @@
+from collections import namedtuple
+from lxml import etree
+
+# Targeted single-pass extraction from LawNet and SSO pages. Pages are
+# fed through lxml's pull parser and each subtree is discarded once it
+# has been looked at, so large judgment pages are never held as a tree.
+
+CasePage = namedtuple('CasePage', ['citations', 'pdf_link'])
+
+# elements whose subtrees can be dropped once they close
+DISCARDED_TAGS = {'p', 'div', 'table', 'tr', 'li', 'ul', 'ol', 'section'}
+
+
+def iter_elements(page, tags=None, chunk_size=64 * 1024):
+    if tags is None:
+        parser = etree.HTMLPullParser(events=('end',))
+    else:
+        parser = etree.HTMLPullParser(events=('end',), tag=tags | DISCARDED_TAGS)
+    for start in range(0, len(page), chunk_size):
+        parser.feed(page[start:start + chunk_size])
+        for _, element in parser.read_events():
+            yield element
+    parser.close()
+    for _, element in parser.read_events():
+        yield element
+
+
+def discard(element):
+    # subtrees inside links and spans are kept until those are extracted
+    if element.tag in DISCARDED_TAGS and next(
+            element.iterancestors('a', 'span'), None) is None:
+        clear_element(element)
+
+
+def clear_element(element):
+    # frees a subtree the pull parser has finished with
+    element.clear()
+    # drop references from the parent to subtrees already processed
+    while element.getprevious() is not None:
+        del element.getparent()[0]
+
+
+def element_text(element):
+    return ''.join(element.itertext())
+
+
+def has_class(element, class_name):
+    return class_name in (element.get('class') or '').split()
+
+
+def extract_case_page(page):
+    citations = []
+    pdf_link = None
+    for element in iter_elements(page, {'span', 'a'}):
+        if element.tag == 'span' and element.get('class') == 'Citation offhyperlink':
+            link = element.find('.//a')
+            citations.append(element_text(element if link is None else link))
+        elif element.tag == 'a' and pdf_link is None:
+            href = element.get('href')
+            if href and href != '#' and 'PDF' in element_text(element):
+                pdf_link = href
+        discard(element)
+    return CasePage(citations, pdf_link)
+
+
+def extract_search_results(page):
+    # returns (onclick, title) for every result title on the page
+    results = []
+    for element in iter_elements(page):
+        if has_class(element, 'document-title'):
+            results.append((element.get('onclick'), element_text(element).strip()))
+        discard(element)
+    return results
+
+
+def extract_inputs(page, names):
+    # returns the values of the named inputs, or None if any is missing
+    values = {}
+    for element in iter_elements(page, {'input'}):
+        name = element.get('name')
+        if element.tag == 'input' and name in names and name not in values:
+            values[name] = element.get('value')
+        discard(element)
+    if any(values.get(name) is None for name in names):
+        return None
+    return values
@@ -0,0 +1,113 @@
+import contextvars
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError,
+                                as_completed)
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import DISABLED
+
+
+def cleanup_html(source_html):
+    divider = "<div class=\"navi-container\"> </div>"
+    new_html = source_html.split(divider)[1]
+    return new_html
+
+
+def convert_html_file(html_path, pdf_path):
+    # imported here so that only the rendering processes load xhtml2pdf
+    from xhtml2pdf import pisa
+
+    with open(html_path, encoding='utf-8') as html_file:
+        new_html = cleanup_html(html_file.read())
+    partial_path = pdf_path + '.part'
+    with open(partial_path, 'w+b') as result_file:
+        result = pisa.CreatePDF(new_html, dest=result_file)
+    if result.err:
+        os.remove(partial_path)
+        raise ValueError(f'Unable to render {html_path}')
+    os.replace(partial_path, pdf_path)
+
+
+class HtmlRenderer():
+    """
+    Renders saved HTML case pages to PDF in separate processes, so that
+    pisa does not hold the GIL in the download workers or the UI.
+    The processes last the whole run, so xhtml2pdf is loaded once per
+    process rather than once per document, and one that runs past the
+    timeout is killed and replaced.
+    """
+
+    def __init__(self, workers=2, timeout=120, convert=convert_html_file,
+                 metrics=DISABLED):
+        self.timeout = timeout
+        self.convert = convert
+        self.metrics = metrics
+        # each thread only supervises one rendering process at a time
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # a pool of one process each, so that a stuck process is killed alone
+        self.processes = queue.Queue()
+        for _ in range(workers):
+            self.processes.put(self.start_process())
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+
+    def start_process(self):
+        # forking from a supervising thread is unsafe, so always spawn
+        return ProcessPoolExecutor(max_workers=1,
+                                   mp_context=multiprocessing.get_context('spawn'))
+
+    def kill_process(self, process):
+        # the executor cannot cancel a running call, so end its process
+        for worker in list(process._processes.values()):
+            worker.terminate()
+            worker.join()
+        process.shutdown(wait=False)
+
+    def render(self, html_path, pdf_path):
+        with self.metrics.span('render'):
+            return self.run_process(html_path, pdf_path)
+
+    def run_process(self, html_path, pdf_path):
+        process = self.processes.get()
+        try:
+            future = process.submit(self.convert, html_path, pdf_path)
+            try:
+                future.result(self.timeout)
+            except TimeoutError:
+                self.kill_process(process)
+                process = self.start_process()
+                partial_path = pdf_path + '.part'
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                return False
+            except BrokenProcessPool:
+                process = self.start_process()
+                return False
+            except Exception:
+                return False
+            return True
+        finally:
+            self.processes.put(process)
+
+    def submit(self, key, html_path, pdf_path):
+        # the render is attributed to the case that submitted it
+        future = self.executor.submit(contextvars.copy_context().run,
+                                      self.render, html_path, pdf_path)
+        with self.pending_lock:
+            self.pending[future] = key
+        return future
+
+    def results(self):
+        # yields (key, rendered) for every submitted document as it finishes
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+        for future in as_completed(pending):
+            yield pending[future], future.result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        while not self.processes.empty():
+            self.processes.get().shutdown(wait=True)
@@ -0,0 +1,192 @@
+import contextvars
+import json
+import os
+import threading
+import time
+
+JOURNAL_NAME = '.lrld-journal.jsonl'
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+# the journal entry of the case being worked on, so that the doc_id and
+# output file can be noted wherever in the pipeline they become known
+CURRENT_ENTRY = contextvars.ContextVar('journal_entry', default=None)
+
+
+def journal_path(download_dir):
+    return os.path.join(download_dir, JOURNAL_NAME)
+
+
+def is_success(status):
+    # duplicates are already covered by the case they duplicate
+    return ('downloaded' in status or status == 'PDF copied from case store.'
+            or status.startswith('Duplicate of'))
+
+
+def note(**fields):
+    # adds to the journal entry of the current case, if there is one
+    entry = CURRENT_ENTRY.get()
+    if entry is not None:
+        entry.fields.update(fields)
+
+
+class Entry():
+    __slots__ = ('journal', 'citation', 'fields', 'token')
+
+    def __init__(self, journal, citation):
+        self.journal = journal
+        self.citation = citation
+        self.fields = {}
+        self.token = None
+
+    def __enter__(self):
+        self.token = CURRENT_ENTRY.set(self)
+        return self
+
+    def finish(self, status):
+        # records how the case ended and passes its status on
+        state = DONE if is_success(status) else FAILED
+        if state == FAILED:
+            self.fields.setdefault('error', status)
+        self.journal.record(self.citation, state, status=status, **self.fields)
+        return status
+
+    def __exit__(self, exc_type, exc, traceback):
+        CURRENT_ENTRY.reset(self.token)
+        if exc is not None:
+            self.journal.record(self.citation, FAILED, error=repr(exc), **self.fields)
+        return False
+
+
+class Journal():
+    """
+    Append-only record of download batches, kept as JSON lines in the
+    download directory. Every change to a case is written as a new line
+    and synced to disk, so a run that is killed part way loses at most
+    the line it was writing, and the next run can skip the cases that
+    were completed. A running batch can also be paused, resumed or
+    cancelled; cancelled cases stay pending in the journal. A journal
+    without a path keeps nothing on disk.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        # the latest entry of each citation, merged with the ones before it
+        self.cases = {}
+        self.batch = 0
+        self.running = threading.Event()
+        self.running.set()
+        self.cancelled = False
+        if path is not None:
+            self.load()
+
+    def load(self):
+        try:
+            journal_file = open(self.path, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a line torn by a crash
+                    continue
+                self.apply(entry)
+
+    def apply(self, entry):
+        if 'citation' not in entry:
+            self.batch = max(self.batch, entry.get('batch', 0))
+            return
+        case = self.cases.setdefault(entry['citation'], {})
+        if entry.get('state') == PENDING:
+            # a new attempt, the last one's outcome no longer applies
+            case.pop('error', None)
+            case.pop('status', None)
+        case.update(entry)
+
+    def write(self, entries):
+        for entry in entries:
+            self.apply(entry)
+        if self.path is None:
+            return
+        lines = ''.join(json.dumps(entry) + '\n' for entry in entries)
+        journal_dir = os.path.dirname(self.path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as journal_file:
+            journal_file.write(lines)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+    def record(self, citation, state=None, **fields):
+        entry = {'citation': citation, 'batch': self.batch, 'time': time.time()}
+        if state is not None:
+            entry['state'] = state
+        entry.update(fields)
+        with self.lock:
+            self.write([entry])
+
+    def case(self, citation):
+        return Entry(self, citation)
+
+    def state(self, citation):
+        return self.cases.get(citation, {}).get('state')
+
+    def is_done(self, citation):
+        # a completed case whose file has since been deleted is not done
+        case = self.cases.get(citation, {})
+        case_path = case.get('file')
+        return case.get('state') == DONE and (case_path is None or os.path.exists(case_path))
+
+    def unfinished(self):
+        # citations of the latest batch that were not completed
+        return [citation for citation, case in self.cases.items()
+                if case['batch'] == self.batch and case.get('state') != DONE]
+
+    def start_batch(self, citations, skip_done=False):
+        """
+        Starts a new batch and returns the citations to download, each
+        recorded as pending as it is handed out. A list gives back a
+        list, anything else a generator. With skip_done, cases completed
+        in an earlier batch are left out.
+        """
+        with self.lock:
+            self.batch += 1
+            self.write([{'batch': self.batch, 'time': time.time()}])
+        self.running.set()
+        self.cancelled = False
+        if isinstance(citations, list):
+            citations = [citation for citation in citations
+                         if not (skip_done and self.is_done(citation))]
+            with self.lock:
+                self.write([{'citation': citation, 'batch': self.batch,
+                             'time': time.time(), 'state': PENDING}
+                            for citation in citations])
+            return citations
+        return self.queue(citations, skip_done)
+
+    def queue(self, citations, skip_done):
+        for citation in citations:
+            if not (skip_done and self.is_done(citation)):
+                self.record(citation, PENDING)
+                yield citation
+
+    def pause(self):
+        self.running.clear()
+
+    def resume(self):
+        self.running.set()
+
+    def cancel(self):
+        # cases already running finish, the rest are not started
+        self.cancelled = True
+        self.running.set()
+
+    def wait(self):
+        # blocks while the batch is paused; returns False once it is cancelled
+        self.running.wait()
+        return not self.cancelled
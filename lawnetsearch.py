@@ -1,36 +1,251 @@
 import re
 import os
-from bs4 import BeautifulSoup
 from xhtml2pdf import pisa
 from collections import namedtuple
 import requests
-import itertools
+from requests.adapters import HTTPAdapter
 import string
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from multiprocessing.dummy import Pool as ThreadPool
+from concurrencylimit import AdaptiveLimiter
+from retry import (RetryPolicy, CircuitBreaker, RetryableStatus,
+                   LawnetUnavailable, SessionExpired, SearchRejected)
+from citationcache import Resolution, NOT_FOUND
+from htmlrender import HtmlRenderer, cleanup_html
+from metrics import DISABLED
+from journal import Journal
+import citations
+import extractors
+import journal
 
 SearchResult = namedtuple('SearchResult', ['case_url', 'case_name'])
 
+PDF_HEADER = b'%PDF'
+
+DEFAULT_DOWNLOAD_DIR = os.path.join(os.path.expanduser('~'), 'CaseFiles')
+
+
+class PdfWriter():
+    """
+    Streams a PDF into a partial file beside its final path and only
+    renames it into place once it is complete and synced to disk.
+    Data that does not start with the PDF header is rejected as soon
+    as the first bytes arrive.
+    """
+
+    def __init__(self, case_path, resume=False, check_header=True):
+        self.case_path = case_path
+        self.partial_path = case_path + '.part'
+        self.file = open(self.partial_path, 'ab' if resume else 'wb')
+        # a resumed partial file was already checked when it was started
+        self.header = b'' if check_header and not resume else None
+
+    def write(self, chunk):
+        if self.header is not None:
+            self.header += chunk
+            if len(self.header) < len(PDF_HEADER):
+                return True
+            if not self.header.startswith(PDF_HEADER):
+                return False
+            chunk, self.header = self.header, None
+        self.file.write(chunk)
+        return True
+
+    def commit(self):
+        # returns False, and discards the file, if it ended before the
+        # PDF header could be checked
+        if self.header is not None:
+            self.abort()
+            return False
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.partial_path, self.case_path)
+        return True
+
+    def abort(self, discard=True):
+        self.file.close()
+        if discard and os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
 
 class LawnetBrowser():
+    PROXY_LOGIN_URL = 'https://login.libproxy.smu.edu.sg/login'
     SMU_LAWNET_PROXY_URL = 'https://login.libproxy.smu.edu.sg/login?qurl=https%3a%2f%2fwww.lawnet.sg%2flawnet%2fweb%2flawnet%2fip-access'
     SMU_LOGIN_URL = 'https://login.smu.edu.sg/adfs/ls'
+    SHIBBOLETH_LOGIN_URL = 'https://login.libproxy.smu.edu.sg/login?auth=shibboleth&url=https://www.lawnet.sg/lawnet/web/lawnet/ip-access'
+    SHIBBOLETH_POST_URL = 'https://login.libproxy.smu.edu.sg/Shibboleth.sso/SAML2/POST'
     LAWNET_SEARCH_URL = 'https://www-lawnet-sg.libproxy.smu.edu.sg/lawnet/group/lawnet/legal-research/basic-search'
     LAWNET_CASE_URL = 'https://www-lawnet-sg.libproxy.smu.edu.sg/lawnet/group/lawnet/page-content?p_p_id=legalresearchpagecontent_WAR_lawnet3legalresearchportlet&p_p_lifecycle=1&p_p_state=normal&p_p_mode=view&p_p_col_id=column-2&p_p_col_count=1&_legalresearchpagecontent_WAR_lawnet3legalresearchportlet_action=openContentPage&contentDocID='
+    LAWNET_PDF_URL = 'https://www-lawnet-sg.libproxy.smu.edu.sg/lawnet/group/lawnet/page-content?p_p_id=legalresearchpagecontent_WAR_lawnet3legalresearchportlet&p_p_lifecycle=2&p_p_resource_id=viewPDFSourceDocument'
     SEARCH_FORM_ACTION = 'https://www-lawnet-sg.libproxy.smu.edu.sg/lawnet/group/lawnet/result-page?p_p_id=legalresearchresultpage_WAR_lawnet3legalresearchportlet&p_p_lifecycle=1&p_p_state=normal&p_p_mode=view&p_p_col_id=column-2&p_p_col_count=1&_legalresearchresultpage_WAR_lawnet3legalresearchportlet_action=basicSeachActionURL&_legalresearchresultpage_WAR_lawnet3legalresearchportlet_searchType=0'
 
-    PDF_REPORTS = [
-        'SLR',
-        'Ch',
-        'AC',
-        'A.C.',
-        'WLR',
-        'SSAR',
-        'SSLR',
-        'FMSLR'
-    ]
-
-    def __init__(self):
+    FORM_DATE_FIELD = '_searchbasicformportlet_WAR_lawnet3legalresearchportlet_formDate'
+
+    SESSION_EXPIRED = 'Session expired.'
+    CANCELLED = 'Cancelled.'
+
+    PDF_CHUNK_SIZE = 64 * 1024
+    PDF_FETCH_ATTEMPTS = 3
+
+    # seconds to connect and between reads, so that a stalled proxy or
+    # LawNet connection fails the attempt instead of holding its worker
+    REQUEST_TIMEOUT = (10, 60)
+
+    # failures worth retrying, timeouts only where the policy allows it
+    TRANSIENT_ERRORS = (requests.ConnectionError,
+                        requests.exceptions.ChunkedEncodingError)
+    TIMEOUT_ERRORS = (requests.Timeout,)
+
+    def __init__(self, workers=10, adaptive_limits=True, case_store=None,
+                 citation_cache=None, render_workers=2, render_timeout=120,
+                 cookie_store=None, metrics=DISABLED, journal=None,
+                 citation_index=None):
         self.cookies = None
         self.download_dir = None
+        # optional casestore.CaseStore shared between download directories
+        self.case_store = case_store
+        # optional citationcache.CitationCache consulted before searching
+        self.citation_cache = citation_cache
+        # optional citationindex.CitationIndex of parallel citations seen on
+        # case pages, used to settle duplicates before any request is made
+        self.citation_index = citation_index
+        # optional cookiestore.CookieStore that keeps the login between runs
+        self.cookie_store = cookie_store
+        # metrics.Metrics recording the time spent in each stage of each case
+        self.metrics = metrics
+        # journal.Journal recording each case, through which the batch can
+        # also be paused or cancelled
+        self.journal = journal if journal is not None else Journal()
+        # case pages without a PDF are rendered outside the download workers;
+        # with no render workers they are rendered inline as before
+        self.renderer = HtmlRenderer(render_workers, render_timeout,
+                                     metrics=metrics) if render_workers else None
+        # size of the download worker pool, also used to size the
+        # connection pool so that every worker can keep a connection alive
+        self.workers = workers
+        self.session = None
+        self.session_lock = threading.Lock()
+        # the search form token is fetched once and shared by all workers
+        self.form_date = None
+        self.form_date_lock = threading.Lock()
+        # searches start serialised and PDF fetches start at the pool size;
+        # without adaptive limits they stay there, as with the old search lock
+        self.adaptive_limits = adaptive_limits
+        self.limiters = {
+            'search': self.create_limiter(initial=1, max_limit=workers),
+            'pdf': self.create_limiter(initial=workers, max_limit=workers),
+        }
+        # page fetches are idempotent GETs; the search POST is retried
+        # less eagerly and not after a timeout, when it may have gone through
+        self.retry_policies = {
+            'GET': RetryPolicy(attempts=4, base_delay=0.5),
+            'search': RetryPolicy(attempts=3, base_delay=1, retry_timeouts=False),
+        }
+        # shared by every worker so that an outage pauses the whole pool
+        self.breaker = CircuitBreaker()
+        self.retries = Counter()
+        self.retries_lock = threading.Lock()
+
+    def create_limiter(self, **kwargs):
+        return AdaptiveLimiter(enabled=self.adaptive_limits, **kwargs)
+
+    def limiter_stats(self):
+        return {endpoint: limiter.stats()
+                for endpoint, limiter in self.limiters.items()}
+
+    def run_stats(self):
+        with self.retries_lock:
+            retries = dict(self.retries)
+        return {
+            'retries': retries,
+            'breaker_trips': self.breaker.stats()['trips'],
+            'limiters': self.limiter_stats(),
+        }
+
+    def count_retry(self, policy):
+        with self.retries_lock:
+            self.retries[policy] += 1
+
+    def retryable(self, error, retry_policy):
+        # connect and read timeouts are connection errors too, in both
+        # requests and aiohttp, so they are told apart first
+        if isinstance(error, self.TIMEOUT_ERRORS):
+            return retry_policy.retry_timeouts
+        return isinstance(error, self.TRANSIENT_ERRORS)
+
+    def session_expired(self, url):
+        # the proxy sends requests from a lapsed session back to its login
+        return url.startswith(self.PROXY_LOGIN_URL)
+
+    def wait_for_breaker(self):
+        pause = self.breaker.pause()
+        while pause:
+            time.sleep(pause)
+            pause = self.breaker.pause()
+
+    def request(self, session, method, url, policy='GET', limiter=None,
+                validate=None, stage='page', **kwargs):
+        # sends a request through the circuit breaker, retrying transient
+        # failures; validate can reject a response LawNet served with a 200
+        with self.metrics.span(stage):
+            return self.send_request(session, method, url, policy, limiter,
+                                     validate, stage, **kwargs)
+
+    def send_request(self, session, method, url, policy, limiter, validate,
+                     stage, **kwargs):
+        retry_policy = self.retry_policies[policy]
+        kwargs.setdefault('timeout', self.REQUEST_TIMEOUT)
+        for attempt in range(retry_policy.attempts):
+            last_attempt = attempt + 1 == retry_policy.attempts
+            self.wait_for_breaker()
+            try:
+                if limiter is None:
+                    response = session.request(method, url, **kwargs)
+                else:
+                    with limiter.slot() as slot:
+                        self.metrics.record(stage + '_wait', slot.waited)
+                        response = session.request(method, url, **kwargs)
+                        slot.record(response.status_code)
+            except Exception as error:
+                if not self.retry_error(error, retry_policy, last_attempt):
+                    raise
+            else:
+                valid = validate is None or validate(response.text)
+                if self.accept_response(retry_policy, url, response.url,
+                                        response.status_code, valid, last_attempt):
+                    return response
+                response.close()
+            self.count_retry(policy)
+            time.sleep(retry_policy.backoff(attempt))
+
+    def retry_error(self, error, retry_policy, last_attempt):
+        # returns True if the attempt that raised error should be retried
+        if not self.retryable(error, retry_policy):
+            self.record_error(error)
+            return False
+        self.breaker.record(False)
+        return not last_attempt
+
+    def record_error(self, error):
+        # an attempt that raised still reports to the breaker, or a probe
+        # that raised would leave every worker waiting for it
+        self.breaker.record(isinstance(error, SessionExpired))
+
+    def accept_response(self, retry_policy, url, response_url, status, valid,
+                        last_attempt):
+        # returns True if the response should be returned, False to retry
+        if self.session_expired(response_url):
+            self.breaker.record(True)
+            raise SessionExpired(url)
+        retry_status = retry_policy.retry_status(status)
+        self.breaker.record(valid and not retry_status)
+        if retry_status and last_attempt:
+            raise RetryableStatus(status)
+        return (valid and not retry_status) or last_attempt
 
     def update_download_info(
             self,
@@ -50,215 +265,546 @@ class LawnetBrowser():
         if download_dir:
             self.download_dir = download_dir
         else:
-            self.download_dir = os.path.join(
-                os.path.expanduser('~'), 'CaseFiles')
+            self.download_dir = DEFAULT_DOWNLOAD_DIR
 
         if not os.path.exists(self.download_dir):
             os.makedirs(self.download_dir)
 
+    def create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers,
+                              pool_maxsize=self.workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if self.cookies:
+            session.cookies = self.cookies
+        return session
+
+    def get_session(self):
+        with self.session_lock:
+            if self.session is None:
+                self.session = self.create_session()
+            return self.session
+
+    def use_session(self, session):
+        with self.session_lock:
+            old_session = self.session
+            self.session = session
+            self.cookies = session.cookies
+        with self.form_date_lock:
+            self.form_date = None
+        if old_session is not None and old_session is not session:
+            old_session.close()
+
+    def get_saml_payload(self, page, saml_field):
+        return extractors.extract_inputs(page, [saml_field, 'RelayState'])
+
+    def get_login_payload(self):
+        return {
+            'UserName': f'{self.login_prefix}\\{self.username}',
+            'Password': self.password,
+            'AuthMethod': 'FormsAuthentication'
+        }
+
     def login_lawnet(self):
-        with requests.Session() as s:
-            if self.cookies:
-                s.cookies = self.cookies
-            # Test existing cookies
-            initiate_auth = s.get(
-                'https://login.libproxy.smu.edu.sg/login?auth=shibboleth&url=https://www.lawnet.sg/lawnet/web/lawnet/ip-access'
-            )
-            if initiate_auth.url == self.LAWNET_SEARCH_URL:
-                return 'SUCCESS'
-            soup = BeautifulSoup(initiate_auth.text, 'lxml')
-            try:
-                saml_payload = {
-                    'SAMLRequest':
-                    soup.find('input', {
-                        'name': 'SAMLRequest'
-                    }).get('value'),
-                    'RelayState':
-                    soup.find('input', {
-                        'name': 'RelayState'
-                    }).get('value')
-                }
-            except Exception:
-                # TODO Show a GUI failure
-                print('Could not find necessary SAML tokens')
-                return 'FAIL'
-            # Otherwise access the SMU login page
-            auth_response = s.post(self.SMU_LOGIN_URL, data=saml_payload)
-            if auth_response.url != self.SMU_LOGIN_URL:
-                return 'FAIL'
-            login_payload = {
-                'UserName': f'{self.login_prefix}\\{self.username}',
-                'Password': self.password,
-                'AuthMethod': 'FormsAuthentication'
-            }
-            # Login to SMU SSO
-            login_response = s.post(self.SMU_LOGIN_URL, data=login_payload)
-            soup = BeautifulSoup(login_response.text, 'lxml')
-            # Obtain SAML Response keys
-            try:
-                auth_payload = {
-                    'SAMLResponse':
-                    soup.find('input', {
-                        'name': 'SAMLResponse'
-                    }).get('value'),
-                    'RelayState':
-                    soup.find('input', {
-                        'name': 'RelayState'
-                    }).get('value')
-                }
-            except Exception:
-                return 'FAIL'
-            # Send SAML response keys
-            auth_response = s.post(
-                'https://login.libproxy.smu.edu.sg/Shibboleth.sso/SAML2/POST',
-                data=auth_payload)
-            # Check login
-            test_response = s.get(self.SMU_LAWNET_PROXY_URL)
-            if test_response.url == self.LAWNET_SEARCH_URL:
-                self.cookies = s.cookies
-                return 'SUCCESS'
-            else:
-                return 'FAIL'
+        with self.metrics.span('login'):
+            return self.login_session()
+
+    def login_session(self):
+        # the pooled session only replaces the shared one if login succeeds
+        s = self.create_session()
+        restored = self.restore_cookies(s.cookies)
+        status = self.authenticate(s)
+        if status != 'SUCCESS' and restored:
+            # the saved cookies were rejected, log in from a clean session
+            s.close()
+            self.cookie_store.clear()
+            s = self.create_session()
+            status = self.authenticate(s)
+        if status == 'SUCCESS':
+            self.use_session(s)
+            self.persist_cookies(s.cookies)
+        else:
+            s.close()
+        return status
+
+    def restore_cookies(self, cookie_jar):
+        # only used when this browser has not logged in yet
+        if self.cookie_store is None or self.cookies:
+            return False
+        saved_cookies = self.cookie_store.load(self.username, self.password)
+        if not saved_cookies:
+            return False
+        for cookie in saved_cookies:
+            self.restore_cookie(cookie_jar, cookie)
+        return True
+
+    def persist_cookies(self, cookie_jar):
+        if self.cookie_store is None:
+            return
+        saved_cookies = [self.saved_cookie(cookie) for cookie in cookie_jar]
+        self.cookie_store.save(saved_cookies, self.username, self.password)
+
+    def restore_cookie(self, cookie_jar, cookie):
+        cookie_jar.set_cookie(requests.cookies.create_cookie(**cookie))
+
+    def saved_cookie(self, cookie):
+        return {
+            'name': cookie.name,
+            'value': cookie.value,
+            'domain': cookie.domain,
+            'path': cookie.path,
+            'secure': cookie.secure,
+            'expires': cookie.expires,
+        }
+
+    def authenticate(self, s):
+        steps = self.login_steps()
+        try:
+            method, url, data = next(steps)
+            while True:
+                response = s.request(method, url, data=data, timeout=self.REQUEST_TIMEOUT)
+                method, url, data = steps.send((response.url, response.text))
+        except StopIteration as finished:
+            return finished.value
+
+    def login_steps(self):
+        # yields each login request as (method, url, data) and is sent back
+        # the (url, text) it ended at, so both engines log in the same way
+        # Test existing cookies
+        url, text = yield 'GET', self.SHIBBOLETH_LOGIN_URL, None
+        if url == self.LAWNET_SEARCH_URL:
+            return 'SUCCESS'
+        saml_payload = self.get_saml_payload(text, 'SAMLRequest')
+        if saml_payload is None:
+            # TODO Show a GUI failure
+            print('Could not find necessary SAML tokens')
+            return 'FAIL'
+        # Otherwise access the SMU login page
+        url, _ = yield 'POST', self.SMU_LOGIN_URL, saml_payload
+        if url != self.SMU_LOGIN_URL:
+            return 'FAIL'
+        # Login to SMU SSO
+        _, text = yield 'POST', self.SMU_LOGIN_URL, self.get_login_payload()
+        # Obtain SAML Response keys
+        auth_payload = self.get_saml_payload(text, 'SAMLResponse')
+        if auth_payload is None:
+            return 'FAIL'
+        # Send SAML response keys
+        yield 'POST', self.SHIBBOLETH_POST_URL, auth_payload
+        # Check login
+        url, _ = yield 'GET', self.SMU_LAWNET_PROXY_URL, None
+        if url == self.LAWNET_SEARCH_URL:
+            return 'SUCCESS'
+        else:
+            return 'FAIL'
+
+    def get_form_date(self, session, stale_form_date=None):
+        with self.metrics.waiting(self.form_date_lock, 'form_date_wait'):
+            if self.needs_form_date(stale_form_date):
+                searchurl_response = self.request(
+                    session, 'GET', self.LAWNET_SEARCH_URL,
+                    validate=self.has_form_date, stage='form_date')
+                self.form_date = self.parse_form_date(searchurl_response.text)
+            return self.form_date
+
+    def needs_form_date(self, stale_form_date):
+        # Only refetch the token if nobody has replaced the stale one yet,
+        # so a rejected token triggers a single refresh across all workers
+        return self.form_date is None or self.form_date == stale_form_date
+
+    def has_form_date(self, search_page):
+        # the proxy serves its error pages with a 200 status
+        return self.FORM_DATE_FIELD in search_page
+
+    def parse_form_date(self, search_page):
+        form_inputs = extractors.extract_inputs(search_page, [self.FORM_DATE_FIELD])
+        if form_inputs is None:
+            raise ValueError('Search form token not found')
+        return form_inputs[self.FORM_DATE_FIELD]
+
+    def get_search_payload(self, form_date, case_citation):
+        categories = ['1', '2', '4', '6', '7', '8', '27']
+        return {
+            self.FORM_DATE_FIELD: form_date,
+            'grouping': '1',
+            'category': categories,
+            'basicSearchKey': case_citation
+        }
+
+    def search_rejected(self, url, status):
+        # LawNet bounces an expired form token back to the search form
+        return status >= 400 or url == self.LAWNET_SEARCH_URL
+
+    def search(self, session, case_citation, lock=None):
+        form_date = self.get_form_date(session)
+        for attempt in range(2):
+            search_payload = self.get_search_payload(form_date, case_citation)
+            with ExitStack() as stack:
+                if lock:
+                    # callers may still serialise searches
+                    stack.enter_context(self.metrics.waiting(lock, 'search_lock_wait'))
+                search_response = self.request(
+                    session, 'POST', self.SEARCH_FORM_ACTION, policy='search',
+                    limiter=self.limiters['search'], data=search_payload,
+                    stage='search')
+            if not self.search_rejected(search_response.url,
+                                        search_response.status_code):
+                break
+            form_date = self.get_form_date(session, form_date)
+        else:
+            # not a results page, so not cached as not found
+            raise SearchRejected(search_response.status_code)
+        return search_response
+
+    def download_cases(self, citation_list):
+        # yields (citation, status) pairs as each download completes
+        def run_download(case):
+            return case, self.download_case_or_fail(case)
+
+        self.breaker.reset()
+        with ThreadPool(self.workers) as pool:
+            for result in pool.imap_unordered(run_download, citation_list):
+                yield result
+
+    def download_case_or_fail(self, case_citation):
+        # waits while the batch is paused, and leaves the case pending once
+        # the batch has been cancelled
+        if not self.journal.wait():
+            return self.CANCELLED
+        with self.journal.case(case_citation) as entry:
+            return entry.finish(self.try_download_case(case_citation))
+
+    def try_download_case(self, case_citation):
+        try:
+            return self.download_case(case_citation)
+        except Exception as error:
+            return self.failure_status(error)
+
+    def failure_status(self, error):
+        # a case that still fails after its retries should not end the run
+        if isinstance(error, LawnetUnavailable):
+            return 'LawNet unavailable.'
+        if isinstance(error, SessionExpired):
+            return self.SESSION_EXPIRED
+        # anything else, such as a full disk or an odd search result,
+        # fails this case alone
+        journal.note(error=repr(error))
+        return 'Download failed.'
 
     def download_case(self, case_citation, lock=None):
+        with self.metrics.case(case_citation):
+            return self.fetch_case(case_citation, lock)
+
+    def fetch_case(self, case_citation, lock=None):
+        case_citation, lookup_citation, case_status = self.start_case(case_citation)
+        if case_status:
+            return case_status
+
+        s = self.get_session()
+        case_text = None
+        resolution = self.get_cached_resolution(lookup_citation)
+        if resolution is None:
+            resolution, case_text = self.resolve_case(s, lookup_citation, lock)
+        case_status = self.check_resolution(lookup_citation, resolution)
+        if case_status:
+            return case_status
+
+        status = None
+        if resolution.pdf_url:
+            status = self.download_pdf(s, resolution.pdf_url, resolution.case_name)
+        if self.needs_case_page(lookup_citation, resolution, status):
+            if case_text is None:
+                case_text = self.request(
+                    s, 'GET', self.LAWNET_CASE_URL + resolution.doc_id,
+                    stage='case_page').text
+            status = self.save_case_page(case_text, resolution.case_name, case_citation)
+        return self.store_case(case_citation, resolution.case_name,
+                               status or 'PDF not available.')
+
+    def start_case(self, case_citation):
+        # returns the citation, the citation to look it up under and a
+        # status if the case is settled without a request
         print('Downloading case', case_citation)
-        categories = ['1', '2', '4', '6', '7', '8', '27']
-        case_citation = case_citation.replace('Ch ', 'Ch. ')
-
-        with requests.Session() as s:
-            s.cookies = self.cookies
-            searchurl_response = s.get(self.LAWNET_SEARCH_URL)
-            searchurl_soup = BeautifulSoup(searchurl_response.text, 'lxml')
-            formDate = searchurl_soup.find('input', {
-                'name': '_searchbasicformportlet_WAR_lawnet3legalresearchportlet_formDate'
-            }).get('value')
-            search_payload = {
-                '_searchbasicformportlet_WAR_lawnet3legalresearchportlet_formDate': formDate,
-                'grouping': '1',
-                'category': categories,
-                'basicSearchKey': case_citation
-            }
-            if lock:
-                lock.acquire()  # only 1 thread can post the search request
-            search_response = s.post(
-                self.SEARCH_FORM_ACTION, data=search_payload)
-            if lock:
-                lock.release()  # lock is released by the thread
-
-            cases_found = self.get_case_list_html(search_response.text)
-            # without javascript, there is a function call with a
-            # "resource id" captured within the "onclick" action
-            # of the link
-            search_results = [SearchResult(case['onclick'], (case.text).strip())
-                             for case in cases_found]
-
-            if len(search_results) == 0:
-                return ('Unable to find ' + case_citation + '.')
-
-            # if neutral citation - test first result for PDF
-            if not any(map(lambda abbrev: abbrev in case_citation, self.PDF_REPORTS)):
-                # Get link of first case
-                case_id = re.search(r"'(.*)'", search_results[0].case_url).group(1)
-                case_url = self.LAWNET_CASE_URL + case_id
-
-                case_response = s.get(case_url)
-                case_text = case_response.text
-                case_soup = BeautifulSoup(case_text, 'lxml')
-                # Find citations on the case page
-                citations_found = []
-                for citation in case_soup.find_all('span', {'class': 'Citation offhyperlink'}):
-                    try:
-                        citations_found.append(citation.find('a').contents)
-                    except Exception:
-                        citations_found.append(citation.contents)
-
-                # Flatten the list
-                citations_found = list(itertools.chain.from_iterable(citations_found))
-                if case_citation in citations_found:
-                    slr_citation = citations_found[0]
-                    if 'SLR' in slr_citation and slr_citation in self.citation_list:
-                        # Do not download if it is a duplicate
-                        return (f'Duplicate of {slr_citation}')
-                    else:
-                        return self.download_pdf_for_case(s, case_text, search_results[0].case_name)
-                else:
-                    return ('Unable to find ' + case_citation + '.')
-            else:
-                case_index = self.get_case_index(search_results, case_citation)
-                if case_index is None:
-                    return ('Unable to find ' + case_citation + '.')
+        case_citation = self.normalise_citation(case_citation)
+        lookup_citation, parallel_status = self.choose_parallel(case_citation)
+        if parallel_status:
+            return case_citation, lookup_citation, parallel_status
+        return case_citation, lookup_citation, self.link_stored_case(case_citation)
+
+    def resolve_case(self, s, case_citation, lock=None):
+        # returns the resolution and, for neutral citations, the case page
+        search_response = self.search(s, case_citation, lock)
+        resolution, first_result = self.read_search_page(
+            case_citation, search_response.text)
+        if first_result is None:
+            return resolution, None
+        case_response = self.request(
+            s, 'GET', self.LAWNET_CASE_URL + self.get_doc_id(first_result),
+            stage='case_page')
+        return self.read_case_page(case_citation, first_result,
+                                   case_response.status_code, case_response.text)
+
+    def read_search_page(self, case_citation, search_page):
+        # returns (resolution, None), or for a neutral citation (None, the
+        # first result) as only its case page can confirm the match
+        with self.metrics.span('parse'):
+            search_results = self.get_search_results(search_page)
+        if not search_results:
+            resolution = NOT_FOUND
+        elif not self.is_reported_citation(case_citation):
+            return None, search_results[0]
+        else:
+            resolution = self.resolve_search_results(case_citation, search_results)
+        self.cache_resolution(case_citation, resolution)
+        return resolution, None
+
+    def read_case_page(self, case_citation, search_result, status, case_page):
+        # returns the resolution and the case page
+        if status >= 400:
+            raise SearchRejected(status)
+        resolution = self.resolve_case_page(
+            case_citation, self.get_doc_id(search_result), search_result.case_name,
+            case_page)
+        self.cache_resolution(case_citation, resolution)
+        return resolution, case_page
+
+    def resolve_search_results(self, case_citation, search_results):
+        case_index = self.get_case_index(search_results, case_citation)
+        if case_index is None:
+            return NOT_FOUND
+
+        doc_id = self.get_doc_id(search_results[case_index])
+        pdf_url = self.generate_pdf_url(case_citation, doc_id.split('.')[0])
+        return Resolution(doc_id, search_results[case_index].case_name,
+                          case_citation, pdf_url, True)
+
+    def resolve_case_page(self, case_citation, doc_id, case_name, case_page):
+        # citations and the PDF link are pulled out in a single pass
+        with self.metrics.span('parse'):
+            citations_found, pdf_link = extractors.extract_case_page(case_page)
+        if self.citation_index is not None:
+            self.citation_index.add(citations_found)
+        if case_citation not in citations_found:
+            return NOT_FOUND
+        return Resolution(doc_id, case_name, citations_found[0], pdf_link, True)
+
+    def check_resolution(self, case_citation, resolution):
+        # returns a status if the case should not be downloaded
+        if resolution.found:
+            journal.note(doc_id=resolution.doc_id)
+        else:
+            return ('Unable to find ' + case_citation + '.')
+        slr_citation = resolution.reporter
+        if (slr_citation != case_citation and 'SLR' in slr_citation
+                and slr_citation in self.citation_list):
+            # Do not download if it is a duplicate
+            return (f'Duplicate of {slr_citation}')
+        return None
 
-                doc_id = re.search(r"'(.*)'",
-                                   search_results[case_index].case_url).group(1)
-                doc_id = doc_id.split('.')[0]
+    def needs_case_page(self, case_citation, resolution, pdf_status):
+        # no PDF link, or the link served something that is not a PDF;
+        # reported cases are only kept as PDFs
+        if resolution.pdf_url and not pdf_status:
+            # the PDF link has gone stale, resolve it again next time
+            self.invalidate_resolution(case_citation)
+        return not pdf_status and not self.is_reported_citation(case_citation)
+
+    def choose_parallel(self, case_citation):
+        # returns the citation to look the case up under, or a status if a
+        # better parallel citation of the same case is also on the list
+        if self.citation_index is None:
+            return case_citation, None
+        parallels = self.citation_index.parallels(case_citation)
+        if not parallels:
+            return case_citation, None
+
+        def rank(citation):
+            # reported citations have a PDF, neutral ones only a case page
+            return not self.is_reported_citation(citation)
+
+        listed = [citation for citation in parallels if citation in self.citation_list]
+        best_listed = min(listed, key=rank, default=case_citation)
+        if best_listed != case_citation:
+            return None, f'Duplicate of {best_listed}'
+        return min(parallels, key=rank), None
+
+    def get_cached_resolution(self, case_citation):
+        if self.citation_cache is None:
+            return None
+        return self.citation_cache.get(case_citation)
+
+    def cache_resolution(self, case_citation, resolution):
+        if self.citation_cache is not None:
+            self.citation_cache.put(case_citation, resolution)
+
+    def invalidate_resolution(self, case_citation):
+        if self.citation_cache is not None:
+            self.citation_cache.invalidate(case_citation)
+
+    def link_stored_case(self, case_citation):
+        if self.case_store is None:
+            return None
+        with self.metrics.span('case_store'):
+            case_path = self.case_store.link_into(case_citation, self.download_dir)
+        if case_path:
+            journal.note(file=case_path)
+            return 'PDF copied from case store.'
+        return None
 
-                pdf_url = self.generate_pdf_url(case_citation, doc_id)
-                pdf_response = s.get(pdf_url)
-                return self.save_pdf(pdf_response.content, search_results[case_index].case_name)
+    def store_case(self, case_citation, filename, status):
+        # notes where a freshly saved case went, adds it to the case store
+        # and passes on its status
+        if 'downloaded' not in status:
+            return status
+        for extension in ('.pdf', '.html'):
+            case_path = self.get_case_path(filename, extension)
+            if os.path.exists(case_path):
+                journal.note(file=case_path)
+                if self.case_store is not None:
+                    with self.metrics.span('case_store'):
+                        self.case_store.add(case_citation, case_path)
+                break
+        return status
 
-    def generate_pdf_url(self, case_citation, doc_id):
-        def pad_four_digit(case_citation):
-            resource_name = case_citation.split(' ')
-            resource_name[-1] = resource_name[-1].zfill(4)
-            return resource_name
-
-        pdf_base_url = 'https://www-lawnet-sg.libproxy.smu.edu.sg/lawnet/group/lawnet/page-content?p_p_id=legalresearchpagecontent_WAR_lawnet3legalresearchportlet&p_p_lifecycle=2&p_p_resource_id=viewPDFSourceDocument'
-        if 'SLR' in case_citation:
-            resource_name = pad_four_digit(case_citation)
-            resource_name = ' '.join(resource_name)
-        elif 'SSAR' in case_citation:
-            if any(map(lambda year: str(year) in case_citation, range(1985, 2011))):
-                resource_name = pad_four_digit(case_citation)
-                resource_name = ' '.join(['(1985-2010)'] + resource_name[1:])
-            else:
-                resource_name = pad_four_digit(case_citation)
-                resource_name = ' '.join(resource_name)
-        elif 'WLR' in case_citation and any(map(lambda year: str(year) in case_citation, range(2008, 2021))):
-            resource_name = case_citation.replace(' ', '-').replace('[', '').replace(']', '')
-        elif 'AC' in case_citation and any(map(lambda year: str(year) in case_citation, range(1800, 2008))):
-            case_citation = case_citation.replace(' ', '-')
-            resource_name = case_citation
-        elif 'QB' in case_citation and not ' 1 QB' in case_citation:
-            case_citation = case_citation.replace(' QB', ' 1 QB')
-            case_citation = case_citation.replace(' ', '-')
-            resource_name = case_citation
-        elif 'A.C.' in case_citation:
-            case_citation = case_citation.replace('A.C.', 'AC')
-            resource_name = case_citation
-        elif 'Ch.' in case_citation:
-            case_citation = case_citation.replace('Ch.', 'Ch')
-            resource_name = case_citation
-        else:
-            resource_name = case_citation
+    def normalise_citation(self, case_citation):
+        return case_citation.replace('Ch ', 'Ch. ')
 
-        pdf_url = f'{pdf_base_url}&pdfFileName={case_citation}.pdf&pdfFileUri={doc_id}/resource/{resource_name}.pdf'
-        return pdf_url
+    def is_reported_citation(self, case_citation):
+        return citations.is_reported(case_citation)
 
-    def download_pdf_for_case(self, session, case_page, filename):
-        pdf_url = self.get_pdf_link(case_page)
+    def get_search_results(self, results_html):
+        # without javascript, there is a function call with a
+        # "resource id" captured within the "onclick" action
+        # of the link
+        return [SearchResult(onclick, title) for onclick, title
+                in extractors.extract_search_results(results_html)]
 
-        if pdf_url:
-            pdf_file = session.get(pdf_url)
-            return self.save_pdf(pdf_file.content, filename)
-        else:
+    def get_doc_id(self, search_result):
+        return re.search(r"'(.*)'", search_result.case_url).group(1)
+
+    def generate_pdf_url(self, case_citation, doc_id):
+        file_name, resource_name = citations.pdf_names(case_citation)
+        return (f'{self.LAWNET_PDF_URL}&pdfFileName={file_name}.pdf'
+                f'&pdfFileUri={doc_id}/resource/{resource_name}.pdf')
+
+    def save_case_page(self, case_page, filename, case_citation=None):
+        if self.renderer is None:
             try:
                 return self.save_html2pdf(case_page, filename)
             except Exception:
                 return self.save_html(case_page, filename)
 
-    def get_pdf_link(self, case_page):
-        case_soup = BeautifulSoup(case_page, 'lxml')
-
-        for link in case_soup.find_all('a'):
-            if 'PDF' in link.text and link['href'] != '#':
-                return link['href']
-        return None
-
-    def get_case_list_html(self, results_html):
-        search_soup = BeautifulSoup(results_html, 'lxml')
-        case_list = search_soup.select('.document-title')
-
-        return case_list
+        self.save_html(case_page, filename)
+        self.renderer.submit((case_citation, filename),
+                             self.get_case_path(filename, '.html'),
+                             self.get_case_path(filename, '.pdf'))
+        return 'HTML saved, PDF pending.'
+
+    def pending_conversions(self):
+        # yields (citation, status) as deferred HTML to PDF renders finish
+        if self.renderer is None:
+            return
+        for (case_citation, filename), rendered in self.renderer.results():
+            if rendered:
+                os.remove(self.get_case_path(filename, '.html'))
+                status = 'PDF downloaded.'
+            else:
+                status = 'PDF not available. HTML version downloaded.'
+            with self.journal.case(case_citation) as entry:
+                status = entry.finish(self.store_case(case_citation, filename, status))
+            yield case_citation, status
+
+    def download_pdf(self, session, pdf_url, filename):
+        # returns None if the response is not a PDF
+        with self.metrics.span('pdf'):
+            return self.fetch_pdf(session, pdf_url, filename)
+
+    def fetch_pdf(self, session, pdf_url, filename):
+        case_path = self.get_case_path(filename, '.pdf')
+        for attempt in range(self.PDF_FETCH_ATTEMPTS):
+            self.wait_for_breaker()
+            try:
+                with self.limiters['pdf'].slot() as slot:
+                    self.metrics.record('pdf_wait', slot.waited)
+                    status = self.stream_pdf(session, pdf_url, case_path, slot)
+            except Exception as error:
+                delay = self.pdf_retry_delay(error, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.breaker.record(True)
+            return status
+        return 'PDF download interrupted.'
+
+    def get_resume_offset(self, case_path):
+        partial_path = case_path + '.part'
+        if os.path.exists(partial_path):
+            return os.path.getsize(partial_path)
+        return 0
+
+    def pdf_request(self, case_path):
+        # returns the resume offset and the headers asking for the rest
+        resume_from = self.get_resume_offset(case_path)
+        headers = {'Range': f'bytes={resume_from}-'} if resume_from else {}
+        return resume_from, headers
+
+    def discard_partial(self, case_path, status, resume_from):
+        # returns True if the partial file was already complete, or longer
+        # than the PDF, and has been removed so the PDF can be fetched again
+        if status == 416 and resume_from:
+            os.remove(case_path + '.part')
+            return True
+        return False
+
+    def open_pdf_writer(self, pdf_url, case_path, response_url, status):
+        # returns None if the response holds no PDF
+        if self.session_expired(response_url):
+            raise SessionExpired(pdf_url)
+        if self.retry_policies['GET'].retry_status(status):
+            raise RetryableStatus(status)
+        if status >= 400:
+            return None
+        # servers that ignore the range header send the whole file
+        return PdfWriter(case_path, resume=status == 206)
+
+    def pdf_retry_delay(self, error, attempt):
+        # returns None if error is not worth another attempt; otherwise
+        # the partial file is kept and resumed on the next attempt
+        if not isinstance(error, self.TRANSIENT_ERRORS + self.TIMEOUT_ERRORS
+                          + (RetryableStatus,)):
+            self.record_error(error)
+            return None
+        self.breaker.record(False)
+        if attempt + 1 < self.PDF_FETCH_ATTEMPTS:
+            self.count_retry('GET')
+            return self.retry_policies['GET'].backoff(attempt)
+        return 0
+
+    def stream_pdf(self, session, pdf_url, case_path, slot):
+        resume_from, headers = self.pdf_request(case_path)
+        with session.get(pdf_url, headers=headers, stream=True,
+                         timeout=self.REQUEST_TIMEOUT) as pdf_response:
+            slot.record(pdf_response.status_code)
+            if self.discard_partial(case_path, pdf_response.status_code, resume_from):
+                return self.stream_pdf(session, pdf_url, case_path, slot)
+            writer = self.open_pdf_writer(pdf_url, case_path, pdf_response.url,
+                                          pdf_response.status_code)
+            if writer is None:
+                return None
+            try:
+                for chunk in pdf_response.iter_content(self.PDF_CHUNK_SIZE):
+                    if not writer.write(chunk):
+                        writer.abort()
+                        return None
+            except Exception:
+                writer.abort(discard=False)
+                raise
+            with self.metrics.span('write'):
+                if not writer.commit():
+                    return None
+        return 'PDF downloaded.'
 
     def get_case_index(self, case_list, citation):
         case_index = None
@@ -274,16 +820,12 @@ class LawnetBrowser():
 
         return clean_name
 
-    def save_pdf(self, case_data, filename):
-        case_path = os.path.join(self.download_dir, self.clean_filename(filename) + '.pdf')
-        with open(case_path, 'wb') as case_file:
-            case_file.write(case_data)
-
-        return f'PDF downloaded.'
+    def get_case_path(self, filename, extension):
+        return os.path.join(self.download_dir, self.clean_filename(filename) + extension)
 
     def save_html(self, case_data, filename):
         case_path = os.path.join(self.download_dir, self.clean_filename(filename) + '.html')
-        with open(case_path, 'w', encoding='utf-8') as case_file:
+        with self.metrics.span('write'), open(case_path, 'w', encoding='utf-8') as case_file:
             case_file.write(case_data)
 
         return (
@@ -291,14 +833,10 @@ class LawnetBrowser():
         )
 
     def save_html2pdf(self, case_data, filename):
-        def cleanup_html(source_html):
-            divider = "<div class=\"navi-container\"> </div>"
-            new_html = source_html.split(divider)[1]
-            return new_html
-
         case_path = os.path.join(self.download_dir, self.clean_filename(filename) + '.pdf')
-        resultFile = open(case_path, "w+b")
-        new_html = cleanup_html(case_data)
-        pisa.CreatePDF(new_html, dest=resultFile)
-        resultFile.close()
+        with self.metrics.span('render'):
+            resultFile = open(case_path, "w+b")
+            new_html = cleanup_html(case_data)
+            pisa.CreatePDF(new_html, dest=resultFile)
+            resultFile.close()
         return f'PDF downloaded.'
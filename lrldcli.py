@@ -0,0 +1,301 @@
+import argparse
+import contextlib
+import getpass
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from lawnetsearch import LawnetBrowser, DEFAULT_DOWNLOAD_DIR
+from asynclawnet import AsyncLawnetBrowser
+from casestore import CaseStore
+from citationcache import CitationCache
+from citationindex import CitationIndex
+from extractcache import ExtractionCache
+from cookiestore import CookieStore
+from sessionpool import SessionPool
+from metrics import Metrics, DISABLED
+from journal import Journal, journal_path, is_success
+import parsedocs
+
+try:
+    import keyring
+except ImportError:
+    keyring = None
+
+# Headless entry point for batch downloads, e.g.
+#   LRLD_USERNAME=jdoe LRLD_PASSWORD=... python -m lrldcli list.docx -d cases/
+# Each case is written to stdout as a JSON line when it completes, and
+# recorded in a journal in the download directory; Ctrl-C cancels the
+# cases not yet started and --resume picks them up again.
+
+KEYRING_SERVICE = 'lrld'
+USERTYPES = {'student': 'smustu', 'staff': 'smustf'}
+READING_LIST_TYPES = parsedocs.READING_LIST_TYPES
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_LOGIN_FAILED = 2
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='lrldcli', description='Download the cases in LawNet reading lists.')
+    parser.add_argument('reading_lists', nargs='*', metavar='FILE',
+                        help='.docx or .pdf reading lists, or text files '
+                        'with one citation per line')
+    parser.add_argument('-c', '--citation', action='append', default=[],
+                        help='a citation to download, may be repeated')
+    parser.add_argument('-d', '--download-dir', help='defaults to ~/CaseFiles')
+    parser.add_argument('-u', '--username', action='append',
+                        help='defaults to $LRLD_USERNAME; give several accounts '
+                        'to share the batch between their sessions')
+    parser.add_argument('--usertype', choices=sorted(USERTYPES), default='student')
+    parser.add_argument('--stared-only', action='store_true',
+                        help='only cases marked with * in the reading lists')
+    parser.add_argument('--engine', choices=['threads', 'async'], default='threads')
+    parser.add_argument('-w', '--workers', type=int, default=10,
+                        help='download threads, or requests in flight with '
+                        '--engine async')
+    parser.add_argument('--render-workers', type=int, default=2,
+                        help='processes rendering HTML case pages, 0 renders inline')
+    parser.add_argument('--case-store', metavar='DIR',
+                        help='share downloaded cases between download directories')
+    parser.add_argument('--citation-cache', metavar='PATH',
+                        help='cache citation lookups in this SQLite file')
+    parser.add_argument('--citation-index', metavar='PATH',
+                        help='remember parallel citations in this SQLite file, '
+                        'so that they are downloaded once and by their report')
+    parser.add_argument('--extraction-cache', metavar='PATH',
+                        help='keep the citations found in each reading list in '
+                        'this SQLite file, so that unchanged lists are not read again')
+    parser.add_argument('--cookie-store', metavar='PATH',
+                        help='keep the login between runs in this file')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='write a per-stage timing report, as CSV spans if '
+                        'PATH ends in .csv, Prometheus text for .prom, else JSON')
+    parser.add_argument('--stream', action='store_true',
+                        help='start downloading while the reading lists are '
+                        'still being read')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip cases already downloaded into the download '
+                        'directory; with no reading lists, download the cases '
+                        'the last run did not finish')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to append the JSON lines to, defaults to stdout')
+    return parser.parse_args(argv)
+
+
+def get_credentials(args, environ=os.environ):
+    # returns (username, password) pairs; passwords come from the
+    # environment, then the keyring, and are only prompted for when a
+    # terminal is attached
+    usernames = args.username or environ.get('LRLD_USERNAME', '').split(',')
+    credentials = []
+    for username in filter(None, usernames):
+        password = environ.get(f'LRLD_PASSWORD_{username.upper()}',
+                               environ.get('LRLD_PASSWORD'))
+        if password is None and keyring is not None:
+            password = keyring.get_password(KEYRING_SERVICE, username)
+        if password is None and sys.stdin.isatty():
+            password = getpass.getpass(f'LawNet password for {username}: ')
+        credentials.append((username, password))
+    return credentials
+
+
+def read_citations(paths, citations=(), stared=False, metrics=DISABLED, cache=None):
+    # citations are returned in the order first seen, without duplicates
+    citation_list = []
+    for path in paths:
+        if path.lower().endswith(READING_LIST_TYPES):
+            citation_list.extend(sorted(parsedocs.start_extract(path, stared, metrics, cache)))
+        else:
+            with open(path, encoding='utf-8') as citation_file:
+                citation_list.extend(line.strip() for line in citation_file)
+    citation_list.extend(citations)
+    return list(dict.fromkeys(
+        ' '.join(citation.split()) for citation in citation_list if citation.strip()))
+
+
+def iter_citations(paths, citations=(), stared=False, metrics=DISABLED, cache=None):
+    # like read_citations, but yields each citation as soon as it is found
+    def found():
+        for path in paths:
+            if path.lower().endswith(READING_LIST_TYPES):
+                yield from parsedocs.iter_citations(path, stared, metrics, cache)
+            else:
+                with open(path, encoding='utf-8') as citation_file:
+                    yield from citation_file
+        yield from citations
+
+    seen = set()
+    for citation in found():
+        citation = ' '.join(citation.split())
+        if citation and citation not in seen:
+            seen.add(citation)
+            yield citation
+
+
+def prefetch(citations, citation_list):
+    # reads the citations on a background thread from now on, so that the
+    # reading lists are parsed while the browser logs in; each one is also
+    # added to citation_list, which duplicates are checked against
+    found = queue.Queue()
+
+    def read():
+        try:
+            for citation in citations:
+                citation_list.append(citation)
+                found.put((citation, None))
+        except Exception as error:
+            found.put((None, error))
+        else:
+            found.put((None, None))
+
+    def take():
+        citation, error = found.get()
+        while citation is not None:
+            yield citation
+            citation, error = found.get()
+        if error is not None:
+            raise error
+
+    threading.Thread(target=read, daemon=True).start()
+    return take()
+
+
+def create_browser(args, accounts=1, metrics=DISABLED, journal=None):
+    options = {
+        'metrics': metrics,
+        'journal': journal,
+        'render_workers': args.render_workers,
+        'case_store': CaseStore(args.case_store) if args.case_store else None,
+        'citation_cache': CitationCache(args.citation_cache) if args.citation_cache else None,
+        'citation_index': CitationIndex(args.citation_index) if args.citation_index else None,
+    }
+    if accounts > 1:
+        # the cookie store holds a single login, so it is not used here
+        return SessionPool(workers=args.workers, **options)
+    options['cookie_store'] = CookieStore(args.cookie_store) if args.cookie_store else None
+    if args.engine == 'async':
+        return AsyncLawnetBrowser(max_in_flight=args.workers, **options)
+    return LawnetBrowser(workers=args.workers, **options)
+
+
+def close_browser(browser):
+    if isinstance(browser, AsyncLawnetBrowser):
+        browser.close()
+    if browser.renderer is not None:
+        browser.renderer.shutdown()
+
+
+def write_event(output, **event):
+    output.write(json.dumps(event) + '\n')
+    output.flush()
+
+
+def run(browser, citation_list, output):
+    # returns the exit status once every case has been reported
+    start = time.monotonic()
+
+    def elapsed():
+        return round(time.monotonic() - start, 3)
+
+    login_status = browser.login_lawnet()
+    write_event(output, event='login', status=login_status, elapsed=elapsed())
+    if login_status != 'SUCCESS':
+        return EXIT_LOGIN_FAILED
+
+    # pending HTML renders are reported again once they finish
+    statuses = {}
+    for results in (browser.download_cases(citation_list),
+                    browser.pending_conversions()):
+        for case_citation, status in results:
+            statuses[case_citation] = status
+            write_event(output, event='case', citation=case_citation,
+                        status=status, ok=is_success(status), elapsed=elapsed())
+
+    succeeded = sum(map(is_success, statuses.values()))
+    write_event(output, event='summary', cases=len(statuses), succeeded=succeeded,
+                elapsed=elapsed(), **browser.run_stats())
+    return EXIT_OK if statuses and succeeded == len(statuses) else EXIT_FAILURES
+
+
+@contextlib.contextmanager
+def cancel_on_interrupt(journal):
+    # the first Ctrl-C lets the running cases finish, a second one stops at once
+    def cancel(signum, frame):
+        signal.signal(signal.SIGINT, previous)
+        print('lrldcli: cancelling, press Ctrl-C again to stop at once', file=sys.stderr)
+        journal.cancel()
+
+    previous = signal.signal(signal.SIGINT, cancel)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics = Metrics() if args.metrics else DISABLED
+    download_dir = args.download_dir or DEFAULT_DOWNLOAD_DIR
+    journal = Journal(journal_path(download_dir))
+    extraction_cache = ExtractionCache(args.extraction_cache) if args.extraction_cache else None
+    resuming = args.resume and not (args.reading_lists or args.citation)
+    if resuming:
+        citation_list = journal.unfinished()
+    elif args.stream:
+        # filled in as the reading lists are read
+        citation_list = []
+    else:
+        citation_list = read_citations(args.reading_lists, args.citation,
+                                       args.stared_only, metrics, extraction_cache)
+    if not (citation_list or args.stream):
+        print('lrldcli: no citations found', file=sys.stderr)
+        return EXIT_OK if resuming else EXIT_FAILURES
+    credentials = get_credentials(args)
+    if not credentials or any(password is None for _, password in credentials):
+        print('lrldcli: set LRLD_USERNAME and LRLD_PASSWORD, or store the '
+              'password in the keyring', file=sys.stderr)
+        return EXIT_LOGIN_FAILED
+    if len(credentials) > 1 and args.engine == 'async':
+        print('lrldcli: several accounts need the threads engine', file=sys.stderr)
+        return EXIT_LOGIN_FAILED
+
+    citations = citation_list
+    if args.stream and not resuming:
+        citations = prefetch(iter_citations(args.reading_lists, args.citation,
+                                            args.stared_only, metrics, extraction_cache),
+                             citation_list)
+    citations = journal.start_batch(citations, skip_done=args.resume)
+    if citations == []:
+        print('lrldcli: every case has already been downloaded', file=sys.stderr)
+        return EXIT_OK
+
+    browser = create_browser(args, len(credentials), metrics, journal)
+    if isinstance(browser, SessionPool):
+        browser.update_download_info(credentials, USERTYPES[args.usertype],
+                                     citation_list, download_dir)
+    else:
+        username, password = credentials[0]
+        browser.update_download_info(username, password, USERTYPES[args.usertype],
+                                     citation_list, download_dir)
+    output = sys.stdout if args.output == '-' else open(args.output, 'a', encoding='utf-8')
+    try:
+        # the engine's progress messages must not end up in the JSON lines
+        with contextlib.redirect_stdout(sys.stderr), cancel_on_interrupt(journal):
+            return run(browser, citations, output)
+    finally:
+        close_browser(browser)
+        if output is not sys.stdout:
+            output.close()
+        if args.metrics:
+            metrics.write(args.metrics)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,18 @@
 import sys
+import multiprocessing
 import subprocess
-import threading
 import pathlib
 import datetime
 import requests
 from PySide2 import QtCore, QtWidgets, QtGui
 from PySide2.QtCore import Slot, QSettings
 from distutils.version import StrictVersion
-from multiprocessing.dummy import Pool as ThreadPool
 
 import lawnetsearch
 import parsedocs
+from cookiestore import CookieStore
+from extractcache import ExtractionCache
+from journal import Journal, journal_path
 
 VERSION = '1.0.3'
 
@@ -27,12 +29,20 @@ class ProgressBar(QtCore.QThread):
         self.progress_counter = 0
 
     def finish_job(self, downloader):
-        if self.progress_counter < 100:
-            self.progress_update.emit(100)
+        # 100 ends the run in the UI, so it is only sent once the pending
+        # renders have reported and been counted
+        self.progress_update.emit(100)
         file_to_show = downloader.download_dir
         subprocess.call(["open", "-R", file_to_show])
 
     def run(self):
+        # cases finished by an earlier run into the same folder are skipped
+        citation_list = self.downloader.journal.start_batch(self.citation_list, skip_done=True)
+        for case in self.citation_list:
+            if case not in citation_list:
+                self.progress_counter += self.progress_per_case
+                self.download_status.emit(case + "{" + 'Downloaded in an earlier run.')
+
         login_status = self.downloader.login_lawnet()
 
         if login_status == 'FAIL':
@@ -40,20 +50,16 @@ class ProgressBar(QtCore.QThread):
 
         elif login_status == 'SUCCESS':
             self.download_status.emit('Login success!')
-            search_lock = threading.Lock()
-            signal_lock = threading.Lock()
 
-            def run_download(case):
-                signal = self.downloader.download_case(
-                    case, search_lock)
+            # results are streamed back as each case completes
+            for case, signal in self.downloader.download_cases(citation_list):
                 self.progress_counter += self.progress_per_case
-                signal_lock.acquire()
                 self.download_status.emit(case + "{" + signal)
-                signal_lock.release()
-                self.progress_update.emit(int(self.progress_counter))
+                self.progress_update.emit(min(int(self.progress_counter), 99))
 
-            with ThreadPool(10) as pool:
-                pool.map(run_download, self.citation_list)
+            # case pages without a PDF finish rendering after the downloads
+            for case, signal in self.downloader.pending_conversions():
+                self.download_status.emit(case + "{" + signal)
 
             self.finish_job(self.downloader)
 
@@ -70,10 +76,13 @@ class App(QtWidgets.QWidget):
         self.reading_list_directory = None
         self.citation_list = []
         self.stared_only = False
+        # reopening a reading list, or toggling stared cases, reads the cache
+        self.extraction_cache = ExtractionCache()
         self.settings = QSettings('LegalList')
         self.load_settings()
         self.initUI()
-        self.downloader = lawnetsearch.LawnetBrowser()
+        # the login is kept between runs, encrypted under the password
+        self.downloader = lawnetsearch.LawnetBrowser(cookie_store=CookieStore())
         self.successful_downloads = 0
 
     def initUI(self):
@@ -266,7 +275,7 @@ class App(QtWidgets.QWidget):
         # with the case names, construct the table
         if reading_list[0]:
             self.citation_list = parsedocs.start_extract(
-                reading_list[0], self.stared_only)
+                reading_list[0], self.stared_only, cache=self.extraction_cache)
 
             for row_num, case_title in enumerate(self.citation_list):
                 self.construct_table_row_from_list(row_num, case_title)
@@ -325,6 +334,7 @@ class App(QtWidgets.QWidget):
                                                      usertype,
                                                      self.citation_list,
                                                      self.download_directory)
+                self.downloader.journal = Journal(journal_path(self.downloader.download_dir))
                 self.download_runner = ProgressBar(self.downloader)
 
                 self.download_runner.start()
@@ -458,6 +468,8 @@ class App(QtWidgets.QWidget):
 
 
 if __name__ == '__main__':
+    # needed for the HTML rendering processes in the frozen app
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication(sys.argv)
     ex = App()
     sys.exit(app.exec_())
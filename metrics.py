@@ -0,0 +1,213 @@
+import bisect
+import contextvars
+import csv
+import json
+import threading
+import time
+
+# the citation being worked on, so that spans deep in the pipeline are
+# attributed to their case in threads and asyncio tasks alike
+CURRENT_CASE = contextvars.ContextVar('current_case', default=None)
+
+# upper bounds in seconds of the histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1, 2.5, 5, 10, 30, 60, float('inf'))
+
+
+class Histogram():
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def quantile(self, fraction):
+        # interpolated within the bucket the quantile falls in
+        rank = fraction * self.count
+        seen = 0
+        lower = 0.0
+        for upper, count in zip(BUCKETS, self.counts):
+            if count and seen + count >= rank:
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        }
+
+
+class NoSpan():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_SPAN = NoSpan()
+
+
+class Span():
+    __slots__ = ('metrics', 'stage', 'case', 'start', 'token')
+
+    def __init__(self, metrics, stage, case=None):
+        self.metrics = metrics
+        self.stage = stage
+        self.case = case
+        self.token = None
+
+    def __enter__(self):
+        if self.case is not None:
+            self.token = CURRENT_CASE.set(self.case)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.stage, time.perf_counter() - self.start,
+                            start=self.start, case=self.case)
+        if self.token is not None:
+            CURRENT_CASE.reset(self.token)
+        return False
+
+
+class LockWait():
+    # holds a lock for the body of the with block, timing how long it
+    # took to acquire
+    __slots__ = ('metrics', 'lock', 'stage')
+
+    def __init__(self, metrics, lock, stage):
+        self.metrics = metrics
+        self.lock = lock
+        self.stage = stage
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self.lock.acquire()
+        self.metrics.record(self.stage, time.perf_counter() - start, start=start)
+        return self.lock
+
+    def __exit__(self, *exc_info):
+        self.lock.release()
+        return False
+
+
+class Metrics():
+    """
+    Records how long each case spends in each stage of the pipeline as
+    spans, and aggregates them into one histogram per stage. Reports can
+    be written as JSON, CSV or Prometheus text. A disabled instance hands
+    out shared no-op spans, so instrumented code costs next to nothing.
+    """
+
+    def __init__(self, enabled=True, keep_spans=True):
+        self.enabled = enabled
+        self.keep_spans = keep_spans
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.histograms = {}
+        self.spans = []
+
+    def span(self, stage):
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, stage)
+
+    def case(self, case_citation):
+        # spans the whole case and attributes everything inside it to the case
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, 'case', case_citation)
+
+    def waiting(self, lock, stage):
+        if not self.enabled:
+            return lock
+        return LockWait(self, lock, stage)
+
+    def record(self, stage, seconds, start=None, case=None):
+        if not self.enabled:
+            return
+        if case is None:
+            case = CURRENT_CASE.get()
+        if start is None:
+            start = time.perf_counter() - seconds
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+            if self.keep_spans:
+                self.spans.append((case, stage, start - self.started, seconds))
+
+    def report(self):
+        with self.lock:
+            stages = {stage: histogram.summary()
+                      for stage, histogram in self.histograms.items()}
+            spans = list(self.spans)
+        cases = {}
+        for case, stage, _, seconds in spans:
+            if case is not None:
+                case_stages = cases.setdefault(case, {})
+                case_stages[stage] = case_stages.get(stage, 0) + seconds
+        return {'stages': stages, 'cases': cases}
+
+    def write_json(self, report_path):
+        with open(report_path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+    def write_csv(self, report_path):
+        # one row per span
+        with self.lock:
+            spans = list(self.spans)
+        with open(report_path, 'w', newline='', encoding='utf-8') as report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(['case', 'stage', 'start', 'seconds'])
+            for case, stage, start, seconds in spans:
+                writer.writerow([case or '', stage, f'{start:.6f}', f'{seconds:.6f}'])
+
+    def prometheus(self, name='lrld_stage_seconds'):
+        lines = [f'# HELP {name} Time spent in each stage of the download pipeline.',
+                 f'# TYPE {name} histogram']
+        with self.lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for upper, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    bound = '+Inf' if upper == float('inf') else repr(upper)
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, report_path):
+        with open(report_path, 'w', encoding='utf-8') as report_file:
+            report_file.write(self.prometheus())
+
+    def write(self, report_path):
+        # the format follows the file extension: .csv, .prom or JSON
+        if report_path.endswith('.csv'):
+            self.write_csv(report_path)
+        elif report_path.endswith('.prom'):
+            self.write_prometheus(report_path)
+        else:
+            self.write_json(report_path)
+
+
+DISABLED = Metrics(enabled=False)
@@ -1,68 +1,213 @@
 from docx import Document
-import re
-import itertools
+import bisect
+from collections import namedtuple
+import docxreader
+import citations
 import parsepdf
+from metrics import DISABLED
 
 # https://python-docx.readthedocs.io/en/latest/
 
 
-def extract_docx(filepath):
-    document = Document(filepath)
-    paragraph_list = [
-        strip_non_breaking_space(i.text) for i in document.paragraphs
-    ]
+READING_LIST_TYPES = ('.docx', '.pdf')
+
+# a citation found by the scanner, with its whitespace normalised, whether
+# it was marked with a * and where it was found
+CitationMatch = namedtuple('CitationMatch', ['citation', 'stared', 'location'])
+
+# joins blocks of text for the scanner; no citation can match across it
+BLOCK_SEPARATOR = '\x00'
+
+# characters of a PDF page kept back so that a citation running onto the
+# next page is matched whole
+PAGE_OVERLAP = 500
+
+# docx reading lists are streamed from their XML, which also reaches their
+# footnotes, endnotes and text boxes; python-docx is used when this is off
+# or a document cannot be streamed
+STREAM_DOCX = True
 
-    table_list = []
+# bump when a change to the scanner or the readers changes what they
+# find, so that cached extractions are redone
+EXTRACTOR_VERSION = 1
 
-    def text_from_table(table):
-        for row in table.rows:
-            for cell in row.cells:
-                table_list.append(strip_non_breaking_space(cell.text))
+# processes used to read long PDFs; PDFs are read without layout analysis,
+# which the citation patterns do not need
+PDF_PROCESSES = 1
 
-    for i in document.tables:
-        text_from_table(i)
 
-    return paragraph_list + table_list
+def docx_blocks(filepath):
+    # the text of each paragraph and table cell, with where it was found
+    if STREAM_DOCX:
+        try:
+            return [(location, strip_non_breaking_space(text))
+                    for location, text in docxreader.iter_blocks(filepath)]
+        except docxreader.READ_ERRORS:
+            pass
+    return python_docx_blocks(filepath)
 
 
-def extract_pdf(filepath):
-    return [parsepdf.pdf_to_text(filepath).replace('\n', ' ')]
+def python_docx_blocks(filepath):
+    document = Document(filepath)
+    blocks = [(f'paragraph {number}', strip_non_breaking_space(paragraph.text))
+              for number, paragraph in enumerate(document.paragraphs, 1)]
+
+    for table_number, table in enumerate(document.tables, 1):
+        for row_number, row in enumerate(table.rows, 1):
+            for cell_number, cell in enumerate(row.cells, 1):
+                blocks.append((f'table {table_number} row {row_number} cell {cell_number}',
+                               strip_non_breaking_space(cell.text)))
+
+    return blocks
+
+
+def extract_docx(filepath):
+    return [text for _, text in docx_blocks(filepath)]
 
 
 def strip_non_breaking_space(sentence):
     return sentence.replace('\xa0', ' ')
 
 
-def start_extract(filepath, stared=False):
+def start_extract(filepath, stared=False, metrics=DISABLED, cache=None):
+    return list({match.citation for match in iter_file_matches(filepath, metrics, cache)
+                 if match.stared or not stared})
+
+
+def extractor_version():
+    return f"{EXTRACTOR_VERSION}-{'stream' if STREAM_DOCX else 'python-docx'}"
+
+
+def iter_file_matches(filepath, metrics=DISABLED, cache=None):
+    # the matches of scan_file, read from an ExtractionCache when the file
+    # has been scanned before; both stared and unstared matches are kept
+    if cache is None:
+        yield from scan_file(filepath, metrics)
+        return
+    key = cache.key(filepath)
+    version = extractor_version()
+    matches = cache.get(key, version)
+    if matches is not None:
+        yield from (CitationMatch(*match) for match in matches)
+        return
+    matches = []
+    for match in scan_file(filepath, metrics):
+        matches.append(match)
+        yield match
+    cache.put(key, version, matches)
+
+
+def is_stared(text, start, floor):
+    # a * before the citation with no brackets in between; a * marks only
+    # the citation after it, so the search stops at floor, where the last
+    # citation ended
+    star = text.rfind('*', floor, start)
+    if star == -1:
+        return False
+    between = text[star + 1:start]
+    return '[' not in between and ']' not in between
+
+
+def scan_blocks(blocks):
+    """
+    Scans (location, text) blocks, such as the paragraphs and table cells
+    of a document, in one pass over their joined text. Yields a
+    CitationMatch for every citation, stared or not.
+    """
+    locations = []
+    starts = []
+    texts = []
+    offset = 0
+    for location, text in blocks:
+        locations.append(location)
+        starts.append(offset)
+        texts.append(text)
+        offset += len(text) + len(BLOCK_SEPARATOR)
+    text = BLOCK_SEPARATOR.join(texts)
+
+    floor = 0
+    for match in citations.SCAN_PATTERN.finditer(text):
+        block = bisect.bisect_right(starts, match.start()) - 1
+        floor = max(floor, starts[block])
+        yield CitationMatch(citations.normalise(match.group()),
+                            is_stared(text, match.start(), floor), locations[block])
+        floor = match.end()
+
+
+def iter_page_matches(pages, citation_pattern, overlap=PAGE_OVERLAP):
+    # matches across page breaks as if the pages had been joined, while
+    # only holding on to the current page and the tail of the last one;
+    # each match comes with the offset of its text in the joined pages
+    text = ''
+    offset = 0
+    for page in pages:
+        text += page.replace('\n', ' ')
+        # a match this close to the end may still grow on the next page
+        settled = len(text) - overlap
+        keep_from = max(settled, 0)
+        for match in citation_pattern.finditer(text):
+            if match.end() > settled:
+                keep_from = min(keep_from, match.start())
+                break
+            yield match, offset
+        text = text[keep_from:]
+        offset += keep_from
+    for match in citation_pattern.finditer(text):
+        yield match, offset
+
+
+def scan_pdf_pages(pages, overlap=PAGE_OVERLAP):
+    # as scan_blocks, for the pages of a PDF, which citations run across
+    page_starts = []
+
+    def numbered(pages):
+        offset = 0
+        for page in pages:
+            page_starts.append(offset)
+            offset += len(page)
+            yield page
+
+    floor = 0
+    for match, offset in iter_page_matches(numbered(pages), citations.SCAN_PATTERN, overlap):
+        page = bisect.bisect_right(page_starts, offset + match.start())
+        stared = is_stared(match.string, match.start(), max(floor - offset, 0))
+        yield CitationMatch(citations.normalise(match.group()), stared, f'page {page}')
+        floor = offset + match.end()
+
+
+def scan_file(filepath, metrics=DISABLED):
+    # PDF pages are scanned as they are read
     file_type = filepath.split('.')[-1].lower()
     if 'docx' in file_type:
-        full_text = extract_docx(filepath)
+        with metrics.span('read_document'):
+            blocks = docx_blocks(filepath)
+        with metrics.span('match_citations'):
+            matches = list(scan_blocks(blocks))
+        yield from matches
     elif 'pdf' in file_type:
-        full_text = extract_pdf(filepath)
-
-    def check_lawnet_compatibility(case_citation):
-        lawnet_casetypes = ['SLR', 'SGCA', 'SGHC', 'WLR', 'MLJ', 'Ch', 'SGDC', 'AC', ' UKSC', 'Ch', 'WLR', 'QB']
-        for casetype in lawnet_casetypes:
-            return True
-
-    if stared:
-        citation_pattern = re.compile(r'\*[^\[\]]*([[(][1-2]\d{3}(?:-[1-2]\d{3})?[\])]\s[\d\s]*[LR]+\s\d+\s[EqCP]+\s+\d+)|\*[^\[\]]*([[(][1-2]\d{3}(?:-[1-2]\d{3})?[\])]\s[\d\s]*[SLR()WMJChAFQBtra\.]+\s\d+)|\*[^\[\]]*(\[[1-2]\d{3}(?:-[1-2]\d{3})?\]\s[A-Za-z()\.]+\s\d+)'
-        )
-    else:
-        citation_pattern = re.compile(r'[\[\(][1-2]\d{3}(?:\-[1-2]\d{3})?[\]\)]\s[\d\s]*[LR]+\s\d+\s[EqCP]+\s+\d+|[\[\(][1-2]\d{3}(?:\-[1-2]\d{3})?[\]\)]\s[\d\s]*[SLR()WLRMLJChACFQBStra\.]+\s\d+|\[[1-2]\d{3}(?:\-[1-2]\d{3})?\]\s[A-Za-z()\.]+\s\d+'
-        )
-
-    citation_list = [re.findall(citation_pattern, i) for i in full_text]
-    if stared:
-        citation_list = [
-            item[1] for item in itertools.chain.from_iterable(citation_list)
-        ]
-    else:
-        citation_list = itertools.chain.from_iterable(citation_list)
-
-    citation_list = set(citation_list)
-
-    citation_list = [
-        ' '.join(citation.split()) for citation in citation_list
-    ]
-    return citation_list
+        pages = parsepdf.iter_pdf_pages(filepath, fast=True, processes=PDF_PROCESSES)
+        yield from scan_pdf_pages(timed(pages, metrics, 'read_page'))
+
+
+def timed(iterable, metrics, stage):
+    # records how long each item took to produce
+    iterator = iter(iterable)
+    while True:
+        with metrics.span(stage):
+            item = next(iterator, None)
+        if item is None:
+            return
+        yield item
+
+
+def iter_citations(filepath, stared=False, metrics=DISABLED, cache=None):
+    """
+    Yields the citations in a reading list as they are found, each one
+    once, so that downloads can start before a long PDF has been read to
+    the end. The citations are those start_extract returns.
+    """
+    seen = set()
+    for match in iter_file_matches(filepath, metrics, cache):
+        if (match.stared or not stared) and match.citation not in seen:
+            seen.add(match.citation)
+            yield match.citation
@@ -1,27 +1,107 @@
 from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter  # process_pdf
 from pdfminer.pdfpage import PDFPage
-from pdfminer.converter import TextConverter
-from pdfminer.layout import LAParams
+from pdfminer.converter import TextConverter, PDFLayoutAnalyzer
+from pdfminer.layout import LAParams, LTChar, LTContainer
 from io import StringIO
+import functools
+import multiprocessing
 
+# pages given to each process when a long PDF is split across a pool
+SHARD_PAGES = 25
 
-def pdf_to_text(pdfname):
+
+class FastTextConverter(PDFLayoutAnalyzer):
+    """
+    Writes out the characters of each page in the order they are drawn,
+    skipping layout analysis. Citation matching only needs the breaks
+    between words and lines, so a newline is written where the text moves
+    to another line and a space where it jumps further than a word gap.
+    """
+
+    # the gap between characters that counts as a space, relative to the
+    # size of the character, as in LAParams
+    WORD_MARGIN = 0.1
+
+    def __init__(self, rsrcmgr, outfp):
+        super().__init__(rsrcmgr, laparams=None)
+        self.outfp = outfp
+        self.last_char = None
+
+    def receive_layout(self, ltpage):
+        self.last_char = None
+        self.render(ltpage)
+        self.outfp.write('\f')
+
+    def render(self, item):
+        if isinstance(item, LTChar):
+            self.write_char(item)
+        elif isinstance(item, LTContainer):
+            for child in item:
+                self.render(child)
+
+    def write_char(self, char):
+        text = char.get_text()
+        last = self.last_char
+        if last is not None and not (text.isspace() or last.get_text().isspace()):
+            if abs(char.y0 - last.y0) > last.height / 2:
+                self.outfp.write('\n')
+            elif char.x0 - last.x1 > self.WORD_MARGIN * max(last.width, last.height):
+                self.outfp.write(' ')
+        self.outfp.write(text)
+        self.last_char = char
+
+
+def pdf_to_text(pdfname, fast=False, processes=1):
+    return ''.join(iter_pdf_pages(pdfname, fast, processes))
+
+
+def iter_pdf_pages(pdfname, fast=False, processes=1):
+    # yields the text of each page as soon as it has been read; with
+    # several processes, long PDFs are read in page ranges side by side
+    if processes > 1:
+        page_count = count_pages(pdfname)
+        if page_count > SHARD_PAGES:
+            yield from iter_sharded_pages(pdfname, fast, processes, page_count)
+            return
+    yield from read_pages(pdfname, fast)
+
+
+def read_pages(pdfname, fast=False, pagenos=None):
     rsrcmgr = PDFResourceManager()
     sio = StringIO()
-    codec = 'utf-8'
-    laparams = LAParams()
-    device = TextConverter(rsrcmgr, sio, codec=codec, laparams=laparams)
+    if fast:
+        device = FastTextConverter(rsrcmgr, sio)
+    else:
+        device = TextConverter(rsrcmgr, sio, codec='utf-8', laparams=LAParams())
     interpreter = PDFPageInterpreter(rsrcmgr, device)
 
-    # Extract text
+    try:
+        with open(pdfname, 'rb') as fp:
+            for page in PDFPage.get_pages(fp, pagenos):
+                interpreter.process_page(page)
+                yield sio.getvalue()
+                sio.seek(0)
+                sio.truncate()
+    finally:
+        device.close()
+        sio.close()
+
+
+def read_page_range(pdfname, fast, page_range):
+    return list(read_pages(pdfname, fast, set(page_range)))
+
+
+def count_pages(pdfname):
+    # only the page tree is read, not the page contents
     with open(pdfname, 'rb') as fp:
-        for page in PDFPage.get_pages(fp):
-            interpreter.process_page(page)
-    # Get text from StringIO
-    text = sio.getvalue()
+        return sum(1 for _ in PDFPage.get_pages(fp))
 
-    # Cleanup
-    device.close()
-    sio.close()
 
-    return text
+def iter_sharded_pages(pdfname, fast, processes, page_count):
+    page_ranges = [range(start, min(start + SHARD_PAGES, page_count))
+                   for start in range(0, page_count, SHARD_PAGES)]
+    # forking from the threads that stream reading lists is unsafe
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        for pages in pool.imap(functools.partial(read_page_range, pdfname, fast),
+                               page_ranges):
+            yield from pages
@@ -0,0 +1,120 @@
+import random
+import threading
+import time
+
+# statuses LawNet and the proxy return while they are struggling, which
+# are worth retrying; anything else is answered the same way every time
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryableStatus(Exception):
+    def __init__(self, status):
+        super().__init__(f'LawNet responded with {status}')
+        self.status = status
+
+
+class LawnetUnavailable(Exception):
+    pass
+
+
+class SessionExpired(Exception):
+    pass
+
+
+class SearchRejected(Exception):
+    # a search or case page that LawNet refused, which says nothing about
+    # whether the case exists
+    pass
+
+
+class RetryPolicy():
+    """
+    How often and how patiently one kind of request is retried. Delays
+    grow exponentially with full jitter, so that workers which failed
+    together do not all retry at the same moment.
+    """
+
+    def __init__(self, attempts=4, base_delay=0.5, max_delay=10,
+                 statuses=RETRY_STATUSES, retry_timeouts=True):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = statuses
+        # a timed out request may already have been processed by LawNet
+        self.retry_timeouts = retry_timeouts
+
+    def retry_status(self, status):
+        return status in self.statuses
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker():
+    """
+    Trips after a run of consecutive failures and holds every worker
+    back until the reset timeout has passed. A single probe request is
+    then let through: if it succeeds the breaker closes, otherwise it
+    trips again. After max_trips trips in a row LawNet is taken to be
+    down and the remaining requests fail straight away, until reset is
+    called for the next batch.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, max_trips=4):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_trips = max_trips
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.consecutive_trips = 0
+        self.trips = 0
+
+    def pause(self):
+        # returns how long to wait before sending a request, 0 to go ahead
+        with self.lock:
+            if self.opened_at is None:
+                return 0
+            if self.consecutive_trips >= self.max_trips:
+                raise LawnetUnavailable('LawNet is not responding')
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                return remaining
+            if self.probing:
+                # wait for the probe to report back
+                return min(1, self.reset_timeout)
+            self.probing = True
+            return 0
+
+    def reset(self):
+        # a new batch probes LawNet again, however the last one ended
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            self.consecutive_trips = 0
+
+    def record(self, ok):
+        with self.lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                self.probing = False
+                self.consecutive_trips = 0
+                return
+            self.failures += 1
+            if self.probing or (self.opened_at is None
+                                and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.probing = False
+                self.consecutive_trips += 1
+                self.trips += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'open': self.opened_at is not None,
+                'trips': self.trips,
+                'consecutive_failures': self.failures,
+            }
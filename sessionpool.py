@@ -0,0 +1,251 @@
+import queue
+import threading
+import time
+from multiprocessing.dummy import Pool as ThreadPool
+
+from lawnetsearch import LawnetBrowser
+from htmlrender import HtmlRenderer
+from metrics import DISABLED
+from journal import Journal
+
+
+class Account():
+    def __init__(self, browser, username):
+        self.browser = browser
+        self.username = username
+        self.lock = threading.Lock()
+        # bumped on every login so an expiry is only handled once
+        self.generation = 0
+        self.relogins = 0
+        # relogins since the session last served a case; only a run of
+        # them retires the account
+        self.failed_relogins = 0
+        self.active = False
+        self.cases = 0
+        self.started = None
+        self.finished = None
+
+    def record(self):
+        with self.lock:
+            self.cases += 1
+            self.failed_relogins = 0
+            self.finished = time.monotonic()
+
+    def stats(self):
+        with self.lock:
+            elapsed = (self.finished - self.started) if self.finished else 0
+            return {
+                'username': self.username,
+                'active': self.active,
+                'cases': self.cases,
+                'elapsed': elapsed,
+                'cases_per_second': self.cases / elapsed if elapsed else 0,
+                'relogins': self.relogins,
+                'retries': self.browser.run_stats()['retries'],
+            }
+
+
+class SessionPool():
+    """
+    Spreads a batch over several LawNet accounts, each with its own
+    session, form token and concurrency limits, so that throttling on
+    one account does not cap the whole run. Every account's workers take
+    citations from one shared queue, which keeps a slow session from
+    holding back the cases it would otherwise have been given. A session
+    that expires is logged in again; an account that cannot log in any
+    more is retired and its cases go to the others.
+    """
+
+    MAX_RELOGINS = 3
+    # times one case is handed back after its session expired, so that a
+    # case the accounts cannot reach does not retire every account
+    MAX_CASE_REQUEUES = 3
+
+    def __init__(self, workers=4, render_workers=2, render_timeout=120,
+                 browser_class=LawnetBrowser, **browser_options):
+        # browser_options such as case_store, citation_cache and journal are shared
+        # by every account's browser, as is the HTML renderer
+        self.workers = workers
+        self.browser_class = browser_class
+        if browser_options.get('journal') is None:
+            browser_options['journal'] = Journal()
+        # pausing or cancelling the journal holds back every account
+        self.journal = browser_options['journal']
+        self.browser_options = browser_options
+        self.renderer = HtmlRenderer(
+            render_workers, render_timeout,
+            metrics=browser_options.get('metrics', DISABLED)) if render_workers else None
+        self.accounts = []
+        self.citation_list = []
+        self.download_dir = None
+
+    def create_browser(self):
+        browser = self.browser_class(workers=self.workers, render_workers=0,
+                                     **self.browser_options)
+        browser.renderer = self.renderer
+        return browser
+
+    def update_download_info(self, credentials, login_prefix, citation_list,
+                             download_dir=None):
+        # credentials is a list of (username, password) pairs
+        self.accounts = []
+        for username, password in credentials:
+            browser = self.create_browser()
+            browser.update_download_info(username, password, login_prefix,
+                                         citation_list, download_dir)
+            self.accounts.append(Account(browser, username))
+        self.citation_list = citation_list
+        self.download_dir = self.accounts[0].browser.download_dir
+
+    def login_lawnet(self):
+        # accounts log in concurrently; the pool works if any of them does
+        def login(account):
+            account.active = account.browser.login_lawnet() == 'SUCCESS'
+
+        with ThreadPool(len(self.accounts)) as pool:
+            pool.map(login, self.accounts)
+        return 'SUCCESS' if self.active_accounts() else 'FAIL'
+
+    def active_accounts(self):
+        return [account for account in self.accounts if account.active]
+
+    def relogin(self, account, generation):
+        # returns whether the account can keep taking cases
+        with account.lock:
+            if account.generation != generation:
+                # another worker has already logged this session in again
+                return account.active
+            account.generation += 1
+            account.relogins += 1
+            account.failed_relogins += 1
+            if account.failed_relogins > self.MAX_RELOGINS:
+                account.active = False
+                return False
+            account.active = account.browser.login_lawnet() == 'SUCCESS'
+            return account.active
+
+    def download_cases(self, citation_list):
+        # yields (citation, status) pairs as each download completes
+        accounts = self.active_accounts()
+        if not accounts:
+            for case_citation in citation_list:
+                yield case_citation, LawnetBrowser.SESSION_EXPIRED
+            return
+
+        for account in accounts:
+            account.browser.breaker.reset()
+        work = queue.Queue()
+        results = queue.Queue()
+        # cases queued but not yet reported, workers not yet finished, and
+        # whether citations are still coming from the citation list
+        remaining = {'cases': 0, 'workers': len(accounts) * self.workers,
+                     'feeding': True, 'error': None}
+        remaining_lock = threading.RLock()
+        requeues = {}
+
+        def report(case_citation, status):
+            results.put((case_citation, status))
+            with remaining_lock:
+                remaining['cases'] -= 1
+
+        def finish():
+            # the results end once the feeder and every worker are done
+            if remaining['workers'] == 0 and not remaining['feeding']:
+                results.put(None)
+
+        def feed():
+            # the citation list may be a generator still reading the
+            # reading list, so it is consumed here rather than up front
+            try:
+                for case_citation in citation_list:
+                    with remaining_lock:
+                        remaining['cases'] += 1
+                        if remaining['workers'] == 0:
+                            # every account has been retired
+                            report(case_citation, LawnetBrowser.SESSION_EXPIRED)
+                        else:
+                            work.put(case_citation)
+            except Exception as error:
+                remaining['error'] = error
+            finally:
+                with remaining_lock:
+                    remaining['feeding'] = False
+                    finish()
+
+        def run_worker(account):
+            try:
+                while account.active and (remaining['feeding'] or remaining['cases'] > 0):
+                    try:
+                        # cases can be handed back until the last one is reported
+                        case_citation = work.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    generation = account.generation
+                    try:
+                        status = account.browser.download_case_or_fail(case_citation)
+                    except Exception:
+                        # every case must be reported, or the batch never ends
+                        status = 'Download failed.'
+                    if status == account.browser.SESSION_EXPIRED:
+                        with remaining_lock:
+                            requeues[case_citation] = requeues.get(case_citation, 0) + 1
+                            requeued = requeues[case_citation] <= self.MAX_CASE_REQUEUES
+                        if requeued:
+                            # hand the case back whether or not this account survives
+                            work.put(case_citation)
+                        else:
+                            report(case_citation, status)
+                        self.relogin(account, generation)
+                        continue
+                    account.record()
+                    report(case_citation, status)
+            finally:
+                with remaining_lock:
+                    remaining['workers'] -= 1
+                    if remaining['workers'] == 0:
+                        # every account has been retired or the batch is done,
+                        # either way nobody is left to take the queued cases
+                        while not work.empty():
+                            report(work.get_nowait(), LawnetBrowser.SESSION_EXPIRED)
+                        finish()
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=feed, daemon=True)]
+        threads[0].start()
+        for account in accounts:
+            account.started = start
+            for _ in range(self.workers):
+                thread = threading.Thread(target=run_worker, args=(account,), daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        result = results.get()
+        while result is not None:
+            yield result
+            result = results.get()
+        for thread in threads:
+            thread.join()
+        if remaining['error'] is not None:
+            raise remaining['error']
+
+    def pending_conversions(self):
+        if not self.accounts:
+            return iter(())
+        return self.accounts[0].browser.pending_conversions()
+
+    def session_stats(self):
+        return [account.stats() for account in self.accounts]
+
+    def run_stats(self):
+        retries = {}
+        breaker_trips = 0
+        for account in self.accounts:
+            stats = account.browser.run_stats()
+            for policy, count in stats['retries'].items():
+                retries[policy] = retries.get(policy, 0) + count
+            breaker_trips += stats['breaker_trips']
+        return {
+            'retries': retries,
+            'breaker_trips': breaker_trips,
+            'sessions': self.session_stats(),
+        }
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import threading
+
+
+class SqliteStore():
+    """
+    A SQLite file shared by the download workers through one connection
+    and one lock. Subclasses list their CREATE TABLE statements in
+    TABLES. Those capped at max_bytes name the table whose size column
+    counts against the cap in SIZED_TABLE, with the columns of its key in
+    SIZED_KEY, and its least recently used rows are evicted. Without
+    max_bytes the store is not capped.
+    """
+
+    TABLES = ()
+    SIZED_TABLE = None
+    SIZED_KEY = None
+
+    def __init__(self, db_path, max_bytes=None):
+        self.max_bytes = max_bytes
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        with self.db:
+            for table in self.TABLES:
+                self.db.execute(table)
+
+    def total_size(self):
+        with self.lock:
+            return self.db.execute(
+                f'SELECT COALESCE(SUM(size), 0) FROM {self.SIZED_TABLE}').fetchone()[0]
+
+    def evict(self):
+        # drop least recently used rows until the store fits its cap
+        if self.max_bytes is None:
+            return
+        while self.total_size() > self.max_bytes:
+            with self.lock:
+                row = self.db.execute(
+                    f'SELECT {self.SIZED_KEY} FROM {self.SIZED_TABLE} '
+                    'ORDER BY last_used LIMIT 1').fetchone()
+            if row is None:
+                break
+            self.remove(*row)
+
+    def remove(self, *key):
+        # stores that keep more than the row, such as files, extend this
+        columns = ' AND '.join(f'{column.strip()} = ?' for column in self.SIZED_KEY.split(','))
+        with self.lock, self.db:
+            self.db.execute(f'DELETE FROM {self.SIZED_TABLE} WHERE {columns}', key)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
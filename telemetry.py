@@ -1,17 +1,148 @@
-from applicationinsights import TelemetryClient
+import atexit
+import json
+import os
+import queue
+import threading
+import time
 
+INSTRUMENTATION_KEY = '0d21236a-e9fc-447d-910b-359ceda2fac5'
+
+
+class AppInsightsSink():
+    def __init__(self, instrumentation_key=INSTRUMENTATION_KEY):
+        # imported here so that offline installs can do without it
+        from applicationinsights import TelemetryClient
+        self.client = TelemetryClient(instrumentation_key)
+
+    def send(self, events):
+        for name, properties, _ in events:
+            self.client.track_event(name, properties)
+        self.client.flush()
+
+
+class FileSink():
+    # appends events as JSON lines, for environments without network access
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, events):
+        with open(self.path, 'a', encoding='utf-8') as sink_file:
+            for name, properties, timestamp in events:
+                sink_file.write(json.dumps({'event': name, 'properties': properties,
+                                            'time': timestamp}) + '\n')
+
+
+class TelemetryQueue():
+    """
+    Hands events to a background thread that sends them to the sink in
+    batches, once max_batch events are waiting or flush_interval seconds
+    have passed, and at shutdown. Tracking never blocks the caller: when
+    the queue is full the event is dropped and counted instead.
+    """
+
+    def __init__(self, sink, max_batch=50, flush_interval=5, max_queue=1000):
+        self.sink = sink
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.events = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.failed = 0
+        self.thread = None
+        self.thread_lock = threading.Lock()
+        self.closed = False
+
+    def start(self):
+        with self.thread_lock:
+            if self.thread is None and not self.closed:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+
+    def track(self, name, properties=None):
+        # returns whether the event was queued
+        if self.closed:
+            return False
+        if self.thread is None:
+            self.start()
+        try:
+            self.events.put_nowait((name, properties or {}, time.time()))
+            return True
+        except queue.Full:
+            with self.thread_lock:
+                self.dropped += 1
+            return False
+
+    def run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                event = self.events.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                event = False
+            if event is None:
+                self.send(batch)
+                return
+            if event:
+                batch.append(event)
+            if len(batch) >= self.max_batch or time.monotonic() >= deadline:
+                self.send(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def send(self, batch):
+        if not batch:
+            return
+        try:
+            self.sink.send(batch)
+        except Exception:
+            # telemetry must never take the app down with it
+            self.failed += len(batch)
+
+    def close(self, timeout=5):
+        # flushes whatever is queued and stops the background thread
+        with self.thread_lock:
+            if self.closed:
+                return
+            self.closed = True
+            thread = self.thread
+        if thread is not None:
+            try:
+                self.events.put(None, timeout=timeout)
+            except queue.Full:
+                # the sink is stuck, leave the daemon thread behind
+                return
+            thread.join(timeout)
+
+
+def create_sink():
+    # LRLD_TELEMETRY_FILE sends events to a local file instead
+    sink_path = os.environ.get('LRLD_TELEMETRY_FILE')
+    if sink_path:
+        return FileSink(sink_path)
+    return AppInsightsSink()
+
+
+telemetry_queue = None
+telemetry_queue_lock = threading.Lock()
+
+
+def get_queue():
+    # created on first use, so that importing this module stays cheap
+    global telemetry_queue
+    with telemetry_queue_lock:
+        if telemetry_queue is None:
+            telemetry_queue = TelemetryQueue(create_sink())
+        return telemetry_queue
 
-telemetry_client = TelemetryClient('0d21236a-e9fc-447d-910b-359ceda2fac5')
 
 def log_case_not_found(case_citation):
-    telemetry_client.track_event('Case Not Found', {'Citation': case_citation})
-    telemetry_client.flush()
+    get_queue().track('Case Not Found', {'Citation': case_citation})
 
 
 def log_successful_download(case_citation):
-    telemetry_client.track_event('PDF Downloaded', {'Citation': case_citation})
-    telemetry_client.flush()
+    get_queue().track('PDF Downloaded', {'Citation': case_citation})
+
 
 def log_new_session(username, search_count):
-    telemetry_client.track_event('Session Opened', {'User': username, 'Search Count': search_count})
-    telemetry_client.flush()
+    get_queue().track('Session Opened', {'User': username, 'Search Count': search_count})
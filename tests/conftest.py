@@ -0,0 +1,38 @@
+from asynclawnet import AsyncLawnetBrowser
+from lawnetsearch import LawnetBrowser
+from fake_lawnet import FakeLawnet
+import pytest
+
+
+@pytest.fixture
+def lawnet():
+    lawnet = FakeLawnet().start()
+    yield lawnet
+    lawnet.stop()
+
+
+@pytest.fixture(params=['threads', 'async'])
+def browser(request, lawnet):
+    if request.param == 'async':
+        browser = AsyncLawnetBrowser(max_in_flight=20)
+    else:
+        browser = LawnetBrowser(workers=4)
+    yield lawnet.configure(browser)
+    if request.param == 'async':
+        browser.close()
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    # opens a SQLite backed store at a path under tmp_path, and closes
+    # every store opened once the test ends
+    stores = []
+
+    def open_store(store_class, name, **kwargs):
+        store = store_class(str(tmp_path / name), **kwargs)
+        stores.append(store)
+        return store
+    yield open_store
+    for store in stores:
+        store.close()
+
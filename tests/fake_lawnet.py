@@ -0,0 +1,360 @@
+import random
+import threading
+import time
+import uuid
+from collections import namedtuple
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+# a local stand-in for the SMU SSO and LawNet endpoints used by
+# LawnetBrowser, so that the download engines can be tested offline
+
+FakeCase = namedtuple('FakeCase', ['doc_id', 'case_name', 'citations', 'has_pdf'])
+
+FORM_DATE_FIELD = '_searchbasicformportlet_WAR_lawnet3legalresearchportlet_formDate'
+AUTH_COOKIE = 'fakelawnet'
+
+DEFAULT_CASES = [
+    FakeCase('SLR-2016-3-621', 'Living the Link Pte Ltd v Tan Lay Tin Tina',
+             ['[2016] 3 SLR 621', '[2016] SGHC 34'], True),
+    FakeCase('SLR-2015-2-1179', 'Lim Chin San Contractors Pte Ltd v Ng Sai Tuan',
+             ['[2015] 2 SLR 1179', '[2015] SGCA 12'], True),
+    FakeCase('SGHC-2019-1', 'Tan Ah Kow v Lee Ah Seng',
+             ['[2019] SGHC 1'], False),
+    FakeCase('WLR-1992-2-367', 'In Re Atlantic Computer Systems Plc.',
+             ['[1992] 2 WLR 367'], True),
+]
+
+# paths served once logged in, where injected errors are applied
+LAWNET_PATHS = {'/basic-search', '/result-page', '/page-content'}
+
+
+def generate_cases(count, html_ratio=0.0):
+    # reported SLR cases with PDFs, and a share of neutral citations
+    # that only have a case page
+    cases = []
+    for number in range(count):
+        year, page = 2000 + number // 1000, number % 1000 + 1
+        if number < count * html_ratio:
+            cases.append(FakeCase(f'SGHC-{year}-{page}', f'Case {number} v Tan',
+                                  [f'[{year}] SGHC {page}'], False))
+        else:
+            cases.append(FakeCase(f'SLR-{year}-1-{page}', f'Case {number} Pte Ltd v Tan',
+                                  [f'[{year}] 1 SLR {page}'], True))
+    return cases
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeLawnetHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def lawnet(self):
+        return self.server.lawnet
+
+    def authenticated(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        return (AUTH_COOKIE in cookie
+                and cookie[AUTH_COOKIE].value in self.lawnet.sessions)
+
+    def read_form(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        return parse_qs(body)
+
+    def send_body(self, body, content_type='text/html', status=200, headers=()):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_pdf(self, pdf_data):
+        byte_range = self.headers.get('Range')
+        self.lawnet.ranges.append(byte_range)
+        if byte_range and self.lawnet.accept_ranges:
+            start = int(byte_range.split('=')[1].split('-')[0])
+            total = len(pdf_data)
+            if start >= total:
+                return self.send_body('', 'text/plain', 416, headers=[
+                    ('Content-Range', f'bytes */{total}')])
+            return self.send_body(pdf_data[start:], 'application/pdf', 206, headers=[
+                ('Content-Range', f'bytes {start}-{total - 1}/{total}')])
+        return self.send_body(pdf_data, 'application/pdf')
+
+    def redirect(self, path, headers=()):
+        self.send_response(302)
+        self.send_header('Location', self.lawnet.url(path))
+        self.send_header('Content-Length', '0')
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        self.lawnet.record(url.path)
+        self.lawnet.delay(url.path)
+        fault = self.lawnet.take_fault(url.path)
+        if fault:
+            return self.send_body('<html>Bad gateway</html>', status=fault)
+
+        if url.path == '/login':
+            if self.authenticated():
+                return self.redirect('/basic-search')
+            return self.send_body(self.lawnet.saml_page(
+                'SAMLRequest', 'saml-request'))
+        elif url.path == '/ip-access':
+            if self.authenticated():
+                return self.redirect('/basic-search')
+            return self.redirect('/login')
+        elif not self.authenticated():
+            return self.redirect('/login')
+        elif url.path == '/basic-search':
+            return self.send_body(self.lawnet.search_page())
+        elif url.path == '/page-content':
+            if 'p_p_resource_id' in query:
+                doc_id = query['pdfFileUri'][0].split('/')[0]
+                if doc_id in self.lawnet.broken_pdfs:
+                    # LawNet error pages are served with a 200 status
+                    return self.send_body('<html>Service unavailable</html>')
+                if doc_id in self.lawnet.empty_pdfs:
+                    return self.send_body(b'', 'application/pdf')
+                if doc_id in self.lawnet.cases:
+                    return self.send_pdf(self.lawnet.pdf_data(doc_id))
+            else:
+                doc_id = query['contentDocID'][0].split('.')[0]
+                if doc_id in self.lawnet.cases:
+                    return self.send_body(self.lawnet.case_page(doc_id))
+        self.send_body('Not found', status=404)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        form = self.read_form()
+        self.lawnet.record(url.path)
+        self.lawnet.delay(url.path)
+        fault = self.lawnet.take_fault(url.path)
+        if fault:
+            return self.send_body('<html>Bad gateway</html>', status=fault)
+
+        if url.path == '/adfs/ls':
+            if 'SAMLRequest' in form:
+                return self.send_body(self.lawnet.login_page())
+            username = form.get('UserName', [''])[0].split('\\')[-1]
+            password = form.get('Password', [''])[0]
+            if self.lawnet.accounts.get(username) == password:
+                return self.send_body(self.lawnet.saml_page(
+                    'SAMLResponse', 'saml-response'))
+            return self.send_body(self.lawnet.login_page())
+        elif url.path == '/Shibboleth.sso/SAML2/POST':
+            if form.get('SAMLResponse') != ['saml-response']:
+                return self.redirect('/login')
+            session_id = self.lawnet.new_session()
+            return self.redirect('/ip-access', headers=[
+                ('Set-Cookie', f'{AUTH_COOKIE}={session_id}; Path=/')])
+        elif not self.authenticated():
+            return self.redirect('/login')
+        elif url.path == '/result-page':
+            if form.get(FORM_DATE_FIELD) != [self.lawnet.form_date]:
+                # stale search tokens are bounced back to the search form
+                return self.redirect('/basic-search')
+            search_key = form.get('basicSearchKey', [''])[0]
+            return self.send_body(self.lawnet.results_page(search_key))
+        self.send_body('Not found', status=404)
+
+
+class FakeLawnet():
+    def __init__(self, cases=DEFAULT_CASES, accounts=None, pdf_size=4096,
+                 case_page_size=0, latency=0, jitter=0, error_rate=0,
+                 error_status=503):
+        self.cases = {case.doc_id: case for case in cases}
+        self.accounts = accounts or {'student': 'password'}
+        self.pdf_size = pdf_size
+        # judgment text is padded out to roughly this many bytes
+        self.case_page_size = case_page_size
+        # seconds added to every response, either a number or a dict of
+        # path to seconds, plus up to jitter seconds at random
+        self.latency = latency
+        self.jitter = jitter
+        # share of LawNet requests answered with error_status
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.broken_pdfs = set()
+        self.empty_pdfs = set()
+        self.accept_ranges = True
+        self.ranges = []
+        self.faults = {}
+        self.form_date = '1'
+        self.sessions = set()
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeLawnetHandler)
+        self.server.lawnet = self
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def url(self, path):
+        return self.base_url + path
+
+    def endpoints(self):
+        # the LawnetBrowser URL attributes that point at this server
+        return {
+            'PROXY_LOGIN_URL': self.url('/login'),
+            'SHIBBOLETH_LOGIN_URL': self.url('/login?auth=shibboleth'),
+            'SMU_LOGIN_URL': self.url('/adfs/ls'),
+            'SHIBBOLETH_POST_URL': self.url('/Shibboleth.sso/SAML2/POST'),
+            'SMU_LAWNET_PROXY_URL': self.url('/ip-access'),
+            'LAWNET_SEARCH_URL': self.url('/basic-search'),
+            'SEARCH_FORM_ACTION': self.url('/result-page'),
+            'LAWNET_CASE_URL': self.url('/page-content?contentDocID='),
+            'LAWNET_PDF_URL': self.url(
+                '/page-content?p_p_resource_id=viewPDFSourceDocument'),
+        }
+
+    def configure(self, browser):
+        # point a LawnetBrowser at this server instead of LawNet
+        return configure(browser, self.endpoints())
+
+    def record(self, path):
+        with self.lock:
+            self.requests.append(path)
+
+    def count(self, path):
+        with self.lock:
+            return self.requests.count(path)
+
+    def new_session(self):
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            self.sessions.add(session_id)
+        return session_id
+
+    def fail(self, path, times=None, status=502):
+        # answers the next requests to path with an error status,
+        # or every request if times is None
+        with self.lock:
+            self.faults[path] = [times, status]
+
+    def delay(self, path):
+        latency = self.latency.get(path, 0) if isinstance(self.latency, dict) else self.latency
+        latency += random.uniform(0, self.jitter)
+        if latency:
+            time.sleep(latency)
+
+    def take_fault(self, path):
+        with self.lock:
+            fault = self.faults.get(path)
+            if fault is None:
+                if path in LAWNET_PATHS and random.random() < self.error_rate:
+                    return self.error_status
+                return None
+            times, status = fault
+            if times is not None:
+                if times <= 1:
+                    del self.faults[path]
+                else:
+                    fault[0] = times - 1
+            return status
+
+    def expire_sessions(self):
+        with self.lock:
+            self.sessions.clear()
+
+    def rotate_form_date(self):
+        with self.lock:
+            self.form_date = str(int(self.form_date) + 1)
+
+    def saml_page(self, field, value):
+        return (f'<html><body><form method="post">'
+                f'<input type="hidden" name="{field}" value="{value}"/>'
+                f'<input type="hidden" name="RelayState" value="relay"/>'
+                f'</form></body></html>')
+
+    def login_page(self):
+        return ('<html><body><form method="post">'
+                '<input name="UserName"/><input name="Password"/>'
+                '</form></body></html>')
+
+    def search_page(self):
+        return (f'<html><body><form>'
+                f'<input type="hidden" name="{FORM_DATE_FIELD}" value="{self.form_date}"/>'
+                f'<input name="basicSearchKey"/>'
+                f'</form></body></html>')
+
+    def find_cases(self, search_key):
+        search_key = search_key.lower()
+        for case in self.cases.values():
+            for citation in case.citations:
+                if citation.lower() == search_key:
+                    yield case, citation
+
+    def results_page(self, search_key):
+        results = ''.join(
+            f'<li><a class="document-title" href="#" '
+            f'onclick="javascript:openContentPage(\'{case.doc_id}.xml\');">'
+            f'{case.case_name} - {citation}</a></li>'
+            for case, citation in self.find_cases(search_key))
+        return f'<html><body><ul>{results}</ul></body></html>'
+
+    def case_page(self, doc_id):
+        case = self.cases[doc_id]
+        citations = ''.join(
+            f'<span class="Citation offhyperlink"><a href="#">{citation}</a></span>'
+            for citation in case.citations)
+        pdf_link = ''
+        if case.has_pdf:
+            pdf_url = self.url(
+                '/page-content?p_p_resource_id=viewPDFSourceDocument'
+                f'&pdfFileUri={doc_id}/resource/{doc_id}.pdf')
+            pdf_link = f'<a href="{pdf_url}">Download PDF</a>'
+        paragraphs = max(self.case_page_size // 64, 1)
+        judgment = '<p>Judgment text, padded out to the size of a judgment.</p>' * paragraphs
+        return (f'<html><body><div class="header">{pdf_link}</div>'
+                f'<div class="navi-container"> </div>'
+                f'<div class="judgment"><h1>{case.case_name}</h1>{citations}'
+                f'{judgment}</div></body></html>')
+
+    def pdf_data(self, doc_id):
+        header = f'%PDF-1.4\n% {doc_id}\n'.encode('utf-8')
+        footer = b'\n%%EOF\n'
+        padding = max(self.pdf_size - len(header) - len(footer), 0)
+        return header + b'0' * padding + footer
+
+
+def configure(browser, endpoints):
+    for name, url in endpoints.items():
+        setattr(browser, name, url)
+    return browser
+
+
+def login(browser, citation_list, download_dir, password='password'):
+    browser.update_download_info('student', password, 'smustu',
+                                 citation_list, str(download_dir))
+    return browser.login_lawnet()
@@ -0,0 +1,59 @@
+from fake_lawnet import login
+from asynclawnet import AsyncLawnetBrowser
+from pathlib import Path
+
+
+def test_incorrect_login(browser, tmp_path):
+    assert login(browser, [], tmp_path, password='wrong') == 'FAIL'
+
+
+def test_correct_login(browser, tmp_path):
+    assert login(browser, [], tmp_path) == 'SUCCESS'
+
+
+def test_download_cases_streams_results(browser, tmp_path):
+    citation_list = ['[2016] 3 SLR 621', '[1992] 2 WLR 367',
+                     '[2015] 2 SLR 1179', '[2015] SGCA 12', '[2020] SGHC 999']
+    assert login(browser, citation_list, tmp_path) == 'SUCCESS'
+
+    results = dict(browser.download_cases(citation_list))
+
+    assert results == {
+        '[2016] 3 SLR 621': 'PDF downloaded.',
+        '[1992] 2 WLR 367': 'PDF downloaded.',
+        '[2015] 2 SLR 1179': 'PDF downloaded.',
+        '[2015] SGCA 12': 'Duplicate of [2015] 2 SLR 1179',
+        '[2020] SGHC 999': 'Unable to find [2020] SGHC 999.',
+    }
+    pdf_path = Path(tmp_path) / 'Living the Link Pte Ltd v Tan Lay Tin Tina - [2016] 3 SLR 621.pdf'
+    assert pdf_path.read_bytes().startswith(b'%PDF')
+
+
+def test_form_token_fetched_once_and_refreshed_when_rejected(browser, lawnet, tmp_path):
+    citation_list = ['[2016] 3 SLR 621', '[1992] 2 WLR 367']
+    assert login(browser, citation_list, tmp_path) == 'SUCCESS'
+    searches_before = lawnet.count('/basic-search')
+
+    results = dict(browser.download_cases(citation_list))
+    assert set(results.values()) == {'PDF downloaded.'}
+
+    lawnet.rotate_form_date()
+    results = dict(browser.download_cases(['[2016] 3 SLR 621']))
+    assert results == {'[2016] 3 SLR 621': 'PDF downloaded.'}
+    # one fetch for the first token, the redirect of the rejected search
+    # and one refresh after it
+    assert lawnet.count('/basic-search') - searches_before == 3
+
+
+def test_close_releases_the_event_loop(lawnet, tmp_path):
+    browser = lawnet.configure(AsyncLawnetBrowser())
+    assert login(browser, [], tmp_path) == 'SUCCESS'
+    loop = browser.loop
+
+    browser.close()
+
+    assert browser.client is None
+    assert loop.is_closed()
+    # the browser can still log in again on a fresh loop
+    assert login(browser, [], tmp_path) == 'SUCCESS'
+    browser.close()
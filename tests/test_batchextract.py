@@ -0,0 +1,51 @@
+import collections
+import shutil
+import batchextract
+import parsedocs
+
+TEST_CASE = 'tests/test-cases/test-case-2.docx'
+
+
+def reading_lists(tmp_path):
+    (tmp_path / 'module-b').mkdir()
+    shutil.copy('tests/test-cases/test-case-1.docx', tmp_path / 'module-a.docx')
+    shutil.copy(TEST_CASE, tmp_path / 'module-b' / 'week-1.docx')
+    shutil.copy(TEST_CASE, tmp_path / 'module-b' / 'week-2.docx')
+    (tmp_path / 'module-b' / 'notes.txt').write_text('[2016] 3 SLR 621')
+    return str(tmp_path)
+
+
+def test_citations_merged_with_the_lists_they_came_from(tmp_path):
+    directory = reading_lists(tmp_path)
+    result = batchextract.extract_batch([directory], processes=1)
+
+    week_1 = str(tmp_path / 'module-b' / 'week-1.docx')
+    week_2 = str(tmp_path / 'module-b' / 'week-2.docx')
+    counts = collections.Counter(match.citation for match in parsedocs.scan_file(TEST_CASE))
+    citation, count = counts.most_common(1)[0]
+    assert result.citations[citation] == {week_1: count, week_2: count}
+    assert set(result.citations) == (set(parsedocs.start_extract(TEST_CASE))
+                                     | set(parsedocs.start_extract(str(tmp_path / 'module-a.docx'))))
+    assert result.errors == {}
+
+    glob_result = batchextract.extract_batch([directory + '/**/week-*.docx'], processes=1)
+    assert set(glob_result.citations) == set(parsedocs.start_extract(TEST_CASE))
+
+
+def test_pool_matches_single_process_and_reports_unreadable_lists(tmp_path):
+    directory = reading_lists(tmp_path)
+    (tmp_path / 'broken.pdf').write_bytes(b'not a pdf')
+    cache_path = str(tmp_path / 'extractions.sqlite3')
+
+    result = batchextract.extract_batch([directory], processes=2, cache_path=cache_path)
+
+    assert result == batchextract.extract_batch([directory], processes=1, cache_path=cache_path)
+    assert list(result.errors) == [str(tmp_path / 'broken.pdf')]
+
+
+def test_main_writes_one_citation_per_line(tmp_path, capsys):
+    directory = reading_lists(tmp_path)
+    assert batchextract.main([directory, '--plain', '-p', '1']) == 0
+
+    citations = capsys.readouterr().out.splitlines()
+    assert citations == list(batchextract.extract_batch([directory], processes=1).citations)
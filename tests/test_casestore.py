@@ -0,0 +1,80 @@
+import os
+from casestore import CaseStore, file_sha256
+from fake_lawnet import login
+from sha_helpers import generate_sha_hash_helper
+import pytest
+
+
+@pytest.fixture
+def store(open_store):
+    return open_store(CaseStore, 'store', max_bytes=100)
+
+
+def write_case(directory, name, data):
+    directory.mkdir(exist_ok=True)
+    case_path = directory / name
+    case_path.write_bytes(data)
+    return str(case_path)
+
+
+def test_file_sha256_matches_sha_helper(tmp_path):
+    case_path = write_case(tmp_path, 'case.pdf', b'%PDF-1.4 case')
+    assert file_sha256(case_path) == generate_sha_hash_helper(case_path)
+
+
+def test_stored_case_linked_into_other_directory(store, tmp_path):
+    case_path = write_case(tmp_path / 'module-a', 'Case.pdf', b'%PDF-1.4 case')
+    store.add('[2016] 3 SLR 621', case_path)
+
+    linked_path = store.link_into('[2016] 3 SLR 621', str(tmp_path / 'module-a'))
+    assert linked_path == case_path
+
+    (tmp_path / 'module-b').mkdir()
+    linked_path = store.link_into('[2016] 3 SLR 621', str(tmp_path / 'module-b'))
+    assert os.path.basename(linked_path) == 'Case.pdf'
+    assert os.path.samefile(linked_path, case_path)
+
+
+def test_unknown_citation_not_linked(store, tmp_path):
+    assert store.link_into('[2016] 3 SLR 621', str(tmp_path)) is None
+
+
+def test_modified_object_dropped(store, tmp_path):
+    case_path = write_case(tmp_path / 'module-a', 'Case.pdf', b'%PDF-1.4 case')
+    store.add('[2016] 3 SLR 621', case_path)
+    with open(case_path, 'ab') as case_file:
+        case_file.write(b'annotations')
+
+    assert store.lookup('[2016] 3 SLR 621') is None
+    assert store.total_size() == 0
+
+
+def test_least_recently_used_objects_evicted(store, tmp_path):
+    first = write_case(tmp_path / 'a', 'First.pdf', b'1' * 40)
+    second = write_case(tmp_path / 'a', 'Second.pdf', b'2' * 40)
+    third = write_case(tmp_path / 'a', 'Third.pdf', b'3' * 40)
+    store.add('first', first)
+    store.add('second', second)
+    store.lookup('first')
+    store.add('third', third)
+
+    assert store.lookup('second') is None
+    assert store.lookup('first') is not None
+    assert store.lookup('third') is not None
+    assert os.path.exists(second)
+
+
+def test_repeat_citation_skips_lawnet(browser, lawnet, tmp_path, open_store):
+    browser.case_store = open_store(CaseStore, 'store')
+    citation_list = ['[2016] 3 SLR 621', '[2015] SGCA 12']
+    assert login(browser, citation_list, tmp_path / 'module-a') == 'SUCCESS'
+    first_run = dict(browser.download_cases(citation_list))
+    requests_before = len(lawnet.requests)
+
+    browser.update_download_info('student', 'password', 'smustu',
+                                 citation_list, str(tmp_path / 'module-b'))
+    second_run = dict(browser.download_cases(citation_list))
+
+    assert set(first_run.values()) == {'PDF downloaded.'}
+    assert set(second_run.values()) == {'PDF copied from case store.'}
+    assert len(lawnet.requests) == requests_before
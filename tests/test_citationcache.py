@@ -0,0 +1,64 @@
+from citationcache import CitationCache, Resolution, NOT_FOUND
+from fake_lawnet import login
+import pytest
+
+RESOLUTION = Resolution('SLR-2016-3-621.xml', 'Living the Link', '[2016] 3 SLR 621',
+                        'http://lawnet/pdf', True)
+
+
+@pytest.fixture
+def cache(open_store):
+    return open_store(CitationCache, 'citations.sqlite3')
+
+
+def test_resolution_round_trip(cache):
+    cache.put('[2016]  3 SLR 621', RESOLUTION)
+    assert cache.get('[2016] 3 SLR 621') == RESOLUTION
+    assert cache.get('[2016] 3 SLR 622') is None
+
+
+def test_expired_resolutions_ignored(cache):
+    cache.ttl = -1
+    cache.put('[2016] 3 SLR 621', RESOLUTION)
+    cache.put('[2020] SGHC 999', NOT_FOUND)
+    assert cache.get('[2016] 3 SLR 621') is None
+    assert cache.get('[2020] SGHC 999') == NOT_FOUND
+
+    cache.negative_ttl = -1
+    assert cache.get('[2020] SGHC 999') is None
+
+
+def test_invalidate(cache):
+    cache.put('[2016] 3 SLR 621', RESOLUTION)
+    cache.invalidate('[2016] 3 SLR 621')
+    assert cache.get('[2016] 3 SLR 621') is None
+
+
+def test_warm_run_skips_search(browser, lawnet, tmp_path, cache):
+    browser.citation_cache = cache
+    citation_list = ['[2016] 3 SLR 621', '[2015] SGCA 12', '[2020] SGHC 999']
+    assert login(browser, citation_list, tmp_path) == 'SUCCESS'
+    cold_run = dict(browser.download_cases(citation_list))
+    searches = lawnet.count('/result-page')
+    case_pages = lawnet.count('/page-content')
+
+    warm_run = dict(browser.download_cases(citation_list))
+
+    assert warm_run == cold_run
+    assert lawnet.count('/result-page') == searches
+    # only the two PDFs are fetched again
+    assert lawnet.count('/page-content') == case_pages + 2
+
+
+def test_rejected_search_not_cached(browser, lawnet, tmp_path, cache):
+    browser.citation_cache = cache
+    assert login(browser, ['[2016] 3 SLR 621'], tmp_path) == 'SUCCESS'
+    lawnet.fail('/result-page', status=403)
+
+    assert dict(browser.download_cases(['[2016] 3 SLR 621'])) == {
+        '[2016] 3 SLR 621': 'Download failed.'}
+    assert cache.get('[2016] 3 SLR 621') is None
+
+    lawnet.faults.pop('/result-page')
+    assert dict(browser.download_cases(['[2016] 3 SLR 621'])) == {
+        '[2016] 3 SLR 621': 'PDF downloaded.'}
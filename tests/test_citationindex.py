@@ -0,0 +1,48 @@
+from citationindex import CitationIndex
+from fake_lawnet import login
+import pytest
+
+
+@pytest.fixture
+def index(open_store):
+    return open_store(CitationIndex, 'parallels.sqlite3')
+
+
+def test_groups_merge_and_persist(index, open_store):
+    index.add(['[2015] 2 SLR 1179', '[2015] SGCA 12'])
+    index.add(['[2015] 3 MLJ 1', '[2015]  SGCA 12'])
+    index.add(['[2019] SGHC 1'])
+
+    assert index.parallels('[2015] 3 MLJ 1') == [
+        '[2015] 2 SLR 1179', '[2015] SGCA 12', '[2015] 3 MLJ 1']
+    assert index.parallels('[2019] SGHC 1') == ['[2019] SGHC 1']
+    assert index.parallels('[2020] SGHC 999') == []
+
+    reopened = open_store(CitationIndex, 'parallels.sqlite3')
+    assert set(reopened.parallels('[2015] 2 SLR 1179')) == {
+        '[2015] 2 SLR 1179', '[2015] SGCA 12', '[2015] 3 MLJ 1'}
+
+
+def test_parallels_settled_before_any_request(browser, lawnet, tmp_path, index):
+    browser.citation_index = index
+    assert login(browser, ['[2015] SGCA 12'], tmp_path) == 'SUCCESS'
+    assert dict(browser.download_cases(['[2015] SGCA 12'])) == {
+        '[2015] SGCA 12': 'PDF downloaded.'}
+    assert index.parallels('[2015] SGCA 12') == ['[2015] 2 SLR 1179', '[2015] SGCA 12']
+
+    # the neutral citation is now fetched by its report, without going
+    # through the case page
+    case_pages = lawnet.count('/page-content')
+    assert dict(browser.download_cases(['[2015] SGCA 12'])) == {
+        '[2015] SGCA 12': 'PDF downloaded.'}
+
+    # and is settled as a duplicate without a search when both are listed
+    citation_list = ['[2015] SGCA 12', '[2015] 2 SLR 1179']
+    login(browser, citation_list, tmp_path)
+    searches = lawnet.count('/result-page')
+    assert dict(browser.download_cases(citation_list)) == {
+        '[2015] SGCA 12': 'Duplicate of [2015] 2 SLR 1179',
+        '[2015] 2 SLR 1179': 'PDF downloaded.'}
+    assert lawnet.count('/result-page') == searches + 1
+    # only the two PDF downloads went to the case page endpoint
+    assert lawnet.count('/page-content') - case_pages == 2
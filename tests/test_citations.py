@@ -0,0 +1,57 @@
+import os
+import citations
+import parsedocs
+import pytest
+from lawnetsearch import LawnetBrowser
+
+
+def test_parse_citation():
+    citation = citations.parse_citation('[2016]  3 SLR 621')
+    assert (citation.year, citation.volume, citation.reporter, citation.page) == (
+        2016, 3, 'SLR', 621)
+    assert citations.parse_citation('[2015] SGCA 12').volume is None
+    assert citations.parse_citation('[2009] 1 SLR(R) 5').reporter == 'SLR(R)'
+    assert citations.parse_citation('[1990] 1 All ER 5').reporter == 'All ER'
+    assert citations.parse_citation('Tan v Lim') is None
+
+
+@pytest.mark.parametrize('citation, reported, file_name, resource', [
+    ('[2016] 3 SLR 621', True, '[2016] 3 SLR 621', '[2016] 3 SLR 0621'),
+    ('[2009] 1 SLR(R) 5', True, '[2009] 1 SLR(R) 5', '[2009] 1 SLR(R) 0005'),
+    ('[1998] 2 SSLR 45', True, '[1998] 2 SSLR 45', '[1998] 2 SSLR 0045'),
+    ('[1950] FMSLR 12', True, '[1950] FMSLR 12', '[1950] FMSLR 0012'),
+    ('[1990] SSAR 5', True, '[1990] SSAR 5', '(1985-2010) SSAR 0005'),
+    ('[1990] 1 SSAR 5', True, '[1990] 1 SSAR 5', '(1985-2010) 1 SSAR 0005'),
+    ('[2015] SSAR 123', True, '[2015] SSAR 123', '[2015] SSAR 0123'),
+    ('[2010] 1 WLR 5', True, '[2010] 1 WLR 5', '2010-1-WLR-5'),
+    ('[1992] 2 WLR 367', True, '[1992] 2 WLR 367', '[1992] 2 WLR 367'),
+    ('[2021] 1 WLR 9', True, '[2021] 1 WLR 9', '[2021] 1 WLR 9'),
+    ('[2001] 1 AC 1', True, '[2001]-1-AC-1', '[2001]-1-AC-1'),
+    ('[2010] AC 5', True, '[2010] AC 5', '[2010] AC 5'),
+    ('[1990] 1 A.C. 5', True, '[1990] 1 AC 5', '[1990] 1 AC 5'),
+    ('[1992] Ch. 505', True, '[1992] Ch 505', '[1992] Ch 505'),
+    ('[1992] Ch 505', True, '[1992] Ch 505', '[1992] Ch 505'),
+    ('[1990] QB 5', False, '[1990] QB 5', '[1990] QB 5'),
+    ('[1990] 1 QB 5', False, '[1990] 1 QB 5', '[1990] 1 QB 5'),
+    ('[1990] 2 QB 5', False, '[1990] 2 QB 5', '[1990] 2 QB 5'),
+    ('[2015] 3 MLJ 1', False, '[2015] 3 MLJ 1', '[2015] 3 MLJ 1'),
+    ('[2015] SGCA 12', False, '[2015] SGCA 12', '[2015] SGCA 12'),
+    ('[2019] SGHC 1', False, '[2019] SGHC 1', '[2019] SGHC 1'),
+    # substrings of other reporters no longer count
+    ('[2010] EWHC 12 (Ch)', False, '[2010] EWHC 12 (Ch)', '[2010] EWHC 12 (Ch)'),
+])
+def test_reporter_registry(citation, reported, file_name, resource):
+    browser = LawnetBrowser(render_workers=0)
+    assert browser.is_reported_citation(citation) == reported
+    assert browser.generate_pdf_url(citation, 'SLR-2016-3-621') == (
+        f'{browser.LAWNET_PDF_URL}&pdfFileName={file_name}.pdf'
+        f'&pdfFileUri=SLR-2016-3-621/resource/{resource}.pdf')
+
+
+
+@pytest.mark.parametrize('test_case', ['test-case-1.docx', 'test-case-2.docx'])
+def test_extracted_citations_parse(test_case):
+    # the download rules apply to every citation a reading list gives
+    test_case_path = os.path.join('tests/test-cases', test_case)
+    for citation in parsedocs.start_extract(test_case_path):
+        assert citations.parse_citation(citation) is not None, citation
@@ -0,0 +1,71 @@
+import threading
+import time
+import pytest
+from concurrencylimit import AIMDLimit, AdaptiveLimiter
+
+
+def test_limit_grows_while_latency_is_flat():
+    limit = AIMDLimit(initial=1, max_limit=4)
+    for _ in range(20):
+        limit.update(0.1, True)
+    assert limit.limit == 4
+
+
+def test_limit_backs_off_on_errors_once_per_window():
+    limit = AIMDLimit(initial=8, max_limit=8)
+    limit.update(0.1, False)
+    limit.update(0.1, False)
+    assert limit.limit == 4
+    assert limit.stats()['failures'] == 2
+
+
+def test_limit_backs_off_on_slow_responses():
+    limit = AIMDLimit(initial=8, max_limit=8)
+    limit.update(0.1, True)
+    for _ in range(5):
+        limit.update(5.0, True)
+    assert limit.limit < 8
+
+
+def test_disabled_limit_stays_fixed():
+    limit = AIMDLimit(initial=1, max_limit=10, enabled=False)
+    for _ in range(20):
+        limit.update(0.1, True)
+    limit.update(0.1, False)
+    assert limit.limit == 1
+
+
+def test_overload_status_counts_as_failure():
+    limiter = AdaptiveLimiter(initial=4, max_limit=4)
+    with limiter.slot() as slot:
+        slot.record(503)
+    assert limiter.stats()['limit'] == 2
+
+
+def test_exception_counts_as_failure():
+    limiter = AdaptiveLimiter(initial=4, max_limit=4)
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError()
+    assert limiter.stats()['failures'] == 1
+
+
+def test_slot_bounds_requests_in_flight():
+    limiter = AdaptiveLimiter(initial=2, max_limit=2)
+    peak = []
+    lock = threading.Lock()
+
+    def request():
+        with limiter.slot():
+            with lock:
+                peak.append(limiter.in_flight)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=request) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+    assert limiter.stats()['in_flight'] == 0
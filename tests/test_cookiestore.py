@@ -0,0 +1,79 @@
+from asynclawnet import AsyncLawnetBrowser
+from cookiestore import CookieStore
+from fake_lawnet import login
+import pytest
+
+COOKIES = [{'name': 'session', 'value': 'abc', 'domain': 'lawnet', 'path': '/',
+            'secure': False, 'expires': None}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CookieStore(str(tmp_path / 'cookies.bin'))
+
+
+def test_cookie_round_trip(store):
+    store.save(COOKIES, 'student', 'password')
+    assert store.load('student', 'password') == COOKIES
+    assert store.load('student', 'wrong') is None
+    assert store.load('teacher', 'password') is None
+
+
+def test_expired_cookies_ignored(store):
+    store.save([dict(COOKIES[0], expires=1)], 'student', 'password')
+    assert store.load('student', 'password') is None
+
+    store.max_age = -1
+    store.save(COOKIES, 'student', 'password')
+    assert store.load('student', 'password') is None
+
+
+def fresh_browser(browser, lawnet, store):
+    # a second browser of the same engine, as if started in a new run
+    new_browser = lawnet.configure(type(browser)())
+    new_browser.cookie_store = store
+    return new_browser
+
+
+def close(browser):
+    if isinstance(browser, AsyncLawnetBrowser):
+        browser.close()
+
+
+def test_warm_login_skips_handshake(browser, lawnet, tmp_path, store):
+    browser.cookie_store = store
+    assert login(browser, [], tmp_path) == 'SUCCESS'
+    logins = lawnet.count('/login')
+    assert lawnet.count('/adfs/ls') == 2
+
+    warm_browser = fresh_browser(browser, lawnet, store)
+    try:
+        assert login(warm_browser, ['[2016] 3 SLR 621'], tmp_path) == 'SUCCESS'
+        assert lawnet.count('/login') == logins + 1
+        assert lawnet.count('/adfs/ls') == 2
+        assert dict(warm_browser.download_cases(['[2016] 3 SLR 621'])) == {
+            '[2016] 3 SLR 621': 'PDF downloaded.'}
+    finally:
+        close(warm_browser)
+
+
+def test_rejected_cookies_fall_back_to_login(browser, lawnet, tmp_path, store):
+    browser.cookie_store = store
+    assert login(browser, [], tmp_path) == 'SUCCESS'
+    lawnet.expire_sessions()
+
+    warm_browser = fresh_browser(browser, lawnet, store)
+    try:
+        assert login(warm_browser, [], tmp_path) == 'SUCCESS'
+        assert lawnet.count('/adfs/ls') == 4
+        assert store.load('student', 'password') is not None
+    finally:
+        close(warm_browser)
+
+    store.clear()
+    warm_browser = fresh_browser(browser, lawnet, store)
+    try:
+        assert login(warm_browser, [], tmp_path, password='wrong') == 'FAIL'
+        assert store.load('student', 'wrong') is None
+    finally:
+        close(warm_browser)
@@ -0,0 +1,80 @@
+import os
+import zipfile
+import docxreader
+import parsedocs
+import pytest
+
+NAMESPACES = ('xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+              'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"')
+
+DOCUMENT = f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document {NAMESPACES}><w:body>
+<w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>
+<w:r><w:t>*Tan v Lim </w:t></w:r><w:r><w:t>[2016] 3 SLR 621</w:t><w:tab/><w:t>(CA)</w:t></w:r></w:p>
+<w:tbl><w:tr>
+<w:tc><w:tcPr><w:vMerge w:val="restart"/></w:tcPr><w:p><w:r><w:t>Ong v Lee</w:t></w:r></w:p>
+<w:p><w:r><w:t>[2019] SGCA 12</w:t></w:r></w:p></w:tc>
+<w:tc><w:p><w:r><w:t>Lee v Tan [2020] SGHC 5</w:t></w:r></w:p></w:tc>
+</w:tr><w:tr>
+<w:tc><w:tcPr><w:vMerge/></w:tcPr><w:p/></w:tc>
+<w:tc><w:p><w:r><w:delText>[1990] 2 QB 5</w:delText></w:r></w:p></w:tc>
+</w:tr></w:tbl>
+<w:p><w:r><mc:AlternateContent><mc:Choice Requires="wps"><w:drawing><w:txbxContent>
+<w:p><w:r><w:t>See [2001] 1 AC 1</w:t></w:r></w:p>
+</w:txbxContent></w:drawing></mc:Choice><mc:Fallback><w:pict><w:txbxContent>
+<w:p><w:r><w:t>See [2001] 1 AC 1</w:t></w:r></w:p>
+</w:txbxContent></w:pict></mc:Fallback></mc:AlternateContent><w:t>After the box</w:t></w:r></w:p>
+</w:body></w:document>'''
+
+FOOTNOTES = f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:footnotes {NAMESPACES}>
+<w:footnote w:type="separator" w:id="-1"><w:p><w:r><w:separator/></w:r></w:p></w:footnote>
+<w:footnote w:id="1"><w:p><w:r><w:t>Affirmed in [2012] 1 WLR 10</w:t></w:r></w:p></w:footnote>
+</w:footnotes>'''
+
+
+def write_docx(path, parts):
+    with zipfile.ZipFile(path, 'w') as docx:
+        for name, xml in parts.items():
+            docx.writestr(name, xml)
+
+
+def test_iter_blocks_reads_tables_text_boxes_and_footnotes(tmp_path):
+    docx_path = str(tmp_path / 'reading-list.docx')
+    write_docx(docx_path, {'word/document.xml': DOCUMENT, 'word/footnotes.xml': FOOTNOTES})
+
+    assert list(docxreader.iter_blocks(docx_path)) == [
+        ('paragraph 1', '*Tan v Lim [2016] 3 SLR 621\t(CA)'),
+        ('table 1 row 1 cell 1', 'Ong v Lee\n[2019] SGCA 12'),
+        ('table 1 row 1 cell 2', 'Lee v Tan [2020] SGHC 5'),
+        # a merged cell is read once, and deleted text is left out
+        ('table 1 row 2 cell 1', ''),
+        ('table 1 row 2 cell 2', ''),
+        ('text box 1', 'See [2001] 1 AC 1'),
+        ('paragraph 2', 'After the box'),
+        ('footnote -1', ''),
+        ('footnote 1', 'Affirmed in [2012] 1 WLR 10'),
+    ]
+
+    assert set(parsedocs.start_extract(docx_path)) == {
+        '[2016] 3 SLR 621', '[2019] SGCA 12', '[2020] SGHC 5', '[2001] 1 AC 1',
+        '[2012] 1 WLR 10'}
+    assert parsedocs.start_extract(docx_path, stared=True) == ['[2016] 3 SLR 621']
+
+
+def test_unreadable_document_falls_back_to_python_docx(tmp_path, monkeypatch):
+    docx_path = str(tmp_path / 'reading-list.docx')
+    write_docx(docx_path, {'word/document.xml': '<w:document'})
+    monkeypatch.setattr(parsedocs, 'python_docx_blocks', lambda filepath: [('paragraph 1', 'x')])
+
+    assert parsedocs.docx_blocks(docx_path) == [('paragraph 1', 'x')]
+
+
+@pytest.mark.parametrize('test_case', ['test-case-1.docx', 'test-case-2.docx'])
+@pytest.mark.parametrize('stared', [False, True])
+def test_streamed_citations_match_python_docx(test_case, stared, monkeypatch):
+    test_case_path = os.path.join(os.getcwd(), 'tests/test-cases', test_case)
+    streamed = set(parsedocs.start_extract(test_case_path, stared))
+    monkeypatch.setattr(parsedocs, 'STREAM_DOCX', False)
+
+    assert streamed == set(parsedocs.start_extract(test_case_path, stared))
@@ -0,0 +1,53 @@
+import os
+import parsedocs
+from extractcache import ExtractionCache
+import pytest
+
+TEST_CASE = 'tests/test-cases/test-case-1.docx'
+
+
+@pytest.fixture
+def cache(open_store):
+    return open_store(ExtractionCache, 'extractions.sqlite3')
+
+
+def test_both_modes_come_from_one_scan(cache, monkeypatch):
+    citations = set(parsedocs.start_extract(TEST_CASE, cache=cache))
+    stared = set(parsedocs.start_extract(TEST_CASE, stared=True, cache=cache))
+    assert stared == set(parsedocs.start_extract(TEST_CASE, stared=True))
+
+    def scan_file(filepath, metrics):
+        raise AssertionError('reading list scanned again')
+
+    monkeypatch.setattr(parsedocs, 'scan_file', scan_file)
+    assert set(parsedocs.start_extract(TEST_CASE, cache=cache)) == citations
+    assert set(parsedocs.start_extract(TEST_CASE, stared=True, cache=cache)) == stared
+    assert set(parsedocs.iter_citations(TEST_CASE, stared=True, cache=cache)) == stared
+
+
+def test_changed_file_is_hashed_again(cache, tmp_path):
+    reading_list = tmp_path / 'list.txt'
+    reading_list.write_text('[2016] 3 SLR 621')
+    key = cache.key(str(reading_list))
+    cache.put(key, '1', [['[2016] 3 SLR 621', False, 'paragraph 1']])
+    assert cache.get(key, '1') == [['[2016] 3 SLR 621', False, 'paragraph 1']]
+    assert cache.get(key, '2') is None
+
+    reading_list.write_text('[2019] SGCA 12')
+    stat = os.stat(reading_list)
+    os.utime(reading_list, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.key(str(reading_list)) != key
+
+
+def test_least_recently_used_extractions_evicted(open_store):
+    cache = open_store(ExtractionCache, 'extractions.sqlite3', max_bytes=100)
+    matches = [['[2016] 3 SLR 621', False, 'paragraph 1']]
+    cache.put('a', '1', matches)
+    cache.put('b', '1', matches)
+    cache.get('a', '1')
+    cache.put('c', '1', matches)
+
+    assert cache.get('a', '1') == matches
+    assert cache.get('b', '1') is None
+    assert cache.get('c', '1') == matches
+    assert cache.total_size() <= 100
@@ -0,0 +1,49 @@
+import os
+import extractors
+import pytest
+
+PAGES_DIR = 'tests/pages'
+
+
+def load_page(name):
+    with open(os.path.join(os.getcwd(), PAGES_DIR, name), encoding='utf-8') as page:
+        return page.read()
+
+
+def test_extract_case_page():
+    citations, pdf_link = extractors.extract_case_page(load_page('case-page.html'))
+
+    assert citations[:2] == ['[2016] 3 SLR 621', '[2016] SGHC 34']
+    assert len(citations) == 122
+    # the first link mentioning PDF points at '#' and is skipped
+    assert pdf_link.endswith('pdfFileUri=[2016] 3 SLR 0621/resource/[2016] 3 SLR 0621.pdf')
+
+
+def test_extract_case_page_without_pdf_link():
+    page = '<div><span class="Citation offhyperlink">[2019] SGHC 1</span></div>'
+    assert extractors.extract_case_page(page) == (['[2019] SGHC 1'], None)
+
+
+def test_extract_search_results():
+    results = extractors.extract_search_results(load_page('search-results.html'))
+
+    assert [onclick for onclick, _ in results] == [
+        "javascript:viewContent('[2016] 3 SLR 0621.xml');",
+        "javascript:viewContent('[2016] SGHC 34.xml');",
+        "javascript:viewContent('[2017] 2 SLR 0112.xml');",
+    ]
+    assert results[0][1] == ('Living the Link Pte Ltd (in creditors voluntary liquidation) '
+                             'and others v Tan Lay Tin Tina and others - [2016] 3 SLR 621')
+
+
+@pytest.mark.parametrize('page, names, expected', [
+    ('saml-request.html', ['SAMLRequest', 'RelayState'], True),
+    ('saml-request.html', ['SAMLResponse', 'RelayState'], False),
+    ('search-results.html',
+     ['_searchbasicformportlet_WAR_lawnet3legalresearchportlet_formDate'], True),
+])
+def test_extract_inputs(page, names, expected):
+    values = extractors.extract_inputs(load_page(page), names)
+    assert (values is not None) == expected
+    if expected:
+        assert set(values) == set(names)
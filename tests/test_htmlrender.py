@@ -0,0 +1,75 @@
+import os
+import time
+from htmlrender import HtmlRenderer
+from fake_lawnet import login
+import pytest
+
+CASE_PAGE = ('<html><body><div class="header"></div><div class="navi-container"> </div>'
+             '<div class="judgment"><h1>Tan Ah Kow v Lee Ah Seng</h1>'
+             '<p>Judgment text.</p></div></body></html>')
+
+
+def slow_convert(html_path, pdf_path):
+    time.sleep(10)
+
+
+def pid_convert(html_path, pdf_path):
+    if 'slow' in pdf_path:
+        time.sleep(10)
+    with open(pdf_path, 'w') as pdf_file:
+        pdf_file.write(str(os.getpid()))
+
+
+@pytest.fixture
+def html_path(tmp_path):
+    html_path = tmp_path / 'case.html'
+    html_path.write_text(CASE_PAGE, encoding='utf-8')
+    return str(html_path)
+
+
+def test_render_html_to_pdf(html_path, tmp_path):
+    renderer = HtmlRenderer(workers=1)
+    pdf_path = str(tmp_path / 'case.pdf')
+    renderer.submit('case', html_path, pdf_path)
+
+    assert list(renderer.results()) == [('case', True)]
+    with open(pdf_path, 'rb') as pdf_file:
+        assert pdf_file.read(4) == b'%PDF'
+    renderer.shutdown()
+
+
+def test_render_killed_after_timeout(html_path, tmp_path):
+    renderer = HtmlRenderer(workers=1, timeout=0.5, convert=slow_convert)
+    start = time.monotonic()
+    renderer.submit('case', html_path, str(tmp_path / 'case.pdf'))
+
+    assert list(renderer.results()) == [('case', False)]
+    assert time.monotonic() - start < 5
+    renderer.shutdown()
+
+
+def test_render_process_kept_until_timeout(html_path, tmp_path):
+    renderer = HtmlRenderer(workers=1, timeout=2, convert=pid_convert)
+    for name in ['first.pdf', 'second.pdf', 'slow.pdf', 'third.pdf']:
+        renderer.submit(name, html_path, str(tmp_path / name))
+
+    assert dict(renderer.results()) == {
+        'first.pdf': True, 'second.pdf': True, 'slow.pdf': False, 'third.pdf': True}
+    pids = {name: (tmp_path / name).read_text() for name in
+            ['first.pdf', 'second.pdf', 'third.pdf']}
+    assert pids['first.pdf'] == pids['second.pdf']
+    # the process that timed out was replaced
+    assert pids['third.pdf'] != pids['first.pdf']
+    renderer.shutdown()
+
+
+def test_case_page_rendered_after_download(browser, tmp_path):
+    assert login(browser, ['[2019] SGHC 1'], tmp_path) == 'SUCCESS'
+
+    results = dict(browser.download_cases(['[2019] SGHC 1']))
+    assert results == {'[2019] SGHC 1': 'HTML saved, PDF pending.'}
+
+    conversions = dict(browser.pending_conversions())
+    assert conversions == {'[2019] SGHC 1': 'PDF downloaded.'}
+    assert [path.name for path in tmp_path.iterdir()] == [
+        'Tan Ah Kow v Lee Ah Seng - [2019] SGHC 1.pdf']
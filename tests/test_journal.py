@@ -0,0 +1,107 @@
+import os
+import threading
+from fake_lawnet import login
+from journal import Journal, journal_path, DONE, FAILED, PENDING
+
+CITATIONS = ['[2016] 3 SLR 621', '[2019] SGHC 1', '[2020] SGHC 999']
+
+
+def test_journal_survives_a_torn_line(tmp_path):
+    journal = Journal(journal_path(str(tmp_path)))
+    assert journal.start_batch(['[2016] 3 SLR 621', '[2020] SGHC 999']) == [
+        '[2016] 3 SLR 621', '[2020] SGHC 999']
+    case_path = tmp_path / 'case.pdf'
+    case_path.write_bytes(b'%PDF')
+    journal.record('[2016] 3 SLR 621', DONE, doc_id='SLR-2016-3-621', file=str(case_path))
+    with open(journal.path, 'a') as journal_file:
+        journal_file.write('{"citation": "[2020] SGHC 999", "sta')
+
+    reopened = Journal(journal.path)
+    assert reopened.cases['[2016] 3 SLR 621']['doc_id'] == 'SLR-2016-3-621'
+    assert reopened.is_done('[2016] 3 SLR 621')
+    assert reopened.unfinished() == ['[2020] SGHC 999']
+
+    # a case whose file was deleted is downloaded again
+    os.remove(case_path)
+    assert reopened.start_batch(CITATIONS, skip_done=True) == CITATIONS
+    assert reopened.batch == 2
+
+
+def test_download_is_journaled_and_resumed(browser, tmp_path):
+    browser.journal = Journal(journal_path(str(tmp_path)))
+    assert login(browser, CITATIONS, tmp_path) == 'SUCCESS'
+
+    citation_list = browser.journal.start_batch(CITATIONS)
+    results = dict(browser.download_cases(citation_list))
+    results.update(browser.pending_conversions())
+
+    cases = Journal(browser.journal.path).cases
+    assert cases['[2016] 3 SLR 621']['state'] == DONE
+    assert cases['[2016] 3 SLR 621']['doc_id'] == 'SLR-2016-3-621.xml'
+    assert os.path.exists(cases['[2016] 3 SLR 621']['file'])
+    assert cases['[2019] SGHC 1']['state'] == DONE
+    assert cases['[2020] SGHC 999']['state'] == FAILED
+    assert cases['[2020] SGHC 999']['error'] == results['[2020] SGHC 999']
+
+    assert browser.journal.start_batch(CITATIONS, skip_done=True) == ['[2020] SGHC 999']
+
+
+def test_cancelled_cases_stay_pending(browser, tmp_path):
+    browser.journal = Journal(journal_path(str(tmp_path)))
+    assert login(browser, CITATIONS, tmp_path) == 'SUCCESS'
+    citation_list = browser.journal.start_batch(CITATIONS)
+    browser.journal.cancel()
+
+    results = dict(browser.download_cases(citation_list))
+
+    assert set(results.values()) == {browser.CANCELLED}
+    assert {case['state'] for case in browser.journal.cases.values()} == {PENDING}
+    assert browser.journal.unfinished() == CITATIONS
+
+
+def test_paused_batch_waits_for_resume(browser, tmp_path):
+    assert login(browser, CITATIONS, tmp_path) == 'SUCCESS'
+    browser.journal.pause()
+    resumed = threading.Event()
+
+    def resume():
+        resumed.set()
+        browser.journal.resume()
+
+    threading.Timer(0.3, resume).start()
+    results = dict(browser.download_cases(['[2016] 3 SLR 621']))
+
+    assert resumed.is_set()
+    assert results == {'[2016] 3 SLR 621': 'PDF downloaded.'}
+
+
+def test_batch_cancelled_while_paused(browser, tmp_path):
+    browser.journal = Journal(journal_path(str(tmp_path)))
+    assert login(browser, CITATIONS, tmp_path) == 'SUCCESS'
+    citation_list = browser.journal.start_batch(CITATIONS)
+    browser.journal.pause()
+
+    threading.Timer(0.3, browser.journal.cancel).start()
+    results = dict(browser.download_cases(citation_list))
+
+    assert results == {citation: browser.CANCELLED for citation in CITATIONS}
+    assert browser.journal.unfinished() == CITATIONS
+
+
+def test_unexpected_error_fails_only_its_case(browser, tmp_path):
+    browser.journal = Journal(journal_path(str(tmp_path)))
+    assert login(browser, CITATIONS, tmp_path) == 'SUCCESS'
+    store_case = browser.store_case
+
+    def full_disk(case_citation, *args):
+        if case_citation == '[2019] SGHC 1':
+            raise OSError('disk full')
+        return store_case(case_citation, *args)
+
+    browser.store_case = full_disk
+    results = dict(browser.download_cases(browser.journal.start_batch(CITATIONS)))
+
+    assert set(results) == set(CITATIONS)
+    assert results['[2019] SGHC 1'] == 'Download failed.'
+    assert results['[2016] 3 SLR 621'] == 'PDF downloaded.'
+    assert browser.journal.cases['[2019] SGHC 1']['error'] == repr(OSError('disk full'))
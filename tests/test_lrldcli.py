@@ -0,0 +1,97 @@
+import io
+import json
+import time
+import lrldcli
+import pytest
+from fake_lawnet import login
+
+
+def test_read_citations(tmp_path):
+    citation_file = tmp_path / 'citations.txt'
+    citation_file.write_text('[2016] 3 SLR 621\n\n[2015]  SGCA 12\n[2016] 3 SLR 621\n')
+    citation_list = lrldcli.read_citations(
+        [str(citation_file), 'tests/test-cases/test-case-2.docx'], ['[2019] SGHC 1'])
+
+    assert citation_list[:2] == ['[2016] 3 SLR 621', '[2015] SGCA 12']
+    assert citation_list[-1] == '[2019] SGHC 1'
+    assert len(citation_list) == len(set(citation_list)) > 3
+
+
+def test_iter_citations(tmp_path):
+    citation_file = tmp_path / 'citations.txt'
+    citation_file.write_text('[2016] 3 SLR 621\n\n[2015]  SGCA 12\n[2016] 3 SLR 621\n')
+    paths = [str(citation_file), 'tests/test-cases/test-case-2.docx']
+    citation_list = list(lrldcli.iter_citations(paths, ['[2019] SGHC 1']))
+
+    assert citation_list[:2] == ['[2016] 3 SLR 621', '[2015] SGCA 12']
+    assert set(citation_list) == set(lrldcli.read_citations(paths, ['[2019] SGHC 1']))
+    assert len(citation_list) == len(set(citation_list))
+
+
+def test_credentials_from_environment(monkeypatch):
+    monkeypatch.setattr(lrldcli, 'keyring', None)
+    args = lrldcli.parse_args(['list.docx'])
+    environ = {'LRLD_USERNAME': 'student', 'LRLD_PASSWORD': 'password'}
+    assert lrldcli.get_credentials(args, environ) == [('student', 'password')]
+
+    args = lrldcli.parse_args(['-u', 'staff', '-u', 'student2', 'list.docx'])
+    environ['LRLD_PASSWORD_STUDENT2'] = 'password2'
+    assert lrldcli.get_credentials(args, environ) == [
+        ('staff', 'password'), ('student2', 'password2')]
+    assert lrldcli.get_credentials(args, {})[0] == ('staff', None)
+
+
+def test_run_streams_json_lines(browser, lawnet, tmp_path):
+    citation_list = ['[2016] 3 SLR 621', '[2015] SGCA 12', '[2020] SGHC 999']
+    login(browser, citation_list, tmp_path)
+    output = io.StringIO()
+
+    assert lrldcli.run(browser, citation_list, output) == lrldcli.EXIT_FAILURES
+
+    events = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert events[0]['event'] == 'login' and events[0]['status'] == 'SUCCESS'
+    cases = {event['citation']: event for event in events if event['event'] == 'case'}
+    assert cases['[2016] 3 SLR 621']['ok']
+    assert not cases['[2020] SGHC 999']['ok']
+    assert events[-1]['event'] == 'summary'
+    assert events[-1]['cases'] == 3 and events[-1]['succeeded'] == 2
+
+
+def test_failed_login_exit_status(browser, lawnet, tmp_path):
+    login(browser, ['[2016] 3 SLR 621'], tmp_path, password='wrong')
+    output = io.StringIO()
+    assert lrldcli.run(browser, ['[2016] 3 SLR 621'], output) == lrldcli.EXIT_LOGIN_FAILED
+    assert json.loads(output.getvalue())['status'] == 'FAIL'
+
+
+def test_run_downloads_while_citations_are_read(browser, lawnet, tmp_path):
+    def slow_citations():
+        for citation in ['[2016] 3 SLR 621', '[2015] SGCA 12']:
+            time.sleep(0.2)
+            yield citation
+
+    citation_list = []
+    login(browser, citation_list, tmp_path)
+    output = io.StringIO()
+    citations = lrldcli.prefetch(slow_citations(), citation_list)
+
+    assert lrldcli.run(browser, citations, output) == lrldcli.EXIT_OK
+    events = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert {event.get('citation') for event in events if event['event'] == 'case'} == {
+        '[2016] 3 SLR 621', '[2015] SGCA 12'}
+    assert citation_list == ['[2016] 3 SLR 621', '[2015] SGCA 12']
+
+
+def test_prefetch_raises_reading_errors():
+    def broken_citations():
+        yield '[2016] 3 SLR 621'
+        raise ValueError('unreadable reading list')
+
+    citations = lrldcli.prefetch(broken_citations(), [])
+    assert next(citations) == '[2016] 3 SLR 621'
+    with pytest.raises(ValueError):
+        next(citations)
+
+
+def test_resume_with_nothing_left(tmp_path):
+    assert lrldcli.main(['--resume', '-d', str(tmp_path)]) == lrldcli.EXIT_OK
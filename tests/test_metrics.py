@@ -0,0 +1,84 @@
+import csv
+import json
+import threading
+import parsedocs
+from fake_lawnet import login
+from lawnetsearch import LawnetBrowser
+from metrics import Metrics, Histogram, DISABLED, NO_SPAN
+
+
+def test_histogram_quantiles():
+    histogram = Histogram()
+    for value in range(1, 101):
+        histogram.observe(value / 1000)
+    summary = histogram.summary()
+    assert summary['count'] == 100 and summary['max'] == 0.1
+    assert 0.025 <= summary['p50'] <= 0.05
+    assert 0.05 <= summary['p95'] <= 0.1
+
+
+def test_disabled_metrics_record_nothing():
+    lock = threading.Lock()
+    assert DISABLED.span('search') is NO_SPAN
+    assert DISABLED.case('[2016] 3 SLR 621') is NO_SPAN
+    assert DISABLED.waiting(lock, 'search_lock_wait') is lock
+    with DISABLED.span('search'):
+        DISABLED.record('search', 1)
+    assert DISABLED.report() == {'stages': {}, 'cases': {}}
+
+
+def test_stages_are_attributed_to_cases(browser, lawnet, tmp_path):
+    metrics = browser.metrics = Metrics()
+    if browser.renderer is not None:
+        browser.renderer.metrics = metrics
+    citation_list = ['[2016] 3 SLR 621', '[2019] SGHC 1']
+    assert login(browser, citation_list, tmp_path) == 'SUCCESS'
+    list(browser.download_cases(citation_list))
+    list(browser.pending_conversions())
+
+    report = metrics.report()
+    assert {'login', 'form_date', 'form_date_wait', 'search', 'search_wait',
+            'parse', 'case_page', 'pdf', 'pdf_wait', 'write', 'render',
+            'case'} <= set(report['stages'])
+    assert {'case', 'search', 'pdf', 'write'} <= set(report['cases']['[2016] 3 SLR 621'])
+    assert {'case_page', 'render'} <= set(report['cases']['[2019] SGHC 1'])
+    assert report['stages']['case']['count'] == 2
+
+
+def test_search_lock_wait_is_its_own_stage(lawnet, tmp_path):
+    browser = lawnet.configure(LawnetBrowser(workers=2, metrics=Metrics()))
+    assert login(browser, ['[2016] 3 SLR 621'], tmp_path) == 'SUCCESS'
+    browser.download_case('[2016] 3 SLR 621', lock=threading.Lock())
+    stages = browser.metrics.report()['cases']['[2016] 3 SLR 621']
+    assert 'search_lock_wait' in stages
+
+
+def test_reports(tmp_path):
+    metrics = Metrics()
+    with metrics.case('[2016] 3 SLR 621'):
+        with metrics.span('search'):
+            pass
+    metrics.record('login', 0.2)
+
+    metrics.write(str(tmp_path / 'report.json'))
+    report = json.loads((tmp_path / 'report.json').read_text())
+    assert report['stages']['login']['count'] == 1
+    assert set(report['cases']['[2016] 3 SLR 621']) == {'search', 'case'}
+
+    metrics.write(str(tmp_path / 'report.csv'))
+    with open(tmp_path / 'report.csv') as report_file:
+        rows = list(csv.DictReader(report_file))
+    assert [(row['case'], row['stage']) for row in rows] == [
+        ('[2016] 3 SLR 621', 'search'), ('[2016] 3 SLR 621', 'case'), ('', 'login')]
+
+    text = metrics.prometheus()
+    assert '# TYPE lrld_stage_seconds histogram' in text
+    assert 'lrld_stage_seconds_bucket{stage="login",le="0.25"} 1' in text
+    assert 'lrld_stage_seconds_bucket{stage="login",le="+Inf"} 1' in text
+    assert 'lrld_stage_seconds_count{stage="search"} 1' in text
+
+
+def test_reading_list_stages():
+    metrics = Metrics()
+    parsedocs.start_extract('tests/test-cases/test-case-2.docx', metrics=metrics)
+    assert set(metrics.report()['stages']) == {'read_document', 'match_citations'}
@@ -75,3 +75,98 @@ def test_extract_correct_stared_case_citations(test_case, expected_output):
     expected_citation_list = load_expected_citation_list(expected_output)
 
     assert citation_list == expected_citation_list
+
+
+@pytest.mark.parametrize('test_case, stared', [
+    ('test-case-1.docx', False),
+    ('test-case-1.docx', True),
+    ('test-case-2.docx', False),
+])
+def test_iter_citations_matches_start_extract(test_case, stared):
+    test_case_path = os.path.join(os.getcwd(), TEST_DIR, test_case)
+    citation_list = list(parsedocs.iter_citations(test_case_path, stared))
+    expected_citation_list = set(parsedocs.start_extract(test_case_path, stared)) - {''}
+
+    assert len(citation_list) == len(set(citation_list))
+    assert set(citation_list) == expected_citation_list
+
+
+def test_scan_pdf_pages_matches_across_page_breaks():
+    pages = ['See Tan v Lim [2016] 3 SLR 6', '21 at [12] and ' + 'x' * 1000,
+             'Ong v Lee [2019] SGCA 1', '2 and [2001] 1 AC 1']
+    matches = parsedocs.scan_pdf_pages(iter(pages), overlap=50)
+
+    assert [(match.citation, match.location) for match in matches] == [
+        ('[2016] 3 SLR 621', 'page 1'), ('[2019] SGCA 12', 'page 3'),
+        ('[2001] 1 AC 1', 'page 4')]
+
+
+def test_scan_blocks_finds_stared_and_unstared_citations_with_locations():
+    blocks = [('paragraph 1', '*Tan v Lim [2016] 3 SLR 621 and Ong v Lee [2019] SGCA 12'),
+              ('paragraph 2', '*Lee v Tan [2020] SGHC 5 see [2016] 3 SLR'),
+              ('paragraph 3', '621'),
+              ('table 1 row 1 cell 1', '[2001] 1 AC 1 *'),
+              ('table 1 row 1 cell 2', '[1990] 2 QB 5')]
+
+    assert list(parsedocs.scan_blocks(blocks)) == [
+        ('[2016] 3 SLR 621', True, 'paragraph 1'),
+        ('[2019] SGCA 12', False, 'paragraph 1'),
+        ('[2020] SGHC 5', True, 'paragraph 2'),
+        ('[2001] 1 AC 1', False, 'table 1 row 1 cell 1'),
+        ('[1990] 2 QB 5', False, 'table 1 row 1 cell 2')]
+
+
+def test_scan_pdf_pages_locates_citations_across_page_breaks():
+    pages = ['Tan v Lim [2016] 3 SLR', ' 621 and *Ong v Lee [2019] SGCA 12',
+             'x' * 1000 + ' *Lee v Tan [2020] SGHC 5']
+    matches = parsedocs.scan_pdf_pages(iter(pages), overlap=50)
+
+    assert list(matches) == [('[2016] 3 SLR 621', False, 'page 1'),
+                             ('[2019] SGCA 12', True, 'page 2'),
+                             ('[2020] SGHC 5', True, 'page 3')]
+
+
+def test_iter_citations_reads_pdf_pages(tmp_path):
+    canvas = pytest.importorskip('reportlab.pdfgen.canvas')
+    pdf_path = str(tmp_path / 'reading-list.pdf')
+    pdf = canvas.Canvas(pdf_path)
+    for line in ('Tan v Lim [2016] 3 SLR 621', 'Ong v Lee [2019] SGCA 12',
+                 'Tan v Lim [2016] 3 SLR 621 again'):
+        pdf.drawString(72, 720, line)
+        pdf.showPage()
+    pdf.save()
+
+    assert list(parsedocs.iter_citations(pdf_path)) == ['[2016] 3 SLR 621', '[2019] SGCA 12']
+    assert set(parsedocs.start_extract(pdf_path)) == {'[2016] 3 SLR 621', '[2019] SGCA 12'}
+
+
+def test_fast_and_sharded_pdf_text_match_layout(tmp_path, monkeypatch):
+    canvas = pytest.importorskip('reportlab.pdfgen.canvas')
+    import parsepdf
+    pdf_path = str(tmp_path / 'reading-list.pdf')
+    pdf = canvas.Canvas(pdf_path)
+    for page in range(5):
+        pdf.drawString(72, 720, f'Tan v Lim [2016] 3 SLR {page + 1} at [12]')
+        pdf.drawString(72, 700, f'Ong v Lee [2019] SGCA {page + 10}')
+        pdf.showPage()
+    pdf.save()
+
+    layout_pages = list(parsepdf.iter_pdf_pages(pdf_path))
+    fast_pages = list(parsepdf.iter_pdf_pages(pdf_path, fast=True))
+    assert [page.split() for page in fast_pages] == [page.split() for page in layout_pages]
+
+    monkeypatch.setattr(parsepdf, 'SHARD_PAGES', 2)
+    assert list(parsepdf.iter_pdf_pages(pdf_path, fast=True, processes=2)) == fast_pages
+
+
+def test_start_extract_matches_citation_split_across_pdf_pages(tmp_path):
+    canvas = pytest.importorskip('reportlab.pdfgen.canvas')
+    pdf_path = str(tmp_path / 'reading-list.pdf')
+    pdf = canvas.Canvas(pdf_path)
+    for line in ('Tan v Lim [2016] 3 SLR', '621 at [12]; *Ong v Lee [2019] 1 SLR 12'):
+        pdf.drawString(72, 720, line)
+        pdf.showPage()
+    pdf.save()
+
+    assert set(parsedocs.start_extract(pdf_path)) == {'[2016] 3 SLR 621', '[2019] 1 SLR 12'}
+    assert parsedocs.start_extract(pdf_path, stared=True) == ['[2019] 1 SLR 12']
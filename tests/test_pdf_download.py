@@ -0,0 +1,76 @@
+from fake_lawnet import login
+from pathlib import Path
+
+WLR_CITATION = '[1992] 2 WLR 367'
+WLR_DOC_ID = 'WLR-1992-2-367'
+WLR_FILENAME = 'In Re Atlantic Computer Systems Plc. - [1992] 2 WLR 367.pdf'
+
+
+def test_pdf_written_atomically(browser, tmp_path):
+    assert login(browser, [WLR_CITATION], tmp_path) == 'SUCCESS'
+
+    results = dict(browser.download_cases([WLR_CITATION]))
+
+    assert results == {WLR_CITATION: 'PDF downloaded.'}
+    assert [path.name for path in tmp_path.iterdir()] == [WLR_FILENAME]
+
+
+def test_html_served_as_pdf_is_not_saved(browser, lawnet, tmp_path):
+    lawnet.broken_pdfs.add(WLR_DOC_ID)
+    assert login(browser, [WLR_CITATION], tmp_path) == 'SUCCESS'
+
+    results = dict(browser.download_cases([WLR_CITATION]))
+
+    assert results == {WLR_CITATION: 'PDF not available.'}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_partial_pdf_resumed_with_range_request(browser, lawnet, tmp_path):
+    pdf_data = lawnet.pdf_data(WLR_DOC_ID)
+    partial_path = Path(tmp_path) / (WLR_FILENAME + '.part')
+    partial_path.write_bytes(pdf_data[:1000])
+    assert login(browser, [WLR_CITATION], tmp_path) == 'SUCCESS'
+
+    results = dict(browser.download_cases([WLR_CITATION]))
+
+    assert results == {WLR_CITATION: 'PDF downloaded.'}
+    assert lawnet.ranges == ['bytes=1000-']
+    assert (Path(tmp_path) / WLR_FILENAME).read_bytes() == pdf_data
+    assert not partial_path.exists()
+
+
+def test_partial_pdf_restarted_when_range_ignored(browser, lawnet, tmp_path):
+    lawnet.accept_ranges = False
+    pdf_data = lawnet.pdf_data(WLR_DOC_ID)
+    partial_path = Path(tmp_path) / (WLR_FILENAME + '.part')
+    partial_path.write_bytes(b'stale data')
+    assert login(browser, [WLR_CITATION], tmp_path) == 'SUCCESS'
+
+    results = dict(browser.download_cases([WLR_CITATION]))
+
+    assert results == {WLR_CITATION: 'PDF downloaded.'}
+    assert (Path(tmp_path) / WLR_FILENAME).read_bytes() == pdf_data
+
+
+def test_empty_pdf_is_not_saved(browser, lawnet, tmp_path):
+    lawnet.empty_pdfs.add(WLR_DOC_ID)
+    assert login(browser, [WLR_CITATION], tmp_path) == 'SUCCESS'
+
+    results = dict(browser.download_cases([WLR_CITATION]))
+
+    assert results == {WLR_CITATION: 'PDF not available.'}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_complete_partial_pdf_fetched_again(browser, lawnet, tmp_path):
+    pdf_data = lawnet.pdf_data(WLR_DOC_ID)
+    partial_path = Path(tmp_path) / (WLR_FILENAME + '.part')
+    partial_path.write_bytes(pdf_data)
+    assert login(browser, [WLR_CITATION], tmp_path) == 'SUCCESS'
+
+    results = dict(browser.download_cases([WLR_CITATION]))
+
+    assert results == {WLR_CITATION: 'PDF downloaded.'}
+    assert lawnet.ranges == [f'bytes={len(pdf_data)}-', None]
+    assert (Path(tmp_path) / WLR_FILENAME).read_bytes() == pdf_data
+    assert not partial_path.exists()
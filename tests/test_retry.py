@@ -0,0 +1,148 @@
+import shutil
+import time
+import pytest
+from fake_lawnet import FakeLawnet, generate_cases, login
+from lawnetsearch import LawnetBrowser
+from citationcache import CitationCache
+from retry import RetryPolicy, CircuitBreaker, LawnetUnavailable
+
+CITATIONS = ['[2016] 3 SLR 621', '[2015] SGCA 12', '[1992] 2 WLR 367']
+
+
+@pytest.fixture
+def fast_browser(browser):
+    # no backoff between retries so the tests stay quick
+    browser.retry_policies = {
+        'GET': RetryPolicy(attempts=4, base_delay=0),
+        'search': RetryPolicy(attempts=3, base_delay=0, retry_timeouts=False),
+    }
+    browser.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05,
+                                     max_trips=2)
+    return browser
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(base_delay=1, max_delay=4)
+    delays = [policy.backoff(10) for _ in range(100)]
+    assert all(0 <= delay <= 4 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_breaker_trips_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record(False)
+    assert breaker.pause() == 0
+    breaker.record(False)
+    assert breaker.pause() > 0
+
+    time.sleep(0.06)
+    # one probe is let through while everyone else keeps waiting
+    assert breaker.pause() == 0
+    assert breaker.pause() > 0
+    breaker.record(True)
+    assert breaker.pause() == 0
+    assert breaker.stats()['trips'] == 1
+
+
+def test_breaker_gives_up_after_failed_probes():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, max_trips=2)
+    breaker.record(False)
+    assert breaker.pause() == 0
+    breaker.record(False)
+    with pytest.raises(LawnetUnavailable):
+        breaker.pause()
+
+    # the next batch tries LawNet again
+    breaker.reset()
+    assert breaker.pause() == 0
+
+
+def test_transient_failures_are_retried(fast_browser, lawnet, tmp_path):
+    assert login(fast_browser, CITATIONS, tmp_path) == 'SUCCESS'
+    lawnet.fail('/result-page', times=2)
+    lawnet.fail('/page-content', times=2, status=503)
+
+    results = dict(fast_browser.download_cases(CITATIONS))
+
+    assert all('downloaded' in status for status in results.values())
+    stats = fast_browser.run_stats()
+    assert stats['retries'].get('search', 0) + stats['retries'].get('GET', 0) == 4
+    assert stats['breaker_trips'] == 0
+
+
+def test_outage_pauses_instead_of_burning_through(fast_browser, lawnet, tmp_path):
+    citations = [f'[2016] 3 SLR {page}' for page in range(600, 640)]
+    assert login(fast_browser, citations, tmp_path) == 'SUCCESS'
+    lawnet.fail('/result-page')
+
+    results = dict(fast_browser.download_cases(citations))
+
+    assert set(results.values()) <= {'LawNet unavailable.', 'Download failed.'}
+    assert 'LawNet unavailable.' in results.values()
+    assert fast_browser.run_stats()['breaker_trips'] == 2
+    # far fewer searches than the 40 cases times 3 attempts
+    assert lawnet.count('/result-page') < 40
+
+    # once LawNet is back, the next batch on the same browser goes through
+    lawnet.faults.pop('/result-page')
+    assert dict(fast_browser.download_cases(['[1992] 2 WLR 367'])) == {
+        '[1992] 2 WLR 367': 'PDF downloaded.'}
+
+
+def test_stalled_search_times_out(fast_browser, lawnet, tmp_path):
+    fast_browser.REQUEST_TIMEOUT = (5, 0.2)
+    assert login(fast_browser, CITATIONS, tmp_path) == 'SUCCESS'
+    lawnet.latency = {'/result-page': 1}
+    start = time.monotonic()
+
+    # a search POST that timed out may have gone through, so is not retried
+    assert dict(fast_browser.download_cases(['[2016] 3 SLR 621'])) == {
+        '[2016] 3 SLR 621': 'Download failed.'}
+    assert time.monotonic() - start < 1
+    assert lawnet.count('/result-page') == 1
+
+
+def download_one(browser, citation):
+    if hasattr(browser, 'async_download_case_or_fail'):
+        return browser.run(browser.async_download_case_or_fail(citation))
+    return browser.download_case_or_fail(citation)
+
+
+def test_probe_that_raises_still_reports(fast_browser, lawnet, tmp_path, open_store):
+    fast_browser.citation_cache = open_store(CitationCache, 'citations.sqlite3')
+    download_dir = tmp_path / 'cases'
+    assert login(fast_browser, CITATIONS, download_dir) == 'SUCCESS'
+    # resolved once, so that the PDF fetch is the probe next time
+    assert download_one(fast_browser, '[2016] 3 SLR 621') == 'PDF downloaded.'
+    for _ in range(3):
+        fast_browser.breaker.record(False)
+    time.sleep(0.06)
+    # the probe fails writing the PDF rather than reaching LawNet
+    shutil.rmtree(download_dir)
+
+    assert download_one(fast_browser, '[2016] 3 SLR 621') == 'Download failed.'
+    assert not fast_browser.breaker.probing
+    assert fast_browser.run_stats()['breaker_trips'] == 2
+    # the failed probe tripped the breaker again instead of leaving it
+    # waiting for a probe that never reports
+    with pytest.raises(LawnetUnavailable):
+        fast_browser.breaker.pause()
+
+
+def test_random_errors_are_absorbed(tmp_path):
+    cases = generate_cases(30, html_ratio=0.1)
+    citation_list = [case.citations[0] for case in cases if case.has_pdf]
+    lawnet = FakeLawnet(cases=cases, error_rate=0.2, latency=0.001).start()
+    try:
+        browser = lawnet.configure(LawnetBrowser(workers=4))
+        browser.retry_policies['GET'] = RetryPolicy(attempts=8, base_delay=0)
+        browser.retry_policies['search'] = RetryPolicy(attempts=8, base_delay=0)
+        browser.PDF_FETCH_ATTEMPTS = 8
+        browser.breaker = CircuitBreaker(failure_threshold=20)
+        assert login(browser, citation_list, tmp_path) == 'SUCCESS'
+        results = dict(browser.download_cases(citation_list))
+    finally:
+        lawnet.stop()
+
+    assert set(results.values()) == {'PDF downloaded.'}
+    assert sum(browser.run_stats()['retries'].values()) > 0
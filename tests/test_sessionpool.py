@@ -0,0 +1,120 @@
+import pytest
+from fake_lawnet import FakeLawnet, FakeCase
+from sessionpool import SessionPool
+
+CASES = [FakeCase(f'SLR-2016-3-{page}', f'Case {page} Pte Ltd v Tan',
+                  [f'[2016] 3 SLR {page}'], True) for page in range(600, 624)]
+CITATIONS = [case.citations[0] for case in CASES]
+ACCOUNTS = {'student': 'password', 'student2': 'password2'}
+
+
+@pytest.fixture
+def lawnet():
+    lawnet = FakeLawnet(cases=CASES, accounts=dict(ACCOUNTS)).start()
+    yield lawnet
+    lawnet.stop()
+
+
+@pytest.fixture
+def pool(lawnet, tmp_path):
+    pool = SessionPool(workers=2, render_workers=0)
+    pool.update_download_info(list(ACCOUNTS.items()) + [('student3', 'password')],
+                              'smustu', CITATIONS, str(tmp_path))
+    for account in pool.accounts:
+        lawnet.configure(account.browser)
+    return pool
+
+
+def test_cases_are_shared_across_sessions(pool, lawnet):
+    assert pool.login_lawnet() == 'SUCCESS'
+    # the third account cannot log in and takes no part
+    assert [account.username for account in pool.active_accounts()] == ['student', 'student2']
+
+    results = dict(pool.download_cases(CITATIONS))
+
+    assert results == {citation: 'PDF downloaded.' for citation in CITATIONS}
+    sessions = pool.run_stats()['sessions']
+    assert sum(session['cases'] for session in sessions) == len(CITATIONS)
+    assert all(session['cases'] > 0 for session in sessions[:2])
+    assert sessions[0]['cases_per_second'] > 0
+
+
+def test_expired_sessions_log_in_again(pool, lawnet):
+    assert pool.login_lawnet() == 'SUCCESS'
+    lawnet.expire_sessions()
+
+    results = dict(pool.download_cases(CITATIONS))
+
+    assert set(results.values()) == {'PDF downloaded.'}
+    assert [session['relogins'] for session in pool.session_stats()[:2]] == [1, 1]
+
+
+def test_retired_account_hands_over_its_cases(pool, lawnet):
+    assert pool.login_lawnet() == 'SUCCESS'
+    lawnet.expire_sessions()
+    del lawnet.accounts['student2']
+
+    results = dict(pool.download_cases(CITATIONS))
+
+    assert set(results.values()) == {'PDF downloaded.'}
+    student, student2 = pool.session_stats()[:2]
+    assert not student2['active'] and student2['cases'] == 0
+    assert student['cases'] == len(CITATIONS)
+
+
+def test_cases_fail_once_every_account_is_retired(pool, lawnet):
+    assert pool.login_lawnet() == 'SUCCESS'
+    lawnet.expire_sessions()
+    lawnet.accounts.clear()
+
+    results = dict(pool.download_cases(CITATIONS))
+
+    assert results == {citation: 'Session expired.' for citation in CITATIONS}
+
+
+def test_cases_can_come_from_a_generator(pool, lawnet):
+    assert pool.login_lawnet() == 'SUCCESS'
+
+    results = dict(pool.download_cases(citation for citation in CITATIONS))
+
+    assert results == {citation: 'PDF downloaded.' for citation in CITATIONS}
+
+
+def test_case_raising_in_a_worker_is_still_reported(pool, lawnet):
+    assert pool.login_lawnet() == 'SUCCESS'
+    browser = pool.accounts[0].browser
+    download_case_or_fail = browser.download_case_or_fail
+
+    def raising(case_citation):
+        if case_citation == CITATIONS[0]:
+            raise RuntimeError('unexpected')
+        return download_case_or_fail(case_citation)
+
+    for account in pool.accounts:
+        account.browser.download_case_or_fail = raising
+    results = dict(pool.download_cases(CITATIONS))
+
+    assert results == {**{citation: 'PDF downloaded.' for citation in CITATIONS},
+                       CITATIONS[0]: 'Download failed.'}
+
+
+def test_case_that_always_expires_does_not_retire_accounts(pool, lawnet):
+    assert pool.login_lawnet() == 'SUCCESS'
+
+    def expiring(download_case_or_fail):
+        def download(case_citation):
+            if case_citation == CITATIONS[0]:
+                return 'Session expired.'
+            return download_case_or_fail(case_citation)
+        return download
+
+    for account in pool.accounts:
+        account.browser.download_case_or_fail = expiring(
+            account.browser.download_case_or_fail)
+    results = dict(pool.download_cases(CITATIONS))
+
+    assert results == {**{citation: 'PDF downloaded.' for citation in CITATIONS},
+                       CITATIONS[0]: 'Session expired.'}
+    assert [session['active'] for session in pool.session_stats()[:2]] == [True, True]
+    assert sum(session['relogins'] for session in pool.session_stats()) == (
+        pool.MAX_CASE_REQUEUES + 1)
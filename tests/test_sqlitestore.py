@@ -0,0 +1,41 @@
+from sqlitestore import SqliteStore
+
+
+class Entries(SqliteStore):
+    TABLES = ('CREATE TABLE IF NOT EXISTS entries ('
+              'name TEXT PRIMARY KEY, size INTEGER, last_used REAL)',)
+    SIZED_TABLE = 'entries'
+    SIZED_KEY = 'name'
+
+    def put(self, name, size, last_used):
+        with self.lock, self.db:
+            self.db.execute('INSERT INTO entries VALUES (?, ?, ?)', (name, size, last_used))
+        self.evict()
+
+    def names(self):
+        with self.lock:
+            return [row[0] for row in self.db.execute('SELECT name FROM entries ORDER BY name')]
+
+
+def test_store_created_in_missing_directory(open_store):
+    open_store(Entries, 'cache/entries.sqlite3', max_bytes=100).put('a', 10, 1)
+    reopened = open_store(Entries, 'cache/entries.sqlite3')
+    assert reopened.names() == ['a']
+
+
+def test_least_recently_used_rows_evicted(open_store):
+    entries = open_store(Entries, 'entries.sqlite3', max_bytes=100)
+    entries.put('a', 40, 2)
+    entries.put('b', 40, 1)
+    entries.put('c', 40, 3)
+
+    assert entries.names() == ['a', 'c']
+    assert entries.total_size() == 80
+
+
+def test_store_without_cap_keeps_everything(open_store):
+    entries = open_store(Entries, 'entries.sqlite3')
+    entries.put('a', 40, 1)
+    entries.put('b', 400, 2)
+
+    assert entries.names() == ['a', 'b']
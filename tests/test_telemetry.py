@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+import telemetry
+from telemetry import TelemetryQueue, FileSink
+
+
+class BlockingSink():
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def send(self, events):
+        self.release.wait()
+        self.batches.append([name for name, _, _ in events])
+
+
+def read_events(sink_path):
+    with open(sink_path, encoding='utf-8') as sink_file:
+        return [json.loads(line) for line in sink_file]
+
+
+def test_events_are_batched_by_size(tmp_path):
+    sink = BlockingSink()
+    sink.release.set()
+    events = TelemetryQueue(sink, max_batch=3, flush_interval=60)
+    for number in range(7):
+        assert events.track(f'event {number}')
+    events.close()
+    assert [len(batch) for batch in sink.batches] == [3, 3, 1]
+
+
+def test_events_are_flushed_on_time(tmp_path):
+    sink_path = str(tmp_path / 'telemetry.jsonl')
+    events = TelemetryQueue(FileSink(sink_path), max_batch=100, flush_interval=0.05)
+    events.track('PDF Downloaded', {'Citation': '[2016] 3 SLR 621'})
+    time.sleep(0.3)
+    assert read_events(sink_path)[0]['properties'] == {'Citation': '[2016] 3 SLR 621'}
+    events.close()
+    assert not events.track('Late event')
+
+
+def test_full_queue_drops_instead_of_blocking():
+    sink = BlockingSink()
+    events = TelemetryQueue(sink, max_batch=1, flush_interval=60, max_queue=2)
+    start = time.monotonic()
+    results = [events.track(f'event {number}') for number in range(10)]
+    assert time.monotonic() - start < 0.1
+    assert results.count(False) == events.dropped > 0
+    sink.release.set()
+    events.close()
+    assert sum(map(len, sink.batches)) == results.count(True)
+
+
+def test_failing_sink_is_contained():
+    class BrokenSink():
+        def send(self, events):
+            raise OSError('no network')
+
+    events = TelemetryQueue(BrokenSink(), max_batch=1)
+    events.track('Session Opened')
+    events.close()
+    assert events.failed == 1
+
+
+def test_file_sink_from_environment(tmp_path, monkeypatch):
+    sink_path = str(tmp_path / 'telemetry.jsonl')
+    monkeypatch.setenv('LRLD_TELEMETRY_FILE', sink_path)
+    monkeypatch.setattr(telemetry, 'telemetry_queue', None)
+    telemetry.log_case_not_found('[2020] SGHC 999')
+    telemetry.get_queue().close()
+    assert read_events(sink_path)[0]['event'] == 'Case Not Found'